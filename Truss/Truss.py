@@ -20,6 +20,21 @@ import numpy as np
 import numdifftools as nd
 
 from .plot import *
+from .cache import *
+from .store import *
+from .groups import *
+from .multistart import *
+from .result import *
+from .estimate import *
+from .update import *
+from .scaling import *
+from .derivatives import *
+from .topology import *
+from .multilevel import *
+from .envelope import *
+from .reanalysis import *
+from .stream import *
+from .ordering import *
 from .solve import *
 from .functions import *
 from .auxiliary_truss import *
@@ -54,6 +69,7 @@ class Truss:
 		indices of start and end nodes, e.g. [[0,1],[1,2]]
 		for bars between nodes 0 and 1 and nodes 1 and 2
 		If no input is provided, all possible bars will be selected.
+		Nodes and bars of regular lattices are generated by lattice().
 	
 	max_length: float, default = 1e6
 		maximum bar length
@@ -71,17 +87,66 @@ class Truss:
 		maximum stress sigma_{max} on single realized bar after optimization
 	verbose: bool, default = True
 		Status output is printed if True.
+	cache: GeometryCache or bool, default = None
+		Cache for bars and bar lengths shared between trusses
+		with identical nodes, fixed nodes, maximum bar length and bars.
+		If True, the default in-memory cache is used.
+	bar_groups: list or str, default = None
+		Groups of bars sharing one diameter variable, e.g. [[0,3],[1,2,5]].
+		If 'symmetry', mirror-symmetric bars are grouped automatically
+		provided that nodes, fixed nodes, load cases and bars are symmetric.
+	n_workers: int, default = 1
+		number of threads evaluating the constraint blocks
+		of the individual load cases concurrently
+	store: BarStore or str, default = None
+		Keep bars and per-bar geometry in memory-mapped files on disk
+		(BarStore or its directory) instead of memory; see build_store()
+		and share() for shared memory.
+	reorder: str, default = None
+		Renumber the degrees of freedom of the free nodes to reduce the bandwidth
+		of stiffness matrix and KKT system, e.g. 'rcm'; see reorder().
 
 
 	Methods:
 	--------
 	add_option(*args)
 		Pass additional options to Ipopt.
+	aggregate(kind,parameter,...)
+		Use aggregated stress constraints (KS or p-norm) per load case or bar group.
+	estimate()
+		Report sizes, constraints, nonzeros, memory and cost per iteration without solving.
+	add_load_cases(load_cases,x), remove_load_cases(cases,x), set_limits(...,x)
+		Update load cases or limits and map the previous solution x to a warm start.
+	move_nodes(indices,positions,x), add_nodes(positions,...), remove_nodes(indices,x)
+		Edit the nodes with local recomputation of the bars and map x to a warm start.
+	reorder(method,x), natural_layout(x)
+		Renumber the degrees of freedom (e.g. reverse Cuthill-McKee) or undo it for x.
+	share(path), unshare()
+		Keep the geometry in shared memory such that pickled copies only transfer a handle.
+	set_derivatives(kind,pattern)
+		Use graph-coloured sparse finite differences instead of the analytic Jacobians.
+	scaling(), set_scaling(enabled,obj,x,g)
+		Inspect or override the scaling factors passed to Ipopt.
+	multistart(method,n_starts,...)
+		Solve from several start points in a process pool and return the best design.
+	envelope_cases(dominance,cluster), envelope(method,dominance,cluster,verify,...)
+		Remove duplicate, proportional and dominated load cases before solving.
+	multilevel(method,levels,factor,radius,...)
+		Solve coarsened node sets first and warm-start the finer levels from their load paths.
+	reanalysis(x,threshold)
+		Factorize the stiffness matrix of a design once to analyse it under many new load cases.
+	postprocess(x,threshold,merge,resize)
+		Reduce the solution to its realized topology and re-size the reduced truss.
+	solve_iter(method,time_budget,cancel,inner,**kwargs)
+		Solve step by step, yielding a snapshot after every outer (and Ipopt) iteration.
 	solve(method,**kwargs)
 		Find an optimal structure for the given truss 
 		subject to the defined constraints and load cases.
-		Method can be either Ipopt or ALM.
-		Additional ALM-specific parameters can be passed as keyword arguments.
+		Method can be either Ipopt, ALM or relaxation.
+		Additional ALM- or relaxation-specific parameters can be passed as keyword arguments.
+		If result=True, a TrussResult with lazily computed volume, stresses,
+		displacements, active bars and solver statistics is returned.
+		If dry_run=True, the problem is not solved but estimate() is returned.
 
 	stress(x):
 		Determine stress on the individual bars.
@@ -101,7 +166,7 @@ class Truss:
 
 	def __init__(self,nodes,fixed_nodes,load_cases,bars=None,max_length=1e6,start_diameter=0,
 			young_E=1,min_diameter=0,max_diameter=100,max_compliance=10,max_stress=1,
-			verbose=True):
+			verbose=True,cache=None,bar_groups=None,n_workers=1,store=None,reorder=None):
 
 		self.nodes 		= nodes
 		self.fixed_nodes	= fixed_nodes
@@ -120,20 +185,45 @@ class Truss:
 					   'n_fn':		self.nodes.shape[0]-len(self.fixed_nodes),
 					   'n_lc':		self.load_cases.shape[-1],
 					   }
-		
-		if isinstance(bars,np.ndarray):
-			self.bars = bars
+
+		#number of modifications of geometry, load cases, limits, linked bars
+		#and order of the degrees of freedom, see TrussResult
+		self.version 		= 0
+
+		#bars, bar lengths and compact bar geometry, in memory or on disk
+		self.store 		= None
+
+		if store is None:
+			truss_geometry(self,bars,cache)
 		else:
-			self.bars = potential_bars(self)
+			store_geometry(self,store,bars)
 
-		#additional parameters
+		#potential bars (ground structure) or user-defined bars
+		self.ground_structure 	= bars is None
+
+		#sparsity pattern of the stiffness matrix, see stiffness_pattern()
+		self.stiff_pattern 	= None
+
+		#linked bar diameters
 		self.par['n_b'] 	= len(self.bars)
-		self.par['n_dl'] 	= self.par['n_fn'] * self.par['dim'] * self.par['n_lc']
-		self.par['n_var'] 	= self.par['n_b'] + self.par['n_dl']
+		link_bars(self,bar_groups)
+
+		#aggregation of stress constraints
+		self.par_agg 		= aggregation_parameters()
+
+		#additional parameters
+		problem_sizes(self)
+
+		#print output
+		self.verbose 		= verbose
+
+		#order of the degrees of freedom of the free nodes, natural if None
+		self.dof_order 		= None
+
+		if reorder is not None:
+			reorder_nodes(self,reorder)
 
 		self.bar_diam 		= np.ones((self.par['n_b']))*start_diameter
-		self.bar_lengths 	= bar_lengths(self)
-		self.bar_angles  	= bar_angles(self)
 
 		#collect additional options for ipopt
 		self.options_ipopt 	= []
@@ -141,8 +231,55 @@ class Truss:
 		#initialize parameters for ALM
 		self.method_ALM 	= False
 
-		#print output
-		self.verbose 		= verbose
+		#relaxation parameter of the vanishing constraints
+		self.par_relax 		= {'t': 0.0}
+
+		#scaling of the NLP
+		self.par_scaling 	= scaling_parameters()
+
+		#analytic or finite-difference derivatives of the constraints
+		self.par_deriv 		= derivative_parameters()
+
+		#time budget and cancellation of streaming solves, see solve_iter()
+		self.par_stream 	= None
+
+		#concurrent evaluation of load cases
+		self.n_workers 		= int(n_workers)
+		self.executor 		= None
+
+	def __getstate__(self):
+
+		#the thread pool and the work buffers are not transferred to other processes
+		state 		  = self.__dict__.copy()
+		state['executor'] = None
+		state['work'] 	  = None
+
+		#memory-mapped or shared geometry is reattached from the store;
+		#bar_dofs of reordered degrees of freedom are kept in memory
+		if self.store is not None:
+			for name in GEOMETRY:
+				if getattr(self,name) is getattr(self.store,name,None):
+					state[name] = None
+
+		return state
+
+	def __setstate__(self,state):
+
+		self.__dict__.update(state)
+
+		work_buffers(self)
+
+		if self.store is not None:
+			for name in GEOMETRY:
+				if getattr(self,name) is None:
+					setattr(self,name,getattr(self.store,name))
+
+	@property
+	def bar_angles(self):
+		'''Bar angles [node,dim,bar] with respect to the displacement coordinate system;
+		computed on access as the dense array is large for large ground structures.'''
+
+		return bar_angles(self)
 
 	#objective function and gradient
 
@@ -172,23 +309,15 @@ class Truss:
 		return nonlinear(self,x)
 
 	def vanishing(self,x):
+		'''Vanishing constraints [GH_diam,GH_stress]; the returned
+		work buffer is overwritten by the next call.'''
 
-		if self.method_ALM:
+		#H>=0 is absorbed in the bounds
+		return vanishing(self,x,self.work['van'])
 
-			#if the ALM is used, the vaishing constraints GH are relaxed
-			#and H>=0 is absorbed in the bounds
-
-			out_van 	= np.concatenate((van_GH_diam(self,x),
-							van_GH_stress(self,x)
-							))
-
-		else:
-			out_van 	= np.concatenate((#van_H(self,x),
-							van_GH_diam(self,x),
-							van_GH_stress(self,x)
-							))
+	def vanishing_jacobian(self,x):
 
-		return out_van
+		return vanishing_jacobian(self,x)
 
 	#limits for constraints
 
@@ -212,10 +341,10 @@ class Truss:
 
 	def bounds(self):
 
-		out_bounds_lower = np.concatenate((np.zeros((self.par['n_b'])),
+		out_bounds_lower = np.concatenate((np.zeros((self.par['n_g'])),
 						np.ones((self.par['n_dl']))*(-1e19)
 						))
-		out_bounds_upper = np.concatenate((np.ones((self.par['n_b']))*self.par['max_diam'],
+		out_bounds_upper = np.concatenate((np.ones((self.par['n_g']))*self.par['max_diam'],
 						np.ones((self.par['n_dl']))*(1e19)
 						))
 
@@ -224,28 +353,49 @@ class Truss:
 	#ipopt
 
 	def constraints(self,x):
+		'''Constraints [compliance,equilibrium,(vanishing)]; the returned
+		work buffer is overwritten by the next call.'''
 
-		out_constr 	= np.concatenate([np.dot(self.linear(),x),
-						self.nonlinear(x)
-						])
+		n_lc 		= self.par['n_lc']
+		n_dl 		= self.par['n_dl']
 
-		if not self.method_ALM:
+		out_constr 	= self.work['constr'][:n_lc+n_dl+(0 if self.method_ALM else self.par['n_van'])]
+
+		compliance(self,x,out_constr[:n_lc])
+		nonlinear(self,x,out_constr[n_lc:n_lc+n_dl])
 
-			out_constr = np.concatenate((out_constr,self.vanishing(x)))
+		if not self.method_ALM:
+			vanishing(self,x,out_constr[n_lc+n_dl:])
 
 		return out_constr
 
 	def jacobian(self,x):
+		'''Values of the Jacobian of the constraints at the nonzeros of jacobianstructure().'''
 
-		out_jac 	= np.concatenate([self.linear(),
-						nd.Jacobian(self.nonlinear)(x)
-						]).flatten()
+		return constraint_jacobian(self,x)
 
-		if not self.method_ALM:
+	def jacobianstructure(self):
+		'''Rows and columns of the structural nonzeros of the Jacobian of the constraints.'''
 
-			out_jac = np.concatenate((out_jac,nd.Jacobian(self.vanishing)(x).flatten()))
+		pattern = constraint_pattern(self).tocoo()
 
-		return out_jac
+		return pattern.row,pattern.col
+
+	def set_derivatives(self,kind='analytic',pattern=None):
+		'''Choose the derivatives of the constraints.
+
+		Parameters:
+		-----------
+		kind: str, default = 'analytic'
+			'analytic' for the analytic Jacobians or 'fd' for graph-coloured
+			sparse finite differences, e.g. for modified constraints
+		pattern: sparse matrix or str, default = None
+			sparsity pattern [constraint,variable] of constraints() for 'fd';
+			the structural pattern of the truss if None, detected if 'detect'
+		'''
+
+		self.par_deriv 	= derivative_parameters(kind,pattern)
+		self.jac_cache 	= {}
 
 	#collect additional options for ipopt
 
@@ -254,67 +404,527 @@ class Truss:
 
 		self.options_ipopt.append(*args)
 
+	#incremental updates
+
+	def add_load_cases(self,load_cases,x=None):
+		'''Append load cases without rebuilding the geometry.
+
+		Parameters:
+		-----------
+		load_cases: array
+			applied loads; [#nodes,dimension,#loads] or [#nodes,dimension]
+		x: array, default = None
+			solution of the previous problem; if given, it is returned in
+			the new variable layout as warm start, i.e. as x0 for solve()
+		'''
+
+		return add_load_cases(self,load_cases,x)
+
+	def remove_load_cases(self,cases,x=None):
+		'''Remove load cases without rebuilding the geometry.
+
+		Parameters:
+		-----------
+		cases: int or list
+			indices of the load cases to remove
+		x: array, default = None
+			solution of the previous problem; if given, it is returned in
+			the new variable layout as warm start, i.e. as x0 for solve()
+		'''
+
+		return remove_load_cases(self,cases,x)
+
+	def set_limits(self,max_compliance=None,max_stress=None,min_diameter=None,max_diameter=None,x=None):
+		'''Change the limits of the problem; limits that are None are kept.
+
+		Parameters:
+		-----------
+		max_compliance, max_stress, min_diameter, max_diameter: float, default = None
+			new limits, see Truss
+		x: array, default = None
+			solution of the previous problem; if given, it is returned
+			with the diameters within the new bounds as warm start
+		'''
+
+		return set_limits(self,max_compliance,max_stress,min_diameter,max_diameter,x)
+
+	def move_nodes(self,indices,positions,x=None):
+		'''Move nodes; only bars at the changed positions are recomputed.
+
+		Parameters:
+		-----------
+		indices: int or list
+			indices of the nodes to move
+		positions: array
+			new coordinates of the nodes; [#nodes,dimension]
+		x: array, default = None
+			solution of the previous problem; if given, it is mapped to the new
+			bars (new bars vanish) and returned with displacements in equilibrium
+		'''
+
+		return move_nodes(self,indices,positions,x)
+
+	def add_nodes(self,positions,fixed=False,loads=None,x=None):
+		'''Append nodes; only bars at the new nodes are computed.
+
+		Parameters:
+		-----------
+		positions: array
+			coordinates of the new nodes; [#nodes,dimension]
+		fixed: bool, default = False
+			the new nodes are fixed if True
+		loads: array, default = None
+			loads on the new nodes; [#nodes,dimension,#loads], unloaded if None
+		x: array, default = None
+			solution of the previous problem; if given, it is mapped to the new
+			bars (new bars vanish) and returned with displacements in equilibrium
+		'''
+
+		return add_nodes(self,positions,fixed,loads,x)
+
+	def remove_nodes(self,indices,x=None):
+		'''Remove unloaded nodes and their bars; the remaining nodes are renumbered.
+
+		Parameters:
+		-----------
+		indices: int or list
+			indices of the nodes to remove
+		x: array, default = None
+			solution of the previous problem; if given, it is mapped to the new
+			bars and returned with displacements in equilibrium
+		'''
+
+		return remove_nodes(self,indices,x)
+
+	def reorder(self,method='rcm',x=None):
+		'''Renumber the degrees of freedom of the free nodes.
+
+		The displacement variables, the equilibrium constraints and the stiffness
+		matrix follow the order of free_nodes. Reverse Cuthill-McKee on the bar
+		connectivity reduces the bandwidth of the stiffness matrix and the fill-in
+		of the factorizations in Ipopt. All methods taking a solution x use the
+		current order; stresses, TrussResult.displacements and plots are per bar
+		or node and independent of it. The order is kept after node edits.
+
+		Parameters:
+		-----------
+		method: str, default = 'rcm'
+			'rcm' for reverse Cuthill-McKee or 'natural' for the order of the node indices
+		x: array, default = None
+			solution in the previous order; if given, it is returned in the new order
+		'''
+
+		return reorder_nodes(self,method,x)
+
+	def natural_layout(self,x):
+		'''Return the solution with the displacements in the order of the node
+		indices, i.e. in the variable layout without reorder().
+
+		Parameters:
+		-----------
+		x: array
+			Bar diameters and nodal displacements as obtained from solve() method.
+		'''
+
+		return natural_layout(self,x)
+
+	#shared geometry
+
+	def share(self,path=None):
+		'''Move nodes, bars, bar lengths and compact bar geometry to a block of shared
+		memory (or to memory-mapped files in the directory path) and return the store.
+
+		Pickled copies of the truss, e.g. in the worker processes of multistart(),
+		then contain only the handle of the store and attach to the same read-only
+		arrays instead of copying them. The truss owns the shared memory, which is
+		released by unshare() or when the truss is deleted.
+
+		Parameters:
+		-----------
+		path: str, default = None
+			directory of a BarStore; shared memory if None. The directory
+			has to be empty, missing or contain a store, which is replaced.
+		'''
+
+		return share_geometry(self,path)
+
+	def unshare(self):
+		'''Copy the geometry back to memory and release the shared memory.'''
+
+		unshare_geometry(self)
+
+	#scaling
+
+	def scaling(self):
+		'''Return the scaling factors of objective, variables and constraints
+		passed to Ipopt for the current problem; see problem_scaling().'''
+
+		return problem_scaling(self)
+
+	def set_scaling(self,enabled=True,obj=None,x=None,g=None):
+		'''Override the automatic scaling of the NLP.
+
+		Parameters:
+		-----------
+		enabled: bool, default = True
+			Pass the scaling factors to Ipopt. Otherwise, the
+			gradient-based scaling of Ipopt is used.
+		obj: float, default = None
+			scaling factor of the objective; automatic if None
+		x: array, default = None
+			scaling factors of the variables; automatic if None
+		g: array, default = None
+			scaling factors of the constraints (without vanishing
+			constraints for ALM); automatic if None
+		'''
+
+		self.par_scaling = scaling_parameters(enabled,obj,x,g)
+
+	#aggregated stress constraints
+
+	def aggregate(self,kind='ks',parameter=50.,max_parameter=None,factor=4.,groups=None,polish=True):
+		'''Replace the stress vanishing constraints of the individual bars
+		by aggregated constraints per load case or group of bars.
+		Use kind=None to restore one constraint per bar.
+
+		Parameters:
+		-----------
+		kind: str, default = 'ks'
+			Kreisselmeier-Steinhauser function 'ks' or p-norm 'pnorm'
+		parameter: float, default = 50
+			aggregation parameter rho or p of the first solve
+		max_parameter: float, default = None
+			The parameter is increased by factor between subsequent solves
+			until max_parameter is reached.
+		factor: float, default = 4
+			increase of the parameter between subsequent solves
+		groups: list, default = None
+			groups of bar indices aggregated together;
+			all bars of a load case are aggregated if None.
+		polish: bool, default = True
+			Solve with one constraint per bar after the aggregated solves.
+		'''
+
+		self.par_agg = aggregation_parameters(kind,parameter,max_parameter,factor,groups,polish)
+
+		problem_sizes(self)
+
 	#solve
 
-	def solve(self,method,**kwargs):
+	def solve(self,method,result=False,dry_run=False,**kwargs):
+
+		#sizes and cost of the problem instead of solving it
+		if dry_run:
+			return self.estimate()
+
+		#unified result object
+		if result:
+			return solve_result(self,method,**kwargs)
+
+		if self.par_agg['kind'] is not None and not self.par_agg['running']:
+			return solve_aggregated(self,method,**kwargs)
 
 		if method in ['Ipopt','IPOPT','ipopt','direct']:
-			return solve_direct(self)
+
+			for key in kwargs:
+				if key != 'x0':
+					raise KeyError('key %s not known!'% key)
+
+			return solve_direct(self,kwargs.get('x0'))
 		
 		elif method in ['ALM','alm']:
 
-			self.par_ALM 	= {'n':			self.par['n_var'],
-					   'x':			np.zeros((self.par['n_var'])),
-					   'eta':		np.zeros((self.par['n_b']*(self.par['n_lc']+1))),
-					   'eta_max':		1e4,
-					   'alpha':		1.0,
-					   'gamma':		2.0,
-					   'tau':		0.1,
-					   'iter':		0,
-					   'max_iter':		200,
-					   'stop_crit':		1e-6,
-					   }
-
-			for key in kwargs:
+			self.par_ALM 	= alm_parameters(self,**kwargs)
 
-				if key in ['x0','eta0']:
-					self.par_ALM[key[:-1]] 	= kwargs[key].astype(float)
+			return solve_alm(self)
 
-				elif key in ['eta_max','alpha','gamma',
-						'tau','max_iter','stop_crit']:
-					self.par_ALM[key] 	= float(kwargs[key])
+		elif method in ['relaxation','relax']:
 
-				else:
-					raise KeyError('key %s not known!'% key)
+			self.par_relax 	= relaxation_parameters(self,**kwargs)
 
-			return solve_alm(self)
+			return solve_relaxation(self)
 		
 		else:
-			raise ValueError('method must be direct or ALM!')
+			raise ValueError('method must be direct, ALM or relaxation!')
+
+	#streaming solve
+
+	def solve_iter(self,method,time_budget=None,cancel=None,inner=False,tol=1e-6,**kwargs):
+		'''Generator solving the truss step by step.
+
+		A snapshot (dict) is yielded after every outer iteration, i.e. every ALM
+		iteration, every relaxation solve or the single direct solve, with the
+		keys kind='outer', iter, time, x, volume, violation and feasible (plus
+		alpha, V and KKT for ALM and t for relaxation). The last snapshot has
+		kind='final' and contains the best iterate so far and the reason
+		('converged', 'finished', 'time' or 'cancelled').
+		Closing the generator stops the solve after the current outer iteration.
+		The continuation of aggregate() is not applied.
+
+		Parameters:
+		-----------
+		method: str
+			method as for solve(); direct, ALM or relaxation
+		time_budget: float, default = None
+			total wall-clock time in seconds, enforced within Ipopt; unlimited if None
+		cancel: threading.Event or function, default = None
+			The solve is stopped within Ipopt as soon as cancel is set (or returns True).
+		inner: bool, default = False
+			Yield a snapshot with kind='inner' (iter, objective, inf_pr,
+			inf_du, mu) of every Ipopt iteration before each outer snapshot.
+		tol: float, default = 1e-6
+			maximum constraint violation of feasible iterates
+		kwargs:
+			method-specific parameters as for solve()
+		'''
+
+		return solve_stream(self,method,time_budget,cancel,inner,tol,**kwargs)
+
+	def intermediate(self,alg_mod,iter_count,obj_value,inf_pr,inf_du,mu,d_norm,
+			regularization_size,alpha_du,alpha_pr,ls_trials):
+		'''Callback of Ipopt after every iteration; False stops the solve.'''
+
+		return intermediate(self,iter_count,obj_value,inf_pr,inf_du,mu)
+
+	#multi-start
+
+	def multistart(self,method='direct',n_starts=8,strategies=('lp','uniform','random'),
+			n_workers=None,target_volume=None,seed=None,tol=1e-6,**kwargs):
+		'''Solve the truss from several start points concurrently
+		and return the best feasible design.
+
+		Parameters:
+		-----------
+		method: str, default = 'direct'
+			method passed to solve()
+		n_starts: int, default = 8
+			number of start points, at least 1
+		strategies: tuple, default = ('lp','uniform','random')
+			generation of the start points, see start_points()
+		n_workers: int, default = None
+			number of processes; all CPUs if None, no process pool if 1
+		target_volume: float, default = None
+			Remaining starts are cancelled as soon as a feasible design
+			with a volume below target_volume has been found; running
+			starts are stopped within Ipopt and awaited.
+		seed: int, default = None
+			seed for the random start points
+		tol: float, default = 1e-6
+			maximum constraint violation of feasible designs
+		kwargs:
+			additional parameters passed to solve()
+
+		Returns the best design x and the summaries of all finished starts,
+		ranked by feasibility and volume.
+		'''
+
+		return solve_multistart(self,method,n_starts,strategies,n_workers,target_volume,seed,tol,**kwargs)
+
+	#load case envelope
+
+	def envelope_cases(self,dominance=True,cluster=None,tol=1e-9):
+		'''Return the indices of the load cases spanning the envelope of all load
+		cases and the reason of the removal of every other case: 'duplicate',
+		'proportional' (scaled copies with a factor of at most 1 in magnitude),
+		'dominated' (F = sum_k l_k*F_k with sum_k |l_k| <= 1) or 'clustered'.
+
+		Parameters:
+		-----------
+		dominance: bool, default = True
+			Check dominance by several load cases (one LP per load case).
+		cluster: float, default = None
+			Also remove load cases within a relative distance cluster of a larger one.
+		tol: float, default = 1e-9
+			relative tolerance of the comparisons
+		'''
+
+		return envelope_cases(self,dominance,cluster,tol)
+
+	def envelope(self,method='direct',dominance=True,cluster=None,verify=True,tol=1e-6,max_rounds=10,**kwargs):
+		'''Solve the truss with the envelope load cases of envelope_cases() only,
+		verify the solution against all load cases and re-solve with the violated
+		load cases added. Removed load cases cannot be violated except for clustered ones.
+
+		Parameters:
+		-----------
+		method: str, default = 'direct'
+			method passed to solve()
+		dominance: bool, default = True
+			Check dominance by several load cases.
+		cluster: float, default = None
+			Also remove load cases within a relative distance cluster of a larger one.
+		verify: bool, default = True
+			Re-add violated load cases and re-solve.
+		tol: float, default = 1e-6
+			maximum constraint violation of a load case
+		max_rounds: int, default = 10
+			maximum number of solves, at least 1; the returned x always
+			refers to all load cases
+		kwargs:
+			additional parameters passed to solve(); x0 is given for all load cases
+
+		Returns the solution x for all load cases, with the displacements of the
+		removed load cases in equilibrium, and the stats with the final load
+		cases ('cases'), the reasons of the removals ('reasons') and every
+		solve ('rounds': cases, added cases, volume, violation and time).
+		'''
+
+		return solve_envelope(self,method,dominance,cluster,verify,tol,max_rounds,**kwargs)
+
+	#coarse-to-fine solve
+
+	def multilevel(self,method='direct',levels=2,factor=2.,radius=None,fill=1e-3,**kwargs):
+		'''Solve the truss on a hierarchy of coarsened node sets, from the coarsest
+		to the original one, each level warm-started from the solution of the coarser one.
+
+		The coarse levels keep one node per cell of a grid with factor**level times
+		the node spacing (and all fixed and loaded nodes) and use a ground structure
+		of bars scaled accordingly. Bars of a finer level lying on an active bar of
+		the coarser level start with its diameter (and ALM multipliers), all others
+		with fill*max(diameters); the displacements are interpolated.
+
+		Parameters:
+		-----------
+		method: str, default = 'direct'
+			method passed to solve() on every level
+		levels: int, default = 2
+			number of coarse levels
+		factor: float, default = 2
+			coarsening factor of the node spacing per level
+		radius: float, default = None
+			Keep only bars with both end nodes within radius (in node spacings
+			of the coarser level) of its active bars; all bars if None.
+		fill: float, default = 1e-3
+			relative start diameter of the bars off the load path
+		kwargs:
+			additional parameters passed to solve(), except x0 and eta0
+
+		Returns the solution x of the truss and the stats (nodes, bars, volume,
+		violation, status and time) of every level.
+		'''
+
+		return solve_multilevel(self,method,levels,factor,radius,fill,**kwargs)
+
+	#re-analysis
+
+	def reanalysis(self,x,threshold=1e-6,regularization=1e-12):
+		'''Return a Reanalysis of the design x, i.e. the factorized stiffness matrix
+		of its realized bars, to evaluate displacements, stresses, compliance and
+		constraint violations of new load cases by analyze(loads).
+
+		Parameters:
+		-----------
+		x: array
+			Bar diameters and nodal displacements as obtained from solve() method.
+		threshold: float, default = 1e-6
+			bars with diameters below threshold*max(diameters) are considered vanished
+		regularization: float, default = 1e-12
+			relative stabilization of the diagonal for mechanisms of the realized bars
+		'''
+
+		return Reanalysis(self,x,threshold,regularization)
+
+	#post-processing
+
+	def postprocess(self,x,threshold=1e-6,merge=True,resize=True,**kwargs):
+		'''Build a truss of the realized topology of the solution x, i.e. without
+		vanished bars and unused nodes and with chains of collinear bars through
+		free, unloaded nodes merged, and polish its diameters by a sizing solve.
+
+		Parameters:
+		-----------
+		x: array
+			Bar diameters and nodal displacements as obtained from solve() method.
+		threshold: float, default = 1e-6
+			bars with diameters below threshold*max(diameters) are considered vanished
+		merge: bool, default = True
+			Merge chains of collinear bars.
+		resize: bool, default = True
+			Re-solve the reduced truss warm-started from the reduced design;
+			the method is 'direct' unless given as keyword argument method.
+		kwargs:
+			additional parameters passed to solve() of the reduced truss
+
+		Returns a TrussResult of the reduced truss with the original node indices
+		(stats['node_map']) and original bars (stats['bar_chains']) of the reduced truss.
+		'''
+
+		return postprocess(self,x,threshold,merge,resize,**kwargs)
 
 	#model data
 
-	def stress(self,x):
+	def estimate(self,verbose=None):
+		'''Return the sizes, the number of constraints of every method, the nonzeros of
+		Jacobian and Hessian, the memory of the geometry arrays and callback buffers
+		(in bytes) and a rough cost per iteration without solving the problem.
+
+		Parameters:
+		-----------
+		verbose: bool, default = None
+			print a summary; if None, the verbose setting of the truss is used
+		'''
+
+		out_estimate = estimate(self)
+
+		if self.verbose if verbose is None else verbose:
+			print_estimate(out_estimate)
+
+		return out_estimate
+
+	def violation(self,x,chunk_size=None):
+		'''Return the maximum violation of bounds and constraints.
+
+		Parameters:
+		-----------
+		x: array
+			Bar diameters and nodal displacements as obtained from solve() method.
+			For a 2D array of solutions [design,variable], the violations
+			of all designs are returned.
+		chunk_size: int, default = None
+			number of designs evaluated at once; determined from BATCH_MEMORY if None
+		'''
+
+		return violation(self,np.asarray(x,dtype=float),chunk_size)
+
+	def stress(self,x,chunk_size=None):
 		'''Determine stress on the individual bars.
 
 		Parameters:
 		-----------
 		x: array
 			Bar diameters and nodal displacements as obtained from solve() method.
+			For a 2D array of solutions [design,variable], the stresses
+			of all designs are returned; [design,case,bar].
+		chunk_size: int, default = None
+			number of designs evaluated at once; determined from BATCH_MEMORY if None
 		'''
 
-		return stress(self,x)
+		return stress(self,np.asarray(x,dtype=float),chunk_size)
 
 	def volume(self,x):
 		'''Return the total volume of the structure.
 
+		Parameters:
+		-----------
+		x: array
+			Bar diameters and nodal displacements as obtained from solve() method.
+			For a 2D array of solutions [design,variable], the volumes
+			of all designs are returned.
+		'''
+
+		return objective(self,np.asarray(x,dtype=float))
+
+	def expand(self,x):
+		'''Return the solution with the diameters of all bars,
+		i.e. with the linked design variables expanded.
+
 		Parameters:
 		-----------
 		x: array
 			Bar diameters and nodal displacements as obtained from solve() method.
 		'''
 
-		return objective(self,x)
+		return np.concatenate((bar_diameters(self,x),x[self.par['n_g']:]))
 
 	#plots
 
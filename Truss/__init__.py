@@ -18,4 +18,22 @@ from .functions import *
 from .solve import *
 from .plot import *
 from .auxiliary_truss import *
-from .auxiliary_solve import *
\ No newline at end of file
+from .auxiliary_solve import *
+from .cache import *
+from .kernels import *
+from .groups import *
+from .aggregation import *
+from .multistart import *
+from .result import *
+from .estimate import *
+from .store import *
+from .update import *
+from .scaling import *
+from .derivatives import *
+from .topology import *
+from .stream import *
+from .lattice import *
+from .ordering import *
+from .multilevel import *
+from .envelope import *
+from .reanalysis import *
\ No newline at end of file
@@ -0,0 +1,147 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sp
+
+#---------------------------------------------------------------------------------------#
+#		Parameters
+#---------------------------------------------------------------------------------------#
+
+def aggregation_parameters(kind=None,parameter=50.,max_parameter=None,factor=4.,
+				groups=None,polish=True):
+	'''Parameters for the aggregation of the stress vanishing constraints.
+
+	Instead of one constraint (sigma_i^2-sigma_{max}^2)*x_i <= 0 per bar and load case,
+	one aggregated constraint per group of bars and load case is used:
+
+	ks: 	max_i g_i + sigma_{max}^2/rho * log(1/n * sum_i exp(rho*(g_i - max_i g_i)/sigma_{max}^2))
+	pnorm:	(sum_i max(g_i,0)^p)^(1/p)
+
+	The mean Kreisselmeier-Steinhauser function (ks) approximates max_i g_i from below
+	and becomes exact for rho -> infinity; unlike the plain sum it vanishes if all bars vanish.
+	The p-norm of the violations is exact for all p, larger p distribute
+	the violation more towards the largest g_i.
+
+	Parameters:
+	-----------
+	kind: str, default = None
+		'ks', 'pnorm', or None for one constraint per bar
+	parameter: float, default = 50
+		aggregation parameter rho or p of the first solve
+	max_parameter: float, default = None
+		if given, the parameter is multiplied by factor after each solve
+		until max_parameter is reached (continuation)
+	factor: float, default = 4
+		increase of the parameter between subsequent solves
+	groups: list, default = None
+		groups of bar indices aggregated together, e.g. [[0,1,2],[3,4]];
+		bars not contained in any group form one additional group.
+		If None, all bars of a load case are aggregated into one constraint.
+	polish: bool, default = True
+		Solve the problem with one constraint per bar after the aggregated solves.
+	'''
+
+	if kind not in [None,'ks','pnorm']:
+		raise ValueError('kind must be ks, pnorm or None!')
+
+	out_par_agg = {'kind':			kind,
+			'parameter':		float(parameter),
+			'max_parameter':	float(parameter) if max_parameter is None else float(max_parameter),
+			'factor':		float(factor),
+			'groups':		groups,
+			'polish':		bool(polish),
+			'active':		False,
+			'running':		False,
+			}
+
+	return out_par_agg
+
+def aggregation_groups(self):
+	'''Group index of every stress constraint row.'''
+
+	n_sb 		= self.par['n_sb']
+
+	agg_index 	= np.zeros((n_sb),dtype=np.int64)
+
+	if self.par_agg['groups'] is not None:
+
+		#position of the bars in the stress constraint rows
+		row 	= -np.ones((self.par['n_b']),dtype=np.int64)
+		row[np.arange(self.par['n_b']) if self.stress_bars is None else self.stress_bars] = np.arange(n_sb)
+
+		agg_index[:] = len(self.par_agg['groups'])
+
+		for num_group,group in enumerate(self.par_agg['groups']):
+			group_rows = row[np.asarray(group,dtype=np.int64)]
+			agg_index[group_rows[group_rows >= 0]] = num_group
+
+		#consecutive numbering without empty groups
+		agg_index = np.unique(agg_index,return_inverse=True)[1]
+
+	self.agg_index 		= agg_index
+	self.par['n_ag'] 	= int(np.max(agg_index))+1 if n_sb > 0 else 0
+
+#---------------------------------------------------------------------------------------#
+#		Aggregation functions
+#---------------------------------------------------------------------------------------#
+
+def aggregate_stress(self,values):
+	'''Aggregated constraints of the per-bar values g_i of one load case
+	and their derivatives with respect to g_i.'''
+
+	index 		= self.agg_index
+	n_ag 		= self.par['n_ag']
+	parameter 	= self.par_agg['parameter']
+
+	if self.par_agg['kind'] == 'ks':
+
+		#normalization such that rho is independent of the stress limit
+		scale 		= parameter/self.par['max_stress']**2
+
+		max_values 	= np.full((n_ag),-np.inf)
+		np.maximum.at(max_values,index,values)
+
+		exp_values 	= np.exp(scale*(values-max_values[index]))
+		sum_values 	= np.bincount(index,weights=exp_values,minlength=n_ag)
+
+		out_agg 	= max_values + np.log(sum_values/np.bincount(index,minlength=n_ag))/scale
+		out_weights 	= exp_values/sum_values[index]
+
+	else:
+
+		violation 	= np.maximum(values,0)
+
+		#normalization by the maximum of the group against under- and overflow
+		max_values 	= np.zeros((n_ag))
+		np.maximum.at(max_values,index,violation)
+
+		scale 		= max_values[index]
+		ratio 		= np.zeros_like(violation)
+		ratio[scale > 0] = violation[scale > 0]/scale[scale > 0]
+
+		norm 		= np.bincount(index,weights=ratio**parameter,minlength=n_ag)**(1/parameter)
+
+		out_agg 	= max_values*norm
+		out_weights 	= np.zeros_like(values)
+		out_weights[scale > 0] = (ratio[scale > 0]/norm[index][scale > 0])**(parameter-1)
+
+	return out_agg,out_weights
+
+def aggregation_matrix(self,weights):
+	'''Sparse matrix [group,row] of the derivatives of the aggregated constraints.'''
+
+	return sp.csr_matrix((weights,(self.agg_index,np.arange(len(weights)))),
+				shape=(self.par['n_ag'],len(weights)))
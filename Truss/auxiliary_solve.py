@@ -39,6 +39,8 @@ def print_stat_alm(self):
 	print('----------------------------------')
 	print('Iter\t',self.par_ALM['iter']+1)
 	print('alpha\t',self.par_ALM['alpha'])
+	if self.par_ALM['inexact']:
+		print('tol\t',self.par_ALM['tol_inner'])
 	print('eta\t',self.par_ALM['eta'])
 	print('----------------------------------')
 	print()
\ No newline at end of file
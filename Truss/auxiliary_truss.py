@@ -13,11 +13,21 @@
 #	You should have received a copy of the GNU General Public License
 #	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
 
-from itertools import combinations
-from scipy.spatial.distance import euclidean
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import numpy.ma as ma
+import scipy.sparse as sp
+
+from scipy.sparse.linalg import splu, lsqr
+
+from .kernels import *
+from .aggregation import *
+
+#memory in bytes of the intermediate arrays for the evaluation of a batch of solutions
+BATCH_MEMORY = 2**28
+
+#number of bars processed at once by the chunked per-bar operations
+BAR_CHUNK = 2**20
 
 #---------------------------------------------------------------------------------------#
 #		Construction of all possible bars for given nodes
@@ -26,66 +36,50 @@ import numpy.ma as ma
 def potential_bars(self):
 	'''Determination of all potential for the given nodes.'''
 
-	out_bars = []
-
-	#get all 2-tuples of nodes
-	tuples_indices = list(combinations(range(len(self.nodes)),2))
+	out_bars 	= np.concatenate(list(candidate_bars(self.nodes,self.fixed_nodes,self.par['max_length'])))
 
-	for bar in tuples_indices:
+	return out_bars
 
-		if bar[0] in self.fixed_nodes and bar[1] in self.fixed_nodes:
-			#no bar between two fixed nodes
-			continue
+def candidate_bars(nodes,fixed_nodes,max_length,chunk_size=None):
+	'''Potential bars in chunks of node pairs [i,j], i < j, in the order of np.triu_indices.
 
-		elif euclidean(self.nodes[bar[0]],self.nodes[bar[1]]) > self.par['max_length']:
-			#no bar if length exceeds max value
-			continue
-
-		else:
-			#check if bar overlaps with other bar
-			#i.e. if another node is located on the bar
-
-			#minimum and maximum coordinates of nodes of current bar
-			min_bound = np.min(np.vstack((self.nodes[bar[0]],self.nodes[bar[1]])),axis=0)
-			max_bound = np.max(np.vstack((self.nodes[bar[0]],self.nodes[bar[1]])),axis=0)
+	Parameters:
+	-----------
+	chunk_size: int, default = None
+		approximate number of node pairs per chunk; BAR_CHUNK if None
+	'''
 
-			#find coordinates which do not change
-			nonzero_dim = np.nonzero(self.nodes[bar[0]]-self.nodes[bar[1]])[0]
-			mask = [True]*len(self.nodes)
+	n_n 		= len(nodes)
+	fixed 		= np.zeros((n_n),dtype=bool)
+	fixed[np.asarray(fixed_nodes,dtype=np.int64)] = True
 
-			for dim in range(self.par['dim']):
+	#rows of the upper triangle per chunk
+	rows_chunk 	= max(1,(BAR_CHUNK if chunk_size is None else chunk_size)//max(1,n_n))
 
-				if dim in nonzero_dim:
-					mask = mask & \
-						ma.masked_greater(self.nodes[:,dim],min_bound[dim]).mask& \
-						ma.masked_less(self.nodes[:,dim],max_bound[dim]).mask
-				else:
-					mask = mask & \
-						ma.masked_equal(self.nodes[:,dim],self.nodes[bar[0],dim]).mask
+	for start in range(0,max(n_n-1,1),rows_chunk):
 
-			#nodes which are located "in between" end nodes of current bar
-			crit_nodes = self.nodes[mask]
+		rows 	= np.arange(start,min(start+rows_chunk,n_n))
 
-			if len(crit_nodes) > 0: 
-			
-				#test whether node between end nodes is indeed on the bar
+		#get all 2-tuples of nodes
+		starts 	= np.repeat(rows,n_n-1-rows)
+		ends 	= np.arange(len(starts)) - np.repeat(np.cumsum(n_n-1-rows)-(n_n-1-rows),n_n-1-rows) + starts + 1
+		tuples_indices = np.stack((starts,ends),axis=1)
 
-				for node in crit_nodes:
+		#no bar between two fixed nodes
+		tuples_indices 	= tuples_indices[~(fixed[tuples_indices[:,0]] & fixed[tuples_indices[:,1]])]
 
-					#calculate dist(node_1,node_2)-dist(node_1,crit_node)-dist(node_2,crit_node)
-					diff_dist = euclidean(self.nodes[bar[1]],self.nodes[bar[0]]) \
-						- euclidean(self.nodes[bar[0]],node) \
-						- euclidean(self.nodes[bar[1]],node)
+		#no bar if length exceeds max value
+		lengths 	= np.linalg.norm(nodes[tuples_indices[:,1]]-nodes[tuples_indices[:,0]],axis=1)
+		tuples_indices 	= tuples_indices[lengths <= max_length]
 
-					if diff_dist < 1e-9:
-						continue
-					else:
-						out_bars.append(bar)
+		#no bar if it overlaps with another bar,
+		#i.e. if another node is located "in between" its end nodes
+		yield tuples_indices[~overlapping_bars(nodes,tuples_indices)]
 
-			else:
-				out_bars.append(bar)
+def bar_chunks(self):
+	'''Slices of at most BAR_CHUNK bars.'''
 
-	return np.array(out_bars)
+	return [slice(start,start+BAR_CHUNK) for start in range(0,max(self.par['n_b'],1),BAR_CHUNK)]
 
 #---------------------------------------------------------------------------------------#
 #		Bar lengths
@@ -94,7 +88,7 @@ def potential_bars(self):
 def bar_lengths(self):
 	'''Determination of the bar lengths for the given ground structure.'''
 
-	out_bar_lengths = np.array([euclidean(self.nodes[bar[1]],self.nodes[bar[0]]) for bar in self.bars])
+	out_bar_lengths = np.linalg.norm(self.nodes[self.bars[:,1]]-self.nodes[self.bars[:,0]],axis=1)
 
 	return out_bar_lengths
 
@@ -108,76 +102,416 @@ def bar_angles(self):
 
 	out_bar_angles = np.zeros((len(self.nodes),self.par['dim'],len(self.bars)))
 
-	for num_bar,bar in enumerate(self.bars):
+	free_dofs 	= bar_dofs(self) >= 0
+	cosines 	= bar_cosines(self)
 
-		if bar[0] not in self.fixed_nodes:
-			out_bar_angles[bar[0],:,num_bar] = -(self.nodes[bar[1]]-self.nodes[bar[0]])/self.bar_lengths[num_bar]
+	for end in range(2):
 
-		if bar[1] not in self.fixed_nodes:
-			out_bar_angles[bar[1],:,num_bar] = -(self.nodes[bar[0]]-self.nodes[bar[1]])/self.bar_lengths[num_bar]
+		bars 	= np.nonzero(free_dofs[:,end*self.par['dim']])[0]
+
+		out_bar_angles[self.bars[bars,end],:,bars] = cosines[bars,end*self.par['dim']:(end+1)*self.par['dim']]
 
 	return out_bar_angles
 
+def bar_dofs(self):
+	'''Indices of the displacement coordinates of the end nodes of the bars;
+	[bar,end*dim+dim_index], -1 for fixed nodes.'''
+
+	return pair_dofs(len(self.nodes),self.free_nodes,self.par['dim'],self.bars)
+
+def bar_cosines(self):
+	'''Direction cosines of the bars at their end nodes; [bar,end*dim+dim_index].'''
+
+	return pair_cosines(self.nodes,self.bars,self.bar_lengths)
+
+def pair_dofs(n_n,free_nodes,dim,bars):
+
+	#position of the nodes in the displacement coordinate system
+	free_index 	= -np.ones((n_n),dtype=np.int64)
+	free_index[free_nodes] = np.arange(len(free_nodes))
+
+	node_index 	= free_index[bars]
+	out_bar_dofs 	= node_index[:,:,np.newaxis]*dim + np.arange(dim)
+	out_bar_dofs[node_index < 0] = -1
+
+	return out_bar_dofs.reshape(len(bars),2*dim)
+
+def pair_cosines(nodes,bars,lengths):
+
+	direction 	= (nodes[bars[:,1]]-nodes[bars[:,0]])/lengths[:,np.newaxis]
+
+	return np.hstack((-direction,direction))
+
+#---------------------------------------------------------------------------------------#
+#		Problem sizes
+#---------------------------------------------------------------------------------------#
+
+def problem_sizes(self):
+	'''Determination of the sizes derived from the ground structure,
+	the load cases and the linked bars.'''
+
+	self.par['n_lc'] 	= self.load_cases.shape[-1]
+	self.par['n_b'] 	= len(self.bars)
+
+	#design variables of the bar diameters and bars with stress constraints
+	self.par['n_g'] 	= self.par['n_b'] if self.bar_group is None else int(np.max(self.bar_group))+1
+	self.par['n_sb'] 	= self.par['n_b'] if self.stress_bars is None else len(self.stress_bars)
+
+	self.par['n_dl'] 	= self.par['n_fn'] * self.par['dim'] * self.par['n_lc']
+	self.par['n_var'] 	= self.par['n_g'] + self.par['n_dl']
+
+	#stress constraints per load case, aggregated or one per bar
+	aggregation_groups(self)
+
+	self.par['n_sc'] 	= self.par['n_ag'] if self.par_agg['active'] else self.par['n_sb']
+
+	#vanishing constraints for diameter and stress
+	self.par['n_van'] 	= self.par['n_g'] + self.par['n_sc'] * self.par['n_lc']
+
+	#sparsity patterns and colourings of the Jacobians depend on the sizes
+	self.jac_cache 		= {}
+
+	work_buffers(self)
+
+def work_buffers(self):
+	'''Preallocate the work buffers of the callbacks for the current sizes.
+
+	constraints() and vanishing() write to these buffers and return them
+	(or views of them), i.e. the returned arrays are overwritten by the next
+	call. The values of the sparse Jacobian are kept with its pattern, see
+	jacobian_buffers().'''
+
+	n_dof 	= self.par['n_fn']*self.par['dim']
+	n_lc 	= self.par['n_lc']
+
+	self.work = {'forces':	np.array(self.load_cases[self.free_nodes],dtype=float).reshape(n_dof,n_lc),
+		     'disloc':	np.zeros((n_lc,n_dof)),
+		     'equil':	np.zeros((n_lc,n_dof)),
+		     'constr':	np.zeros((n_lc+self.par['n_dl']+self.par['n_van'])),
+		     'van':	np.zeros((self.par['n_van'])),
+		     }
+
+#---------------------------------------------------------------------------------------#
+#		Linked bar diameters
+#---------------------------------------------------------------------------------------#
+
+def bar_diameters(self,x):
+	'''Diameters of all bars for the design variables in x.'''
+
+	if self.bar_group is None:
+		return x[...,0:self.par['n_b']]
+
+	return x[...,0:self.par['n_g']][...,self.bar_group]
+
+def group_diameters(self,bar_diam):
+	'''Design variables for the diameters of all bars;
+	linked bars are assigned their mean diameter.'''
+
+	if self.bar_group is None:
+		return bar_diam
+
+	return np.bincount(self.bar_group,weights=bar_diam,minlength=self.par['n_g']) / \
+		np.bincount(self.bar_group,minlength=self.par['n_g'])
+
+def bar_group_index(self):
+	'''Design variable of the diameter of every bar.'''
+
+	if self.bar_group is None:
+		return np.arange(self.par['n_b'])
+
+	return self.bar_group
+
+def stress_rows(self,values):
+	'''Restrict values[...,bar] to the bars with stress constraints.'''
+
+	if self.stress_bars is None:
+		return values
+
+	return values[...,self.stress_bars]
+
 #---------------------------------------------------------------------------------------#
 #		Stiffness matrix
 #---------------------------------------------------------------------------------------#
 
-def stiffness_matrix(self,x):
+def stiffness_matrix(self,x,chunk_size=None):
 	'''Determination of the stiffness matrix K(x).
 
 	Parameters:
 	-----------
 	x: array
 		Bar diameters and nodal displacements as obtained from solve() method.
+		For a 2D array of solutions [design,variable], the stiffness matrices
+		of all designs are returned; [design,dof,dof].
+	chunk_size: int, default = None
+		number of designs assembled at once; determined from BATCH_MEMORY if None
 	'''
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
+	bar_diam 	= bar_diameters(self,x)
+	n_dof 		= self.par['n_fn']*self.par['dim']
 
-	out_stiff_mat 	= np.zeros((self.par['n_fn']*self.par['dim'],
-				self.par['n_fn']*self.par['dim']))
+	if bar_diam.ndim == 1:
+		return chunked_stiffness(self,bar_diam*self.par['E']/self.bar_lengths)
 
-	for num_bar in range(self.par['n_b']):
-		out_stiff_mat += bar_diam[num_bar]*self.par['E']/self.bar_lengths[num_bar] * \
-			self.bar_angles[self.free_nodes,:,num_bar].reshape(self.par['n_fn']*self.par['dim'],1) * \
-			self.bar_angles[self.free_nodes,:,num_bar].reshape(1,self.par['n_fn']*self.par['dim'])
+	out_stiff_mat 	= np.zeros((len(bar_diam),n_dof,n_dof))
+
+	for chunk in batch_chunks(len(bar_diam),n_dof*n_dof+4*self.bar_dofs[bar_chunks(self)[0]].size,chunk_size):
+		out_stiff_mat[chunk] = chunked_stiffness(self,bar_diam[chunk]*self.par['E']/self.bar_lengths)
 
 	return out_stiff_mat
 
+def chunked_stiffness(self,weights):
+	'''Dense stiffness matrix (or matrices for weights[design,bar]) assembled
+	from chunks of BAR_CHUNK bars.'''
+
+	n_dof 		= self.par['n_fn']*self.par['dim']
+
+	for num_chunk,bars in enumerate(bar_chunks(self)):
+
+		block 	= assemble_stiffness(weights[...,bars],np.asarray(self.bar_dofs[bars]),
+					np.asarray(self.bar_cosines[bars]),n_dof)
+
+		if num_chunk == 0:
+			out_stiff_mat 	= block
+		else:
+			out_stiff_mat  += block
+
+	return out_stiff_mat
+
+def sparse_stiffness(self,x):
+	'''Sparse stiffness matrix K(x) with the structure of stiffness_pattern(), i.e.
+	vanished bars give explicit zeros. Assembled in chunks of BAR_CHUNK bars.
+
+	Parameters:
+	-----------
+	x: array
+		Bar diameters and nodal displacements as obtained from solve() method.
+	'''
+
+	pattern 	= stiffness_pattern(self)
+	weights 	= bar_diameters(self,x)*self.par['E']/self.bar_lengths
+
+	values 		= np.zeros((pattern.nnz))
+
+	for bars in bar_chunks(self):
+		stiffness_values(self,bars,weights[bars],values)
+
+	return sp.csr_matrix((values,pattern.indices,pattern.indptr),shape=pattern.shape)
+
+def stiffness_values(self,bars,weights,out):
+	'''Add the entries of the stiffness matrices of the bars with weights E*x_i/l_i
+	to the values out at the nonzeros of stiffness_pattern().'''
+
+	dofs 	= np.asarray(self.bar_dofs[bars])
+	cosines = np.asarray(self.bar_cosines[bars])
+
+	values 	= weights[:,np.newaxis,np.newaxis]*cosines[:,:,np.newaxis]*cosines[:,np.newaxis,:]
+	rows 	= np.broadcast_to(dofs[:,:,np.newaxis],values.shape)
+	cols 	= np.broadcast_to(dofs[:,np.newaxis,:],values.shape)
+	mask 	= (rows >= 0) & (cols >= 0)
+
+	np.add.at(out,np.searchsorted(stiffness_keys(self),rows[mask]*(self.par['n_fn']*self.par['dim'])+cols[mask]),
+			values[mask])
+
+def stiffness_keys(self):
+	'''Flat indices row*n_dof+col of the nonzeros of stiffness_pattern() in CSR order;
+	cached until the problem sizes change.'''
+
+	if 'stiffness keys' not in self.jac_cache:
+
+		pattern = stiffness_pattern(self)
+		pattern.sort_indices()
+
+		self.jac_cache['stiffness keys'] = np.repeat(np.arange(pattern.shape[0],dtype=np.int64),
+								np.diff(pattern.indptr))*pattern.shape[1] + pattern.indices
+
+	return self.jac_cache['stiffness keys']
+
+def stiffness_pattern(self):
+	'''Sparsity pattern of the stiffness matrix of all bars;
+	computed once and kept in stiff_pattern.'''
+
+	if self.stiff_pattern is None:
+
+		n_dof 		= self.par['n_fn']*self.par['dim']
+		pattern 	= sp.csr_matrix((n_dof,n_dof))
+
+		for bars in bar_chunks(self):
+			pattern = pattern + pattern_block(self,np.arange(bars.start,min(bars.stop,self.par['n_b'])))
+
+		pattern.data[:] 	= 1
+		self.stiff_pattern 	= pattern
+
+	return self.stiff_pattern
+
+def pattern_block(self,bars):
+	'''Sparse matrix with ones at the entries of the stiffness matrix coupled by the bars.'''
+
+	n_dof 	= self.par['n_fn']*self.par['dim']
+	dofs 	= np.asarray(self.bar_dofs[bars])
+
+	rows 	= np.broadcast_to(dofs[:,:,np.newaxis],(len(dofs),dofs.shape[1],dofs.shape[1]))
+	cols 	= np.broadcast_to(dofs[:,np.newaxis,:],rows.shape)
+	mask 	= (rows >= 0) & (cols >= 0)
+
+	return sp.csr_matrix((np.ones(np.sum(mask)),(rows[mask],cols[mask])),shape=(n_dof,n_dof))
+
+def stiffness_block(self,bars,weights):
+	'''Sparse stiffness matrix of the bars with indices bars and weights E*x_i/l_i.'''
+
+	n_dof 	= self.par['n_fn']*self.par['dim']
+	dofs 	= np.asarray(self.bar_dofs[bars])
+	cosines = np.asarray(self.bar_cosines[bars])
+
+	values 	= weights[:,np.newaxis,np.newaxis]*cosines[:,:,np.newaxis]*cosines[:,np.newaxis,:]
+	rows 	= np.broadcast_to(dofs[:,:,np.newaxis],values.shape)
+	cols 	= np.broadcast_to(dofs[:,np.newaxis,:],values.shape)
+	mask 	= (rows >= 0) & (cols >= 0)
+
+	return sp.csr_matrix((values[mask],(rows[mask],cols[mask])),shape=(n_dof,n_dof))
+
+def equilibrium_matrix(self):
+	'''Sparse matrix [dof,bar] of the direction cosines, i.e. K(x) = B diag(E*x/l) B^T.'''
+
+	mask 	= self.bar_dofs >= 0
+	bars 	= np.broadcast_to(np.arange(self.par['n_b'])[:,np.newaxis],self.bar_dofs.shape)
+
+	return sp.csr_matrix((self.bar_cosines[mask],(self.bar_dofs[mask],bars[mask])),
+				shape=(self.par['n_fn']*self.par['dim'],self.par['n_b']))
+
+#---------------------------------------------------------------------------------------#
+#		Displacements in equilibrium
+#---------------------------------------------------------------------------------------#
+
+def equilibrium_displacements(self,x):
+	'''Return x with the nodal displacements replaced by the solution of K(x)u = F_{ext}.
+	For singular stiffness matrices, the least-squares solution of minimum norm is used.
+
+	Parameters:
+	-----------
+	x: array
+		Bar diameters and nodal displacements as obtained from solve() method.
+	'''
+
+	outer_forces 	= self.load_cases[self.free_nodes].reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+	node_disloc 	= sparse_solve(sparse_stiffness(self,x),np.asarray(outer_forces,dtype=float))
+
+	out_x 		= np.array(x,dtype=float)
+	out_x[self.par['n_g']:] = node_disloc.reshape(self.par['n_dl'])
+
+	return out_x
+
+def sparse_solve(stiff_mat,forces,tol=1e-10):
+	'''Solution u[dof,case] of K u = F by a sparse LU factorization of the degrees of
+	freedom connected by bars; the least-squares solution of minimum norm (lsqr) if
+	the factorization fails or does not solve the system, i.e. for singular K.'''
+
+	out_disloc 	= np.zeros(forces.shape)
+	dofs 		= np.nonzero(stiff_mat.diagonal() > 0)[0]
+
+	if len(dofs) == 0:
+		return out_disloc
+
+	stiff_mat 	= sp.csc_matrix(stiff_mat[dofs][:,dofs])
+
+	try:
+		out_disloc[dofs] = splu(stiff_mat).solve(np.ascontiguousarray(forces[dofs]))
+		solved 		 = np.all(np.isfinite(out_disloc)) and np.linalg.norm(stiff_mat @ out_disloc[dofs]-forces[dofs]) \
+					<= tol*max(np.linalg.norm(forces[dofs]),1e-300)
+
+	except RuntimeError:
+		solved 		= False
+
+	if not solved:
+		for num_case in range(forces.shape[1]):
+			out_disloc[dofs,num_case] = lsqr(stiff_mat,forces[dofs,num_case],atol=tol,btol=tol,
+								iter_lim=10*len(dofs))[0]
+
+	return out_disloc
+
 #---------------------------------------------------------------------------------------#
 #		Stress sigma
 #---------------------------------------------------------------------------------------#
 
-def stress(self,x):
-	'''Determine stress on the individual bars.
+def stress(self,x,chunk_size=None):
+	'''Determine stress on the individual bars; [case,bar].
 
 	Parameters:
 	-----------
 	x: array
 		Bar diameters and nodal displacements as obtained from solve() method.
+		For a 2D array of solutions [design,variable], the stresses of
+		all designs are returned; [design,case,bar].
+	chunk_size: int, default = None
+		number of designs evaluated at once; determined from BATCH_MEMORY if None
 	'''
 
+	n_dof 		= self.par['n_fn']*self.par['dim']
+	n_lc 		= self.par['n_lc']
+
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
-	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn'],self.par['dim'],self.par['n_lc'])
+	if x.ndim == 1:
+
+		node_disloc 	= x[-self.par['n_dl']:].reshape(n_dof,n_lc)
+
+		return chunked_stress(self,node_disloc)
 
-	out_stress = np.zeros((self.par['n_lc'],self.par['n_b']))
+	out_stress 	= np.zeros((len(x),n_lc,self.par['n_b']))
 
-	for num_case in range(self.par['n_lc']):
-		for num_bar in range(self.par['n_b']):
+	for chunk in batch_chunks(len(x),n_lc*(n_dof+4*min(self.par['n_b'],BAR_CHUNK)),chunk_size):
 
-			out_stress[num_case,num_bar] = self.par['E']/self.bar_lengths[num_bar] * \
-							np.dot(self.bar_angles[self.free_nodes,:,num_bar].reshape(self.par['n_fn']*self.par['dim']),
-							node_disloc[:,:,num_case].reshape(self.par['n_fn']*self.par['dim']))
+		#displacements of all designs and load cases as columns
+		node_disloc 	= x[chunk,-self.par['n_dl']:].reshape(-1,n_dof,n_lc)
+		n_designs 	= len(node_disloc)
+		node_disloc 	= np.moveaxis(node_disloc,1,0).reshape(n_dof,n_designs*n_lc)
+
+		out_stress[chunk] = chunked_stress(self,node_disloc).reshape(n_designs,n_lc,self.par['n_b'])
 
 	return out_stress
 
+def chunked_stress(self,node_disloc):
+	'''Stress [column,bar] for displacements node_disloc[dof,column]
+	evaluated in chunks of BAR_CHUNK bars.'''
 
+	out_stress 	= np.zeros((node_disloc.shape[1],self.par['n_b']))
 
+	for bars in bar_chunks(self):
+		out_stress[:,bars] = self.par['E']/self.bar_lengths[bars] * \
+			bar_strain(node_disloc,np.asarray(self.bar_dofs[bars]),np.asarray(self.bar_cosines[bars]))
 
+	return out_stress
 
+#---------------------------------------------------------------------------------------#
+#		Batches of solutions
+#---------------------------------------------------------------------------------------#
 
+def batch_chunks(n_designs,size,chunk_size=None):
+	'''Slices of at most chunk_size designs; size is the number of
+	intermediate floats per design used to bound the memory by BATCH_MEMORY.'''
+
+	if chunk_size is None:
+		chunk_size = max(1,BATCH_MEMORY//(8*max(1,size)))
+
+	return [slice(start,start+chunk_size) for start in range(0,n_designs,chunk_size)]
+
+#---------------------------------------------------------------------------------------#
+#		Evaluation of load cases
+#---------------------------------------------------------------------------------------#
+
+def map_load_cases(self,func,*args):
+	'''Evaluate func(self,num_case,*args) for all load cases.
+
+	The load cases are independent of each other. If n_workers > 1, they are
+	evaluated concurrently by a thread pool; the numpy kernels release the GIL.
+	The results are always returned in the order of the load cases.
+	'''
 
+	if self.n_workers > 1 and self.par['n_lc'] > 1:
 
+		if self.executor is None:
+			self.executor = ThreadPoolExecutor(max_workers=self.n_workers)
 
+		return list(self.executor.map(lambda num_case: func(self,num_case,*args),
+						range(self.par['n_lc'])))
 
+	return [func(self,num_case,*args) for num_case in range(self.par['n_lc'])]
@@ -0,0 +1,222 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import re
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .auxiliary_truss import *
+
+#---------------------------------------------------------------------------------------#
+#		Geometry cache
+#---------------------------------------------------------------------------------------#
+
+class GeometryCache:
+	'''Content-addressed cache for the geometry of ground structures.
+
+	Trusses with identical nodes, fixed nodes, maximum bar length and
+	(optionally) user-defined bars share the same bars, bar lengths
+	and compact bar geometry (bar_dofs, bar_cosines).
+	The cache keeps the most recently used geometries in memory and evicts
+	the least recently used ones if more than max_size entries are stored.
+	If a path is given, the geometries are additionally stored on disk
+	and can be reused by other processes and sessions.
+
+	The cached arrays are read-only and shared between all Truss instances.
+
+	Attributes:
+	----------
+	max_size: int, default = 32
+		maximum number of geometries kept in memory
+	path: str, default = None
+		directory for persistent storage of the geometries
+	'''
+
+	def __init__(self,max_size=32,path=None):
+
+		self.max_size 	= int(max_size)
+		self.path 	= path
+		self.entries 	= OrderedDict()
+		self.lock 	= threading.Lock()
+
+		#statistics
+		self.hits 	= 0
+		self.misses 	= 0
+
+		if self.path is not None:
+			os.makedirs(self.path,exist_ok=True)
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self,key):
+		return key in self.entries or os.path.isfile(self.filename(key))
+
+	def filename(self,key):
+
+		if self.path is None:
+			return ''
+
+		return os.path.join(self.path,'%s.npz' % key)
+
+	def get(self,key):
+		'''Return the geometry stored for key or None.'''
+
+		with self.lock:
+
+			if key in self.entries:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return self.entries[key]
+
+		if os.path.isfile(self.filename(key)):
+
+			with np.load(self.filename(key)) as data:
+				geometry = {name: data[name] for name in data.files}
+
+			#the entry may be evicted at once, e.g. for max_size = 0
+			self.put(key,geometry,persist=False)
+
+			with self.lock:
+				self.hits += 1
+
+			return geometry
+
+		with self.lock:
+			self.misses += 1
+
+		return None
+
+	def put(self,key,geometry,persist=True):
+		'''Store geometry (dict of arrays) for key.'''
+
+		for array in geometry.values():
+			array.setflags(write=False)
+
+		with self.lock:
+
+			self.entries[key] = geometry
+			self.entries.move_to_end(key)
+
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last=False)
+
+		if persist and self.path is not None and not os.path.isfile(self.filename(key)):
+
+			#write to temporary file first such that concurrent readers
+			#never see incomplete files
+			tmp_file = os.path.join(self.path,'%s.%d.tmp.npz' % (key,os.getpid()))
+			np.savez(tmp_file,**geometry)
+			os.replace(tmp_file,self.filename(key))
+
+	def clear(self,disk=False):
+		'''Remove all geometries from memory and, if disk=True, the files of
+		the cache (including incomplete temporary files) from disk.'''
+
+		with self.lock:
+			self.entries.clear()
+
+		if disk and self.path is not None:
+			for name in os.listdir(self.path):
+				#only files written by put(), other files in path are kept
+				if CACHE_FILE.fullmatch(name):
+					os.remove(os.path.join(self.path,name))
+
+#names of the cache files: geometry_key() and temporary files of put()
+CACHE_FILE = re.compile(r'[0-9a-f]{64}(\.[0-9]+\.tmp)?\.npz')
+
+#default cache used for cache=True
+geometry_cache = GeometryCache()
+
+#---------------------------------------------------------------------------------------#
+#		Hash of geometric input
+#---------------------------------------------------------------------------------------#
+
+def geometry_key(nodes,fixed_nodes,max_length,bars=None):
+	'''Hash of the geometric input of a truss.'''
+
+	key = hashlib.sha256()
+
+	nodes = np.ascontiguousarray(nodes,dtype=float)
+	key.update(str(nodes.shape).encode())
+	key.update(nodes.tobytes())
+
+	key.update(np.unique(np.asarray(fixed_nodes,dtype=np.int64)).tobytes())
+	key.update(np.float64(max_length).tobytes())
+
+	if isinstance(bars,np.ndarray):
+		bars = np.ascontiguousarray(bars,dtype=np.int64)
+		key.update(str(bars.shape).encode())
+		key.update(bars.tobytes())
+	else:
+		key.update(b'potential_bars')
+
+	return key.hexdigest()
+
+#---------------------------------------------------------------------------------------#
+#		Geometry of a truss
+#---------------------------------------------------------------------------------------#
+
+def truss_geometry(self,bars=None,cache=None):
+	'''Determine bars, bar lengths and the compact bar geometry of the truss
+	or take them from cache if they have been computed before.
+
+	Parameters:
+	-----------
+	bars: array, default = None
+		indices of start and end nodes; potential bars if None
+	cache: GeometryCache or bool, default = None
+		cache for the geometry; the default cache is used for True
+	'''
+
+	if cache is True:
+		cache = geometry_cache
+
+	if isinstance(cache,GeometryCache):
+
+		key 		= geometry_key(self.nodes,self.fixed_nodes,self.par['max_length'],bars)
+		geometry 	= cache.get(key)
+
+		if geometry is not None:
+			self.bars 		= geometry['bars']
+			self.bar_lengths 	= geometry['bar_lengths']
+			self.bar_dofs 		= geometry['bar_dofs']
+			self.bar_cosines 	= geometry['bar_cosines']
+			return
+
+	if isinstance(bars,np.ndarray) and isinstance(cache,GeometryCache):
+		#the cached arrays are read-only, do not lock the input
+		self.bars = bars.copy()
+	elif isinstance(bars,np.ndarray):
+		self.bars = bars
+	else:
+		self.bars = potential_bars(self)
+
+	self.bar_lengths 	= bar_lengths(self)
+	self.bar_dofs 		= bar_dofs(self)
+	self.bar_cosines 	= bar_cosines(self)
+
+	if isinstance(cache,GeometryCache):
+
+		cache.put(key,{'bars':		self.bars,
+			       'bar_lengths':	self.bar_lengths,
+			       'bar_dofs':	self.bar_dofs,
+			       'bar_cosines':	self.bar_cosines,
+			       })
@@ -0,0 +1,435 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sp
+
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Parameters
+#---------------------------------------------------------------------------------------#
+
+def derivative_parameters(kind='analytic',pattern=None):
+	'''Parameters for the derivatives of the constraints.
+
+	Parameters:
+	-----------
+	kind: str, default = 'analytic'
+		'analytic' for the analytic Jacobians or 'fd' for graph-coloured
+		sparse finite differences of constraints() and vanishing()
+	pattern: sparse matrix or str, default = None
+		Sparsity pattern [constraint,variable] of constraints() for 'fd'.
+		If None, the structural pattern of the truss is used;
+		if 'detect', the pattern is detected by probing all directions once.
+	'''
+
+	if kind not in ['analytic','fd']:
+		raise ValueError('kind must be analytic or fd!')
+
+	if isinstance(pattern,str) and pattern != 'detect':
+		raise ValueError('pattern must be a sparse matrix, detect or None!')
+
+	if sp.issparse(pattern):
+		pattern = sp.csr_matrix(pattern,dtype=bool)
+		pattern.eliminate_zeros()
+		pattern.sort_indices()
+
+	out_par_deriv = {'kind':	kind,
+			 'pattern':	pattern,
+			 }
+
+	return out_par_deriv
+
+#---------------------------------------------------------------------------------------#
+#		Structural sparsity patterns
+#---------------------------------------------------------------------------------------#
+
+def dof_bar_pattern(self):
+	'''Pattern [dof,bar] of the degrees of freedom of the bars.'''
+
+	mask 	= self.bar_dofs >= 0
+	bars 	= np.broadcast_to(np.arange(self.par['n_b'])[:,np.newaxis],self.bar_dofs.shape)
+
+	return sp.csr_matrix((np.ones(np.sum(mask)),(np.asarray(self.bar_dofs)[mask],bars[mask])),
+				shape=(self.par['n_fn']*self.par['dim'],self.par['n_b']))
+
+def group_pattern(self):
+	'''Pattern [bar,design variable] of the linked diameters.'''
+
+	group 	= np.arange(self.par['n_b']) if self.bar_group is None else self.bar_group
+
+	return sp.csr_matrix((np.ones(self.par['n_b']),(np.arange(self.par['n_b']),group)),
+				shape=(self.par['n_b'],self.par['n_g']))
+
+def case_pattern(self,diam,disloc,case_major):
+	'''Pattern of constraints with one block of rows per load case from the
+	pattern diam [row,design variable] and disloc [row,dof] of one block.
+
+	The rows of the load cases are interleaved with stride n_lc (case_major = False)
+	or consecutive (case_major = True); the displacements are always interleaved.'''
+
+	n_lc 		= self.par['n_lc']
+	n_rows 		= diam.shape[0]
+
+	diam 		= diam.tocoo()
+	disloc 		= disloc.tocoo()
+	cases 		= np.arange(n_lc)[:,np.newaxis]
+
+	def rows(row):
+		return (cases*n_rows+row if case_major else row*n_lc+cases).ravel()
+
+	out_rows 	= np.concatenate((rows(diam.row),rows(disloc.row)))
+	out_cols 	= np.concatenate((np.broadcast_to(diam.col,(n_lc,len(diam.col))).ravel(),
+					  (self.par['n_g']+disloc.col*n_lc+cases).ravel()))
+
+	return sp.csr_matrix((np.ones(len(out_rows)),(out_rows,out_cols)),shape=(n_lc*n_rows,self.par['n_var']))
+
+def jacobian_pattern(self):
+	'''Structural sparsity pattern [constraint,variable] of constraints() of the
+	current problem, i.e. without vanishing constraints for ALM; cached until the
+	problem sizes change.'''
+
+	key = ('pattern',self.method_ALM)
+
+	if key in self.jac_cache:
+		return self.jac_cache[key]
+
+	bar_dofs 	= dof_bar_pattern(self)
+	groups 		= group_pattern(self)
+
+	#compliance: external forces of the load cases
+	dofs,cases 	= np.nonzero(self.work['forces'])
+	blocks 		= [sp.csr_matrix((np.ones(len(dofs),dtype=bool),(cases,self.par['n_g']+dofs*self.par['n_lc']+cases)),
+					shape=(self.par['n_lc'],self.par['n_var']))]
+
+	#equilibrium: bars at the degree of freedom and the stiffness pattern
+	blocks.append(case_pattern(self,bar_dofs @ groups,stiffness_pattern(self),False))
+
+	if not self.method_ALM:
+		blocks.append(vanishing_pattern(self))
+
+	pattern 	= sp.csr_matrix(sp.vstack(blocks),dtype=bool)
+	pattern.sort_indices()
+
+	self.jac_cache[key] = pattern
+
+	return pattern
+
+def vanishing_pattern(self):
+	'''Structural sparsity pattern [constraint,variable] of vanishing().'''
+
+	n_sb 		= self.par['n_sb']
+
+	#diameter
+	diam 		= sp.hstack((sp.identity(self.par['n_g']),sp.csr_matrix((self.par['n_g'],self.par['n_dl']))))
+
+	#stress: bars of the (aggregated) stress constraints
+	bars 		= np.arange(n_sb) if self.stress_bars is None else self.stress_bars
+	rows 		= self.agg_index if self.par_agg['active'] else np.arange(n_sb)
+	stress_bars 	= sp.csr_matrix((np.ones(n_sb),(rows,bars)),shape=(self.par['n_sc'],self.par['n_b']))
+
+	stress 		= case_pattern(self,stress_bars @ group_pattern(self),
+					stress_bars @ dof_bar_pattern(self).T,True)
+
+	return sp.csr_matrix(sp.vstack((diam,stress)),dtype=bool)
+
+#---------------------------------------------------------------------------------------#
+#		Graph-coloured finite differences
+#---------------------------------------------------------------------------------------#
+
+def color_columns(pattern):
+	'''Greedy colouring (largest degree first) of the columns of pattern such that
+	columns of the same colour have no row in common, i.e. are structurally orthogonal.'''
+
+	pattern 	= sp.csr_matrix(pattern,dtype=float)
+	adjacency 	= sp.csr_matrix(pattern.T @ pattern)
+
+	out_colors 	= -np.ones((pattern.shape[1]),dtype=np.int64)
+	order 		= np.argsort(-np.diff(adjacency.indptr),kind='stable')
+
+	for col in order:
+
+		used 		= out_colors[adjacency.indices[adjacency.indptr[col]:adjacency.indptr[col+1]]]
+
+		#smallest colour not used by a neighbour
+		free 		= np.ones((len(used)+1),dtype=bool)
+		free[used[(used >= 0) & (used < len(free))]] = False
+		out_colors[col] = np.argmax(free)
+
+	return out_colors
+
+def sparse_differences(func,x,pattern,colors,step=None):
+	'''Values of the Jacobian of func at the nonzeros of pattern (in the order of
+	pattern.tocoo()) by central differences with 2 evaluations of func per colour.
+
+	Parameters:
+	-----------
+	func: function
+		vector-valued function of x
+	pattern: sparse matrix
+		sparsity pattern [output,variable] of the Jacobian
+	colors: array
+		colour of every column, see color_columns()
+	step: array, default = None
+		step sizes; eps^(1/3)*max(1,|x_j|) if None
+	'''
+
+	x 		= np.asarray(x,dtype=float)
+	pattern 	= sp.csr_matrix(pattern).tocoo()
+
+	if step is None:
+		step 	= np.finfo(float).eps**(1/3)*np.maximum(1,np.abs(x))
+
+	out_values 	= np.zeros((pattern.nnz))
+	entry_colors 	= colors[pattern.col]
+
+	for color in range(np.max(colors,initial=-1)+1):
+
+		direction 		= np.where(colors == color,step,0)
+
+		#func may return a work buffer overwritten by the next call
+		diff 			= np.array(func(x+direction))
+		diff 		       -= func(x-direction)
+
+		entries 		= entry_colors == color
+		out_values[entries] 	= diff[pattern.row[entries]]/(2*step[pattern.col[entries]])
+
+	return out_values
+
+def detect_pattern(func,x,n_points=2,seed=None):
+	'''Sparsity pattern of the Jacobian of func detected by forward differences
+	in all directions at n_points random points near x.'''
+
+	rng 		= np.random.default_rng(seed)
+	x 		= np.asarray(x,dtype=float)
+	step 		= np.sqrt(np.finfo(float).eps)*np.maximum(1,np.abs(x))
+
+	out_pattern 	= None
+
+	for num_point in range(n_points):
+
+		point 	= x + rng.uniform(0.5,1.5,len(x))*np.maximum(np.abs(x),1e-2)*(1 if num_point > 0 else 0)
+		base 	= np.array(func(point))
+		columns = []
+
+		for num_var in range(len(x)):
+
+			direction 		= np.zeros((len(x)))
+			direction[num_var] 	= step[num_var]
+
+			columns.append(sp.csc_matrix((np.asarray(func(point+direction))-base != 0)[:,np.newaxis]))
+
+		pattern 	= sp.hstack(columns)
+		out_pattern 	= pattern if out_pattern is None else out_pattern + pattern
+
+	return sp.csr_matrix(out_pattern,dtype=bool)
+
+#---------------------------------------------------------------------------------------#
+#		Jacobians
+#---------------------------------------------------------------------------------------#
+
+def constraint_pattern(self):
+	'''Sparsity pattern of constraints() passed to Ipopt via jacobianstructure().'''
+
+	pattern = self.par_deriv['pattern']
+
+	if self.par_deriv['kind'] == 'analytic' or pattern is None:
+		return jacobian_pattern(self)
+
+	if isinstance(pattern,str):
+
+		key = ('detect',self.method_ALM)
+
+		if key not in self.jac_cache:
+			x = np.concatenate((group_diameters(self,self.bar_diam),np.zeros((self.par['n_dl']))))
+			self.jac_cache[key] = detect_pattern(self.constraints,x)
+
+		return self.jac_cache[key]
+
+	if pattern.shape != (len(self.limits()[0]),self.par['n_var']):
+		raise ValueError('pattern must have the shape [#constraints,#variables]!')
+
+	return pattern
+
+def fd_colors(self,pattern,key):
+	'''Colours of the columns of pattern; cached under key.'''
+
+	if key not in self.jac_cache:
+		self.jac_cache[key] = color_columns(pattern)
+
+	return self.jac_cache[key]
+
+def jacobian_buffers(self):
+	'''Work buffer of the values of the nonzeros of constraint_pattern();
+	cached until the problem sizes change.'''
+
+	key = ('buffers',self.method_ALM)
+
+	if key not in self.jac_cache:
+		self.jac_cache[key] = np.zeros((constraint_pattern(self).nnz))
+
+	return self.jac_cache[key]
+
+def pattern_positions(pattern,rows,cols):
+	'''Positions of the entries (rows,cols) in the values of the sparse pattern (CSR order).'''
+
+	pattern = sp.csr_matrix(pattern)
+	pattern.sort_indices()
+
+	keys 	= np.repeat(np.arange(pattern.shape[0],dtype=np.int64),np.diff(pattern.indptr))*pattern.shape[1] + \
+			pattern.indices
+	query 	= np.asarray(rows,dtype=np.int64)*pattern.shape[1] + cols
+
+	out_positions = np.minimum(np.searchsorted(keys,query),max(len(keys)-1,0))
+
+	if query.size > 0 and np.any(keys[out_positions] != query):
+		raise ValueError('entries outside of the sparsity pattern!')
+
+	return out_positions
+
+def jacobian_positions(self):
+	'''Positions of the entries of the analytic Jacobian blocks in the values of
+	jacobian_pattern(); cached until the problem sizes change.'''
+
+	key = ('positions',self.method_ALM)
+
+	if key in self.jac_cache:
+		return self.jac_cache[key]
+
+	pattern 		= jacobian_pattern(self)
+
+	n_lc 			= self.par['n_lc']
+	n_dl 			= self.par['n_dl']
+	n_g 			= self.par['n_g']
+
+	#compliance: external forces of the load cases
+	dofs,cases 		= np.nonzero(self.work['forces'])
+	mask,diam,stiff 	= nonlinear_structure(self)
+
+	out_positions 		= {'linear':	pattern_positions(pattern,cases,n_g+dofs*n_lc+cases),
+				   'forces':	(dofs,cases),
+				   'mask':	mask,
+				   'diam':	pattern_positions(pattern,n_lc+diam[0],diam[1]),
+				   'stiff':	pattern_positions(pattern,n_lc+stiff[0],stiff[1]),
+				   }
+
+	if not self.method_ALM:
+
+		mask,diam,disloc 		= vanishing_structure(self)
+		offset 				= n_lc+n_dl
+
+		out_positions['van diam'] 	= pattern_positions(pattern,offset+np.arange(n_g),np.arange(n_g))
+		out_positions['stress mask'] 	= mask
+		out_positions['stress diam'] 	= pattern_positions(pattern,offset+diam[0],diam[1])
+		out_positions['stress disloc'] 	= pattern_positions(pattern,offset+disloc[0],disloc[1])
+
+	self.jac_cache[key] = out_positions
+
+	return out_positions
+
+def linear_values(self,rows,cols):
+	'''Entries (rows,cols) of linear() without forming it.'''
+
+	n_g 		= self.par['n_g']
+	n_lc 		= self.par['n_lc']
+
+	disloc 		= (cols >= n_g) & ((cols-n_g)%n_lc == rows)
+	out_values 	= np.zeros((len(rows)))
+
+	out_values[disloc] = self.work['forces'][(cols[disloc]-n_g)//n_lc,rows[disloc]]
+
+	return out_values
+
+def constraint_jacobian(self,x):
+	'''Values of the Jacobian of constraints() at the nonzeros of constraint_pattern();
+	the returned work buffer is overwritten by the next call.'''
+
+	out_jac 	= jacobian_buffers(self)
+
+	if self.par_deriv['kind'] == 'analytic':
+
+		#the blocks are written to their entries of the values, no dense blocks are formed
+		positions 	= jacobian_positions(self)
+		out_jac[:] 	= 0
+
+		out_jac[positions['linear']] = self.work['forces'][positions['forces']]
+
+		blocks,stiff_values = nonlinear_jacobian_values(self,x)
+
+		for num_case,block in enumerate(blocks):
+			np.add.at(out_jac,positions['diam'][num_case],block[positions['mask']])
+			out_jac[positions['stiff'][num_case]] = stiff_values
+
+		if not self.method_ALM:
+
+			diam_values,blocks 		= vanishing_jacobian_values(self,x)
+			out_jac[positions['van diam']] 	= diam_values
+
+			for num_case,block in enumerate(blocks):
+				np.add.at(out_jac,positions['stress diam'][num_case],block[0])
+				np.add.at(out_jac,positions['stress disloc'][num_case],block[1][positions['stress mask']])
+
+		return out_jac
+
+	#the compliance rows are linear and taken from linear();
+	#finite differences for all other rows
+	pattern 	= constraint_pattern(self).tocoo()
+	n_lc 		= self.par['n_lc']
+	lin_rows 	= pattern.row < n_lc
+
+	fd_pattern 	= sp.csr_matrix(constraint_pattern(self)[n_lc:])
+	colors 		= fd_colors(self,fd_pattern,('colors',self.method_ALM))
+
+	out_jac[lin_rows] 	= linear_values(self,pattern.row[lin_rows],pattern.col[lin_rows])
+	out_jac[~lin_rows] 	= sparse_differences(lambda y: self.constraints(y)[n_lc:],x,fd_pattern,colors)
+
+	return out_jac
+
+def vanishing_matrix(self,x):
+	'''Sparse Jacobian [constraint,variable] of vanishing().'''
+
+	if self.par_deriv['kind'] == 'analytic':
+
+		n_g 			= self.par['n_g']
+
+		mask,diam,disloc 	= vanishing_structure(self)
+		diam_values,blocks 	= vanishing_jacobian_values(self,x)
+
+		rows 			= [np.arange(n_g)]
+		cols 			= [np.arange(n_g)]
+		values 			= [diam_values]
+
+		for num_case,block in enumerate(blocks):
+			rows   += [diam[0][num_case],disloc[0][num_case]]
+			cols   += [diam[1],disloc[1][num_case]]
+			values += [block[0],block[1][mask]]
+
+		#duplicate entries of aggregated constraints are summed
+		return sp.csr_matrix((np.concatenate(values),(np.concatenate(rows),np.concatenate(cols))),
+					shape=(self.par['n_van'],self.par['n_var']))
+
+	pattern 	= vanishing_pattern(self)
+	colors 		= fd_colors(self,pattern,'vanishing colors')
+
+	return sp.csr_matrix((sparse_differences(self.vanishing,x,pattern,colors),
+				(pattern.tocoo().row,pattern.tocoo().col)),shape=pattern.shape)
+
+def constraint_matrix(self,x):
+	'''Sparse Jacobian [constraint,variable] of constraints().'''
+
+	pattern = constraint_pattern(self).tocoo()
+
+	return sp.csr_matrix((constraint_jacobian(self,x),(pattern.row,pattern.col)),shape=pattern.shape)
@@ -0,0 +1,234 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.optimize import linprog
+
+from .update import *
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Load case envelope
+#---------------------------------------------------------------------------------------#
+
+def case_forces(self):
+	'''Forces of all load cases on the free nodes; [dof,case].'''
+
+	return np.asarray(self.load_cases[self.free_nodes],dtype=float).reshape(
+				self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+
+def envelope_cases(self,dominance=True,cluster=None,tol=1e-9):
+	'''Load cases spanning the envelope of all load cases.
+
+	Displacements and stresses are linear in the loads and the compliance is
+	quadratic, hence a load case F = sum_k l_k*F_k with sum_k |l_k| <= 1 can
+	neither exceed the maximum stress nor the maximum compliance of the cases
+	F_k for any design. Such cases are removed in this order:
+	duplicates and scaled copies (|l| <= 1) of another case ('proportional',
+	'duplicate' for l = 1), zero cases and cases dominated by several other
+	cases ('dominated', one LP per case). Loads on fixed nodes are ignored.
+
+	Parameters:
+	-----------
+	dominance: bool, default = True
+		Check dominance by several cases, i.e. solve the LPs.
+	cluster: float, default = None
+		Also replace cases within a relative distance cluster of a
+		larger case by it ('clustered'). Not exact, see envelope().
+	tol: float, default = 1e-9
+		relative tolerance of the comparisons
+
+	Returns the indices of the remaining cases and the reason of the removal of
+	every case ('' for remaining cases).
+	'''
+
+	forces 		= case_forces(self)
+	norms 		= np.linalg.norm(forces,axis=0)
+	scale 		= max(np.max(norms,initial=0),1e-300)
+
+	out_reasons 	= np.array(['']*self.par['n_lc'],dtype=object)
+
+	#largest cases first, such that every case is compared with larger ones
+	order 		= np.argsort(-norms,kind='stable')
+	kept 		= []
+
+	for case in order:
+
+		if norms[case] <= tol*scale:
+			out_reasons[case] = 'dominated'
+			continue
+
+		for other in kept:
+
+			#scale of the projection on the other case and distance to it
+			factor 		= np.dot(forces[:,case],forces[:,other])/norms[other]**2
+			distance 	= np.linalg.norm(forces[:,case]-factor*forces[:,other])
+
+			if distance <= tol*norms[case] and abs(factor) <= 1+tol:
+				out_reasons[case] = 'duplicate' if abs(factor-1) <= tol else 'proportional'
+				break
+
+			if cluster is not None and np.linalg.norm(forces[:,case]-forces[:,other]) <= cluster*norms[other]:
+				out_reasons[case] = 'clustered'
+				break
+
+		else:
+			kept.append(case)
+
+	#dominance by several cases, smallest cases first
+	if dominance:
+
+		for case in kept[::-1]:
+
+			others = [other for other in kept if other != case]
+
+			if len(others) > 1 and in_envelope(forces[:,case],forces[:,others],tol):
+				out_reasons[case] = 'dominated'
+				kept.remove(case)
+
+	return np.sort(np.array(kept,dtype=np.int64)),out_reasons
+
+def in_envelope(force,forces,tol=1e-9):
+	'''True if force = forces @ l with sum |l| <= 1, i.e. force lies in the
+	symmetric convex hull of the columns of forces; solved as LP
+
+	min sum(l^+ + l^-)  s.t.  forces @ (l^+ - l^-) = force,  l^+,l^- >= 0.'''
+
+	n_cases = forces.shape[1]
+
+	A_eq 	= sp.hstack((sp.csr_matrix(forces),-sp.csr_matrix(forces)))
+	result 	= linprog(np.ones(2*n_cases),A_eq=A_eq,b_eq=force,bounds=(0,None),method='highs')
+
+	return bool(result.success and result.fun <= 1+tol)
+
+#---------------------------------------------------------------------------------------#
+#		Verification against all load cases
+#---------------------------------------------------------------------------------------#
+
+def case_violations(self,x):
+	'''Maximum violation of the compliance, equilibrium and stress constraints of every load case.'''
+
+	n_lc 		= self.par['n_lc']
+	n_dl 		= self.par['n_dl']
+
+	method_ALM 	= self.method_ALM
+	self.method_ALM = False
+
+	try:
+		cl,cu 		= self.limits()
+		constr 		= np.array(self.constraints(np.asarray(x,dtype=float)))
+
+	finally:
+		self.method_ALM = method_ALM
+
+	viol 		= np.maximum(np.maximum(cl-constr,constr-cu),0)
+
+	out_violation 	= viol[:n_lc]
+	out_violation 	= np.maximum(out_violation,np.max(viol[n_lc:n_lc+n_dl].reshape(-1,n_lc),axis=0,initial=0))
+	out_violation 	= np.maximum(out_violation,np.max(viol[n_lc+n_dl+self.par['n_g']:].reshape(n_lc,-1),axis=1,initial=0))
+
+	return out_violation
+
+def select_cases(self,load_cases,active,previous,x):
+	'''Use the load cases active of load_cases and map the solution x for the
+	load cases previous to them; new load cases start in equilibrium.'''
+
+	position 	= -np.ones((load_cases.shape[-1]),dtype=np.int64)
+	position[previous] = np.arange(len(previous))
+
+	self.load_cases = load_cases[...,active]
+
+	return update_load_cases(self,x,position[active])
+
+#---------------------------------------------------------------------------------------#
+#		Solve on the envelope
+#---------------------------------------------------------------------------------------#
+
+def solve_envelope(self,method='direct',dominance=True,cluster=None,verify=True,tol=1e-6,max_rounds=10,**kwargs):
+	'''Solve with the envelope load cases; see Truss.envelope().'''
+
+	if 'eta0' in kwargs:
+		raise KeyError('key eta0 not known!')
+
+	if int(max_rounds) < 1:
+		raise ValueError('max_rounds must be at least 1!')
+
+	alm 		= method in ['ALM','alm']
+	load_cases 	= self.load_cases
+	every 		= np.arange(self.par['n_lc'])
+
+	active,reasons 	= envelope_cases(self,dominance,cluster)
+
+	if self.verbose:
+		print('load cases\t',len(active),'/',len(every),'\tremoved\t',
+			{reason:int(np.sum(reasons == reason)) for reason in set(reasons) if reason})
+
+	x 		= kwargs.pop('x0',None)
+	rounds 		= []
+
+	try:
+
+		x 	= select_cases(self,load_cases,active,every,x)
+
+		for num_round in range(int(max_rounds)):
+
+			start_time 	= time.time()
+
+			if x is not None:
+				kwargs['x0'] = x
+
+			out 		= self.solve(method,**kwargs)
+			x 		= out if alm else out[0]
+
+			#solution for all load cases, removed cases in equilibrium
+			x 		= select_cases(self,load_cases,every,active,x)
+			violations 	= case_violations(self,x)
+
+			added 		= np.setdiff1d(np.nonzero(violations > tol)[0],active) if verify else np.zeros(0,dtype=np.int64)
+
+			rounds.append({'cases':		active,
+				       'added':		added,
+				       'volume':	self.volume(x),
+				       'violation':	np.max(violations,initial=0),
+				       'time':		time.time()-start_time,
+				       })
+
+			if self.verbose:
+				print('round\t',num_round,'\tcases\t',len(active),'\tvolume\t',rounds[-1]['volume'],
+					'\tviolation\t',rounds[-1]['violation'],'\tadded\t',len(added))
+
+			#x stays the solution for all load cases if no further round is run
+			if len(added) == 0 or num_round == int(max_rounds)-1:
+				break
+
+			#re-add the violated load cases
+			active 		= np.union1d(active,added)
+			reasons[added] 	= ''
+
+			x 		= select_cases(self,load_cases,active,every,x)
+
+	finally:
+		#the truss keeps all load cases
+		resized 	= self.par['n_lc'] != len(every) or self.load_cases.shape[-1] != len(every)
+		self.load_cases = load_cases
+
+		if resized:
+			update_load_cases(self,None,every)
+
+	return x,{'cases':active,'reasons':reasons,'rounds':rounds}
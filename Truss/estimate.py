@@ -0,0 +1,234 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+#floating point operations per second assumed for the estimated time per iteration
+ESTIMATE_FLOPS 	= 1e9
+
+#history of the limited-memory Hessian approximation of Ipopt (limited_memory_max_history)
+LBFGS_HISTORY 	= 6
+
+#nonzeros of the sparse factorization of the KKT matrix relative to the nonzeros
+#of the KKT matrix (fill-in of the linear solver of Ipopt)
+KKT_FILL 	= 10
+
+#maximum number of node-pair distances evaluated at once when counting bars
+PAIR_CHUNK 	= 2**22
+
+#---------------------------------------------------------------------------------------#
+#		Estimate
+#---------------------------------------------------------------------------------------#
+
+def problem_estimate(dim,n_n,n_fn,n_lc,n_b,n_g,n_sb,n_sc,sum_free,sum_free_sq):
+	'''Sizes, memory and cost of the optimization problem.
+
+	Parameters:
+	-----------
+	dim, n_n, n_fn, n_lc: int
+		dimension, number of nodes, free nodes and load cases
+	n_b, n_g, n_sb, n_sc: int
+		number of bars, diameter variables, bars with stress constraints
+		and stress constraints per load case
+	sum_free, sum_free_sq: int
+		sum over all bars of the number of free degrees of freedom
+		of the end nodes and of its square
+	'''
+
+	n_dof 		= n_fn*dim
+	n_dl 		= n_dof*n_lc
+	n_var 		= n_g+n_dl
+	n_van 		= n_g+n_sc*n_lc
+
+	#constraints: compliance, equilibrium and, except for ALM, vanishing constraints
+	n_constr 	= {'direct':	 n_lc+n_dl+n_van,
+			   'relaxation': n_lc+n_dl+n_van,
+			   'ALM':	 n_lc+n_dl,
+			   }
+
+	#structural nonzeros; the stiffness pattern is bounded by the per-bar blocks
+	nnz_stiff 	= min(sum_free_sq,n_dof**2)
+	free_stress 	= sum_free*n_sb/max(n_b,1)
+
+	nnz_jac 	= {'linear':	 n_lc*n_dof,
+			   'nonlinear':	 n_lc*(sum_free+nnz_stiff),
+			   'vanishing':	 int(n_g+n_lc*(n_sb+free_stress)),
+			   }
+	nnz_jac['direct'] 	= sum(nnz_jac.values())
+	nnz_jac['ALM'] 		= nnz_jac['linear']+nnz_jac['nonlinear']
+
+	#lower triangle of the Hessian of the Lagrangian (diameter-displacement and
+	#displacement-displacement couplings of the bars)
+	nnz_hess 	= int(n_g+n_lc*(2*sum_free+(nnz_stiff+n_dof)/2))
+
+	#KKT matrix of Ipopt (lower triangle): diagonal and Jacobian, the limited-memory
+	#Hessian approximation is applied as low-rank update
+	n_kkt 		= n_var+n_constr['direct']
+	nnz_kkt 	= n_kkt+nnz_jac['direct']
+	nnz_factor 	= KKT_FILL*nnz_kkt
+
+	bytes_float 	= 8
+	bytes_index 	= 4
+
+	memory 		= {'bars':		 n_b*2*bytes_float,
+			   'bar_lengths':	 n_b*bytes_float,
+			   'bar_angles':	 n_n*dim*n_b*bytes_float,
+			   'bar_dofs':		 n_b*2*dim*bytes_float,
+			   'bar_cosines':	 n_b*2*dim*bytes_float,
+			   #sparse stiffness matrix (CSR)
+			   'stiffness_matrix':	 nnz_stiff*(bytes_float+bytes_index)+(n_dof+1)*bytes_index,
+			   #patterns of the stiffness matrix and the Jacobian, positions of the entries
+			   'patterns':		 nnz_stiff*(1+bytes_index+bytes_float)+nnz_jac['direct']*(1+bytes_index+bytes_float),
+			   #values of the nonzeros of the Jacobian
+			   'jacobian':		 nnz_jac['direct']*bytes_float,
+			   #forces, displacements, equilibrium and constraints, see work_buffers()
+			   'work':		 (3*n_dl+n_constr['direct']+n_van)*bytes_float,
+			   #per-call blocks: strains, equilibrium [bar,end*dim] and stress [bar,1+end*dim]
+			   'blocks':		 n_lc*(n_b*(1+2*dim)+n_sb*(1+2*dim))*bytes_float,
+			   'kkt_factor':	 nnz_factor*(bytes_float+bytes_index),
+			   'hessian_lbfgs':	 2*LBFGS_HISTORY*n_var*bytes_float,
+			   }
+	#bar_angles is computed on access only
+	memory['geometry'] 	= sum(memory[key] for key in ['bars','bar_lengths','bar_dofs','bar_cosines'])
+
+	memory['peak'] 		= memory['geometry'] + sum(memory[key] for key in ['stiffness_matrix','patterns',
+					'jacobian','work','blocks','kkt_factor','hessian_lbfgs'])
+
+	#floating point operations per iteration
+	flops 		= {#assembly of the sparse stiffness matrix for the constraints and the Jacobian
+			   'stiffness':		 2*sum_free_sq,
+			   'constraints':	 2*n_lc*nnz_stiff + 2*n_b*n_lc*(2*dim+2),
+			   'jacobian':		 2*nnz_jac['direct'],
+			   #central differences of numdifftools with Richardson extrapolation
+			   'gradient':		 8*n_var*2*n_b,
+			   #sparse factorization (sum of the squared column counts of the factor) and
+			   #solves for the step and the low-rank update of the Hessian approximation
+			   'kkt':		 nnz_factor**2/max(n_kkt,1) + (1+2*LBFGS_HISTORY)*4*nnz_factor,
+			   }
+	flops['total'] 		= sum(flops.values())
+
+	out_estimate 	= {'n_n':		n_n,
+			   'n_fn':		n_fn,
+			   'n_lc':		n_lc,
+			   'n_b':		n_b,
+			   'n_g':		n_g,
+			   'n_dl':		n_dl,
+			   'n_var':		n_var,
+			   'n_van':		n_van,
+			   'constraints':	n_constr,
+			   'jacobian_nnz':	nnz_jac,
+			   'jacobian_dense':	n_constr['direct']*n_var,
+			   'hessian_nnz':	nnz_hess,
+			   'memory':		memory,
+			   'flops':		flops,
+			   'time_per_iter':	flops['total']/ESTIMATE_FLOPS,
+			   }
+
+	return out_estimate
+
+def estimate(self):
+	'''Estimate of the optimization problem of the truss.'''
+
+	free_dofs 	= np.sum(self.bar_dofs >= 0,axis=1)
+
+	return problem_estimate(self.par['dim'],self.par['n_n'],self.par['n_fn'],self.par['n_lc'],
+				self.par['n_b'],self.par['n_g'],self.par['n_sb'],self.par['n_sc'],
+				int(np.sum(free_dofs)),int(np.sum(free_dofs**2)))
+
+def estimate_problem(nodes,fixed_nodes,load_cases,bars=None,max_length=1e6):
+	'''Estimate of the optimization problem without building the ground structure.
+
+	Without bars, all pairs of nodes within max_length that are not both fixed are
+	counted; bars containing other nodes are not removed, so the estimate is an upper
+	bound. Linked bars and aggregated constraints are not taken into account.
+
+	Parameters:
+	-----------
+	nodes, fixed_nodes, load_cases, bars, max_length:
+		as for Truss
+	'''
+
+	nodes 		= np.asarray(nodes,dtype=float)
+	n_n,dim 	= nodes.shape
+
+	free 		= np.ones((n_n),dtype=bool)
+	free[np.asarray(fixed_nodes,dtype=np.int64)] = False
+
+	n_fn 		= int(np.sum(free))
+	n_lc 		= np.shape(load_cases)[-1]
+
+	n_b 		= 0
+	sum_free 	= 0
+	sum_free_sq 	= 0
+
+	if bars is None:
+
+		chunk 	= max(1,PAIR_CHUNK//max(1,n_n))
+
+		for start in range(0,n_n,chunk):
+
+			rows 	= np.arange(start,min(start+chunk,n_n))
+			dist 	= np.linalg.norm(nodes[rows,np.newaxis,:]-nodes[np.newaxis,:,:],axis=2)
+
+			#pairs i < j within max_length and not both fixed
+			pairs 	= (np.arange(n_n)[np.newaxis,:] > rows[:,np.newaxis]) & (dist <= max_length) & \
+					(free[rows,np.newaxis] | free[np.newaxis,:])
+
+			free_ends 	= free[rows,np.newaxis].astype(int) + free[np.newaxis,:]
+			free_dofs 	= dim*free_ends[pairs]
+
+			n_b 		+= len(free_dofs)
+			sum_free 	+= int(np.sum(free_dofs))
+			sum_free_sq 	+= int(np.sum(free_dofs**2))
+
+	else:
+
+		bars 		= np.asarray(bars,dtype=np.int64)
+		free_dofs 	= dim*np.sum(free[bars],axis=1)
+
+		n_b 		= len(bars)
+		sum_free 	= int(np.sum(free_dofs))
+		sum_free_sq 	= int(np.sum(free_dofs**2))
+
+	return problem_estimate(dim,n_n,n_fn,n_lc,n_b,n_b,n_b,n_b,sum_free,sum_free_sq)
+
+#---------------------------------------------------------------------------------------#
+#		Report
+#---------------------------------------------------------------------------------------#
+
+def print_estimate(estimate):
+
+	def size(num_bytes):
+		for unit in ['B','KB','MB','GB','TB']:
+			if num_bytes < 1024 or unit == 'TB':
+				return '%.1f %s' % (num_bytes,unit)
+			num_bytes /= 1024
+
+	print()
+	print('----------------------------------')
+	print('bars\t\t',estimate['n_b'])
+	print('displacements\t',estimate['n_dl'])
+	print('variables\t',estimate['n_var'])
+	for method,n_constr in estimate['constraints'].items():
+		print('constraints\t',n_constr,'\t(%s)' % method)
+	print('jacobian nnz\t',estimate['jacobian_nnz']['direct'],'\t(dense %d)' % estimate['jacobian_dense'])
+	print('hessian nnz\t',estimate['hessian_nnz'])
+	print('geometry\t',size(estimate['memory']['geometry']))
+	print('jacobian\t',size(estimate['memory']['jacobian']))
+	print('kkt factor\t',size(estimate['memory']['kkt_factor']))
+	print('peak memory\t',size(estimate['memory']['peak']))
+	print('time/iter\t','%.3g s' % estimate['time_per_iter'])
+	print('----------------------------------')
+	print()
@@ -26,7 +26,7 @@ def objective(self,x):
 
 	#x = [bar_diam,node_disloc]
 
-	bar_diam 	= x[0:self.par['n_b']]
+	bar_diam 	= bar_diameters(self,x)
 	out_objective 	= np.dot(bar_diam,self.bar_lengths)
 
 	return out_objective
@@ -43,9 +43,14 @@ def gradient(self,x):
 
 def augmented_lagrangian(self,x):
 
-	out_augmented_lagrangian = np.max((np.zeros((self.par['n_b']*(self.par['n_lc']+1))),
-					self.vanishing(x) + self.par_ALM['eta']/self.par_ALM['alpha']),axis=0)
-	out_augmented_lagrangian = 0.5*self.par_ALM['alpha']*np.sum(out_augmented_lagrangian**2,axis=0)
+	#0.5*alpha*|max(0,GH+eta/alpha)|^2 = 0.5/alpha*|max(0,alpha*GH+eta)|^2,
+	#evaluated in place in the work buffer of the vanishing constraints
+	shifted 	= self.vanishing(x)
+	shifted        *= self.par_ALM['alpha']
+	shifted        += self.par_ALM['eta']
+	np.maximum(shifted,0,out=shifted)
+
+	out_augmented_lagrangian = 0.5/self.par_ALM['alpha']*np.dot(shifted,shifted)
 
 	return out_augmented_lagrangian
 
@@ -53,19 +58,33 @@ def augmented_lagrangian(self,x):
 #		Linear constraints (compliance)
 #---------------------------------------------------------------------------------------#
 
-def linear(self):
+def linear(self,out=None):
 
-	outer_forces = self.load_cases[self.free_nodes]
-	outer_forces = outer_forces.reshape(self.par['n_fn']*self.par['dim'],1,self.par['n_lc']).T
+	#x = [bar_diam,node_disloc], node_disloc[node,dim,case]
+	outer_forces = self.work['forces']
 
-	out_A = np.zeros((self.par['n_lc'],self.par['n_var']))
+	#only the displacement columns are written, all other entries of out are zero
+	out_A = np.zeros((self.par['n_lc'],self.par['n_var'])) if out is None else out
 
-	for num_case in range(self.par['n_lc']):
-		out_A[num_case,self.par['n_b']+num_case*self.par['n_fn']*self.par['dim']: \
-			self.par['n_b']+(num_case+1)*self.par['n_fn']*self.par['dim']] = outer_forces[num_case]
+	for num_case,row in enumerate(map_load_cases(self,linear_case,outer_forces)):
+		out_A[num_case,self.par['n_g']+num_case::self.par['n_lc']] = row
 
 	return out_A
 
+def compliance(self,x,out=None):
+	'''Compliance F_{ext}^T*u of all load cases, i.e. linear() @ x.'''
+
+	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+
+	if out is None:
+		out = np.zeros((self.par['n_lc']))
+
+	return np.einsum('ij,ij->j',self.work['forces'],node_disloc,out=out)
+
+def linear_case(self,num_case,outer_forces):
+
+	return outer_forces[:,num_case]
+
 def linear_limits(self):
 
 	out_bl = np.ones((self.par['n_lc']))*(-1e19)
@@ -77,28 +96,90 @@ def linear_limits(self):
 #		Nonlinear constraints (force equilibrium)
 #---------------------------------------------------------------------------------------#
 
-def nonlinear(self,x):
+def nonlinear(self,x,out=None):
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
-	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn'],self.par['dim'],self.par['n_lc'])
+	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+
+	#sparse stiffnes matrix
+	stiff_mat 	= sparse_stiffness(self,x)
+
+	#displacements and forces of every load case as contiguous rows [case,dof]
+	disloc 		= self.work['disloc']
+	forces 		= self.work['equil']
 
-	#stiffnes matrix
-	stiff_mat 	= stiffness_matrix(self,x)
+	np.copyto(disloc,node_disloc.T)
 
-	#nonlinear constraints
-	out_c  		= np.zeros((self.par['n_fn']*self.par['dim'],self.par['n_lc']))
+	map_load_cases(self,nonlinear_case,stiff_mat,disloc,forces)
 
-	for num_case in range(self.par['n_lc']):
-		out_c[:,num_case] = np.dot(stiff_mat,node_disloc[:,:,num_case].reshape(self.par['n_fn']*self.par['dim']))
+	#nonlinear constraints; rows of a load case are interleaved with stride n_lc
+	out_c 		= np.zeros((self.par['n_dl'])) if out is None else out
 
-	out_c 		= out_c.reshape(self.par['n_dl'])
+	np.copyto(out_c.reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc']),forces.T)
 
 	return out_c
 
+def nonlinear_case(self,num_case,stiff_mat,disloc,forces):
+
+	forces[num_case] = stiff_mat @ disloc[num_case]
+
+def nonlinear_jacobian(self,x,out=None):
+	'''Dense Jacobian of the equilibrium constraints written to out.'''
+
+	out_jac 		= np.zeros((self.par['n_dl'],self.par['n_var'])) if out is None else out
+	out_jac[...] 		= 0
+
+	mask,diam,stiff 	= nonlinear_structure(self)
+	blocks,stiff_values 	= nonlinear_jacobian_values(self,x)
+
+	for num_case,block in enumerate(blocks):
+		np.add.at(out_jac,(diam[0][num_case],diam[1]),block[mask])
+		out_jac[stiff[0][num_case],stiff[1][num_case]] = stiff_values
+
+	return out_jac
+
+def nonlinear_structure(self):
+	'''Rows [case,entry] and columns of the entries of the equilibrium Jacobian:
+	the derivatives with respect to the diameters at the free degrees of freedom
+	(mask) of the bars and the nonzeros of the stiffness matrix in CSR order.'''
+
+	n_lc 		= self.par['n_lc']
+	n_dof 		= self.par['n_fn']*self.par['dim']
+	cases 		= np.arange(n_lc)[:,np.newaxis]
+
+	#rows and columns of a load case are interleaved with stride n_lc
+	dofs 		= np.asarray(self.bar_dofs)
+	mask 		= dofs >= 0
+	diam_rows 	= dofs[mask]*n_lc + cases
+	diam_cols 	= np.broadcast_to(bar_group_index(self)[:,np.newaxis],dofs.shape)[mask]
+
+	keys 		= stiffness_keys(self)
+	stiff_rows 	= (keys//n_dof)*n_lc + cases
+	stiff_cols 	= self.par['n_g'] + (keys%n_dof)*n_lc + cases
+
+	return mask,(diam_rows,diam_cols),(stiff_rows,stiff_cols)
+
+def nonlinear_jacobian_values(self,x):
+	'''Values of the entries of nonlinear_structure(): [bar,end*dim] per load case
+	and the values of the sparse stiffness matrix.'''
+
+	#x = [bar_diam,node_disloc]
+	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+
+	#sparse stiffnes matrix and elongations of the bars
+	stiff_mat 	= sparse_stiffness(self,x)
+	strain 		= bar_strain(node_disloc,self.bar_dofs,self.bar_cosines)
+
+	return map_load_cases(self,nonlinear_jacobian_case,strain),stiff_mat.data
+
+def nonlinear_jacobian_case(self,num_case,strain):
+
+	#d(K(x)u)/dx_i = E/l_i * a_i * (a_i^T u) at the degrees of freedom of bar i
+	return self.bar_cosines*(self.par['E']/self.bar_lengths*strain[num_case])[:,np.newaxis]
+
 def nonlinear_limits(self):
 
-	outer_forces  = np.moveaxis(self.load_cases[self.free_nodes],-1,0)
+	outer_forces  = self.load_cases[self.free_nodes]
 	outer_forces  =	outer_forces.reshape(self.par['n_fn']*self.par['dim']*self.par['n_lc'])
 
 	out_cl 		= outer_forces
@@ -110,59 +191,136 @@ def nonlinear_limits(self):
 #		Vanishing constraints (minimum diameter and stress)
 #---------------------------------------------------------------------------------------#
 
+def vanishing(self,x,out=None):
+	'''Vanishing constraints [GH_diam,GH_stress] written to out.'''
+
+	if out is None:
+		out = np.zeros((self.par['n_van']))
+
+	van_GH_diam(self,x,out[:self.par['n_g']])
+	van_GH_stress(self,x,out[self.par['n_g']:])
+
+	return out
+
 def van_H(self,x):
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
-	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn'],self.par['dim'],self.par['n_lc'])
+	bar_diam 	= x[0:self.par['n_g']]
 
 	out_H 		= np.tile(bar_diam,self.par['n_lc'])
-	out_jac_H 	= np.tile(np.hstack([np.eye((self.par['n_b'])),np.zeros((self.par['n_b'],self.par['n_dl']))]),
-				(self.par['n_lc'],1))
 
 	return out_H
 
-def van_GH_diam(self,x):
+def van_GH_diam(self,x,out=None):
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
-	
-	out_GH_diam 	= np.tile(self.par['min_diam'],self.par['n_b']) - bar_diam
-	out_GH_diam    *= bar_diam
+	bar_diam 	= x[0:self.par['n_g']]
 
-	out_jac_GH_diam = self.par['min_diam']*np.eye(self.par['n_b']) - 2*bar_diam*np.eye(self.par['n_b'])
-	out_jac_GH_diam = np.hstack((out_jac_GH_diam,np.zeros((self.par['n_b'],self.par['n_dl']))))
+	out_GH_diam 	= np.zeros((self.par['n_g'])) if out is None else out
+
+	np.subtract(self.par['min_diam'],bar_diam,out=out_GH_diam)
+	out_GH_diam    *= bar_diam
 
 	return out_GH_diam
 
-def van_GH_stress(self,x):
+def van_GH_stress(self,x,out=None):
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
-	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn'],self.par['dim'],self.par['n_lc'])
+	bar_diam 	= bar_diameters(self,x)
+	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+
+	out_GH_stress 	= np.zeros((self.par['n_sc']*self.par['n_lc'])) if out is None else out
 
-	out_GH_stress	= np.zeros((self.par['n_lc']*self.par['n_b']))
-	out_jac_GH_stress = np.zeros((self.par['n_lc']*self.par['n_b'],self.par['n_var']))
+	for num_case,block in enumerate(map_load_cases(self,van_GH_stress_case,bar_diam,node_disloc)):
+		out_GH_stress[num_case*self.par['n_sc']:(num_case+1)*self.par['n_sc']] = block
 
-	for num_case in range(self.par['n_lc']):
-		for num_bar in range(self.par['n_b']):
+	return out_GH_stress
+
+def van_GH_stress_case(self,num_case,bar_diam,node_disloc):
 
-			sigma 	= self.par['E']/self.bar_lengths[num_bar] * \
-					np.dot(self.bar_angles[self.free_nodes,:,num_bar].reshape(self.par['n_fn']*self.par['dim']),
-						node_disloc[:,:,num_case].reshape(self.par['n_fn']*self.par['dim']))
+	sigma 		= self.par['E']/self.bar_lengths * \
+				bar_strain(node_disloc[:,num_case:num_case+1],self.bar_dofs,self.bar_cosines)[0]
 
-			out_GH_stress[num_case*self.par['n_b'] + num_bar] = (sigma**2 - self.par['max_stress']**2)*bar_diam[num_bar]
+	out_GH_stress 	= stress_rows(self,(sigma**2 - self.par['max_stress']**2)*bar_diam)
 
-			out_jac_GH_stress[num_case*self.par['n_b']+num_bar,self.par['n_b']+num_case*self.par['n_fn']*self.par['dim']: \
-					self.par['n_b']+(num_case+1)*self.par['n_fn']*self.par['dim']] = \
-					out_GH_stress[num_case*self.par['n_b'] + num_bar] + \
-					2*self.par['E']**2/self.bar_lengths[num_bar] * \
-					np.dot(self.bar_angles[self.free_nodes,:,num_bar].reshape(self.par['n_fn']*self.par['dim']),
-						node_disloc[:,:,num_case].reshape(self.par['n_fn']*self.par['dim'])) * \
-					self.bar_angles[self.free_nodes,:,num_bar].reshape(self.par['n_fn']*self.par['dim'])
+	if self.par_agg['active']:
+		out_GH_stress = aggregate_stress(self,out_GH_stress)[0]
 
 	return out_GH_stress
 
+def vanishing_jacobian(self,x,out=None):
+	'''Dense Jacobian of the vanishing constraints written to out.'''
+
+	out_jac 		= np.zeros((self.par['n_van'],self.par['n_var'])) if out is None else out
+	out_jac[...] 		= 0
+
+	mask,diam,disloc 	= vanishing_structure(self)
+	diam_values,blocks 	= vanishing_jacobian_values(self,x)
+
+	out_jac[np.arange(self.par['n_g']),np.arange(self.par['n_g'])] = diam_values
+
+	for num_case,block in enumerate(blocks):
+		np.add.at(out_jac,(diam[0][num_case],diam[1]),block[0])
+		np.add.at(out_jac,(disloc[0][num_case],disloc[1][num_case]),block[1][mask])
+
+	return out_jac
+
+def vanishing_structure(self):
+	'''Rows [case,entry] and columns of the entries of the stress rows of the
+	vanishing Jacobian: the derivatives with respect to the diameter of every
+	stress bar and to the free degrees of freedom (mask) of its end nodes.
+	The diameter rows are the diagonal of the first n_g rows.'''
+
+	n_lc 		= self.par['n_lc']
+	n_g 		= self.par['n_g']
+	cases 		= np.arange(n_lc)[:,np.newaxis]
+
+	#bars and rows of the (aggregated) stress constraints
+	bars 		= np.arange(self.par['n_b']) if self.stress_bars is None else self.stress_bars
+	rows 		= self.agg_index if self.par_agg['active'] else np.arange(self.par['n_sb'])
+	rows 		= n_g + cases*self.par['n_sc'] + rows
+
+	dofs 		= np.asarray(self.bar_dofs[bars])
+	mask 		= dofs >= 0
+
+	diam_cols 	= bar_group_index(self)[bars]
+	disloc_rows 	= np.broadcast_to(rows[:,:,np.newaxis],(n_lc,)+dofs.shape)[:,mask]
+	disloc_cols 	= n_g + dofs[mask]*n_lc + cases
+
+	return mask,(rows,diam_cols),(disloc_rows,disloc_cols)
+
+def vanishing_jacobian_values(self,x):
+	'''Values of the diagonal of the diameter rows and of the entries of
+	vanishing_structure() per load case.'''
+
+	#x = [bar_diam,node_disloc]
+	bar_diam 	= bar_diameters(self,x)
+	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn']*self.par['dim'],self.par['n_lc'])
+
+	out_diam 	= self.par['min_diam'] - 2*x[0:self.par['n_g']]
+
+	return out_diam,map_load_cases(self,van_GH_stress_jacobian_case,bar_diam,node_disloc)
+
+def van_GH_stress_jacobian_case(self,num_case,bar_diam,node_disloc):
+
+	coef 		= self.par['E']/self.bar_lengths
+	sigma 		= coef*bar_strain(node_disloc[:,num_case:num_case+1],self.bar_dofs,self.bar_cosines)[0]
+
+	#derivatives with respect to the diameter of every stress bar (diagonal in the bars)
+	#and to the displacements of its end nodes [bar,end*dim] for the load case
+	out_jac_diam 	= stress_rows(self,sigma**2 - self.par['max_stress']**2)
+	out_jac_disloc 	= stress_rows(self,(self.bar_cosines*(2*sigma*coef*bar_diam)[:,np.newaxis]).T).T
+
+	if self.par_agg['active']:
+
+		#chain rule for the aggregated constraints
+		weights 	= aggregate_stress(self,stress_rows(self,(sigma**2 - self.par['max_stress']**2)*bar_diam))[1]
+
+		out_jac_diam 	= out_jac_diam*weights
+		out_jac_disloc 	= out_jac_disloc*weights[:,np.newaxis]
+
+	return out_jac_diam,out_jac_disloc
+
 def vanishing_limits(self):
 
 	if self.method_ALM:
@@ -172,17 +330,92 @@ def vanishing_limits(self):
 
 	else:
 
-		out_vl = np.concatenate([np.ones((self.par['n_b']))*(-1e19),
-					 np.ones((self.par['n_b']*self.par['n_lc']))*(-1e19)
-					]) 
-		out_vu = np.concatenate([np.zeros((self.par['n_b'])),
-					 np.zeros((self.par['n_b']*self.par['n_lc']))
+		out_vl = np.concatenate([np.ones((self.par['n_g']))*(-1e19),
+					 np.ones((self.par['n_sc']*self.par['n_lc']))*(-1e19)
 					]) 
+		#G*H <= t for the relaxation method, t = 0 otherwise
+		out_vu = np.concatenate([np.zeros((self.par['n_g'])),
+					 np.zeros((self.par['n_sc']*self.par['n_lc']))
+					]) + self.par_relax['t']
 
 	return out_vl,out_vu
 
+#---------------------------------------------------------------------------------------#
+#		Constraint violation
+#---------------------------------------------------------------------------------------#
+
+def violation(self,x,chunk_size=None):
+	'''Maximum violation of the bounds and of all constraints,
+	including the vanishing constraints. For a 2D array of solutions
+	[design,variable], the violation of every design is returned.'''
+
+	method_ALM 	= self.method_ALM
+	self.method_ALM = False
+
+	try:
+		cl,cu 		= self.limits()
+		lb,ub 		= self.bounds()
+
+		if np.ndim(x) == 2:
+			return batch_violation(self,x,cl,cu,lb,ub,chunk_size)
+
+		constr 		= self.constraints(x)
+
+	finally:
+		self.method_ALM = method_ALM
+
+	out_violation 	= max(0.0,np.max(cl-constr,initial=0),np.max(constr-cu,initial=0),
+				np.max(lb-x,initial=0),np.max(x-ub,initial=0))
+
+	return out_violation
+
+#---------------------------------------------------------------------------------------#
+#		Batches of solutions
+#---------------------------------------------------------------------------------------#
+
+def batch_constraints(self,x):
+	'''All constraints (including the vanishing constraints) of the
+	solutions x[design,variable]; [design,constraint].'''
+
+	n_lc 		= self.par['n_lc']
+	n_designs 	= len(x)
+
+	bar_diam 	= bar_diameters(self,x)
+	sigma 		= stress(self,x)
+
+	#compliance
+	out_lin 	= x @ self.linear().T
+
+	#force equilibrium K(x) u = B (x*sigma)
+	forces 		= (bar_diam[:,np.newaxis,:]*sigma).reshape(n_designs*n_lc,self.par['n_b'])
+	out_nonlin 	= np.asarray((equilibrium_matrix(self) @ forces.T).T)
+	out_nonlin 	= np.moveaxis(out_nonlin.reshape(n_designs,n_lc,-1),1,2).reshape(n_designs,-1)
+
+	#vanishing constraints
+	design_diam 	= x[:,0:self.par['n_g']]
+	out_diam 	= (self.par['min_diam'] - design_diam)*design_diam
+
+	out_stress 	= stress_rows(self,(sigma**2 - self.par['max_stress']**2)*bar_diam[:,np.newaxis,:])
+
+	if self.par_agg['active']:
+		out_stress = np.array([[aggregate_stress(self,values)[0] for values in design] for design in out_stress])
+
+	return np.hstack((out_lin,out_nonlin,out_diam,out_stress.reshape(n_designs,-1)))
+
+def batch_violation(self,x,cl,cu,lb,ub,chunk_size=None):
+
+	n_constr 	= len(cl) + 4*self.par['n_b']*self.par['n_lc']
+	out_violation 	= np.zeros((len(x)))
 
+	for chunk in batch_chunks(len(x),n_constr+x.shape[1],chunk_size):
 
+		constr 	= batch_constraints(self,x[chunk])
 
+		out_violation[chunk] = np.maximum.reduce([np.zeros((len(constr))),
+							  np.max(cl-constr,axis=1,initial=0),
+							  np.max(constr-cu,axis=1,initial=0),
+							  np.max(lb-x[chunk],axis=1,initial=0),
+							  np.max(x[chunk]-ub,axis=1,initial=0)])
 
+	return out_violation
 
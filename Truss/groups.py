@@ -0,0 +1,150 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+#---------------------------------------------------------------------------------------#
+#		Linking of bar diameters
+#---------------------------------------------------------------------------------------#
+
+def link_bars(self,bar_groups):
+	'''Link the diameters of the bars in bar_groups to one design variable each.
+
+	Parameters:
+	-----------
+	bar_groups: list or str
+		list of lists of bar indices sharing one diameter, e.g. [[0,3],[1,2,5]];
+		bars not contained in any group keep their own diameter.
+		If 'symmetry', the groups are determined from the mirror symmetries
+		of nodes, fixed nodes, load cases and bars.
+	'''
+
+	self.version 	+= 1
+
+	#bars carrying a stress constraint
+	self.stress_bars = None
+	self.bar_groups  = bar_groups
+
+	if bar_groups is None:
+		self.bar_group 	= None
+		return
+
+	if isinstance(bar_groups,str):
+
+		if bar_groups != 'symmetry':
+			raise ValueError('bar_groups must be a list of bar groups or symmetry!')
+
+		bar_group = symmetry_groups(self)
+
+		#for symmetric loads, mirrored bars carry the same stress
+		#and one stress constraint per group is sufficient
+		self.stress_bars = np.unique(bar_group,return_index=True)[1]
+
+	else:
+
+		pairs = [np.column_stack((np.repeat(group[0],len(group)),group))
+				for group in bar_groups if len(group) > 0]
+
+		bar_group = connect_bars(self.par['n_b'],pairs)
+
+	self.bar_group = bar_group
+
+	if self.stress_bars is not None and len(self.stress_bars) == self.par['n_b']:
+		self.stress_bars = None
+
+	if np.max(self.bar_group)+1 == self.par['n_b'] and self.stress_bars is None:
+		#no bars are linked
+		self.bar_group 	= None
+
+def connect_bars(n_b,pairs):
+	'''Consecutive group index of every bar for the linked pairs of bars.'''
+
+	pairs = np.vstack([np.zeros((0,2),dtype=np.int64)]+[np.asarray(pair,dtype=np.int64) for pair in pairs])
+	graph = coo_matrix((np.ones(len(pairs)),(pairs[:,0],pairs[:,1])),shape=(n_b,n_b))
+
+	#groups are numbered in the order of their first bar
+	labels 		= connected_components(graph,directed=False)[1]
+	_,first,inverse = np.unique(labels,return_index=True,return_inverse=True)
+
+	return np.argsort(np.argsort(first))[inverse]
+
+#---------------------------------------------------------------------------------------#
+#		Symmetry detection
+#---------------------------------------------------------------------------------------#
+
+def mirror_permutations(self,tol=1e-9):
+	'''Node permutations of all coordinate planes through the center of the
+	ground structure under which nodes, fixed nodes and load cases are symmetric.'''
+
+	out_perms 	= []
+
+	scale 		= max(1.0,np.max(np.abs(self.nodes)))
+	tree 		= cKDTree(self.nodes)
+
+	for dim in range(self.par['dim']):
+
+		center 	= 0.5*(np.min(self.nodes[:,dim])+np.max(self.nodes[:,dim]))
+
+		mirrored 	= self.nodes.astype(float)
+		mirrored[:,dim] = 2*center - mirrored[:,dim]
+
+		dist,perm 	= tree.query(mirrored)
+
+		#nodes
+		if np.max(dist) > tol*scale:
+			continue
+
+		#fixed nodes
+		if set(perm[self.fixed_nodes]) != set(np.asarray(self.fixed_nodes).tolist()):
+			continue
+
+		#load cases, the load at the mirrored node is the mirrored load
+		mirrored_loads 		= self.load_cases.astype(float)
+		mirrored_loads[:,dim] 	= -mirrored_loads[:,dim]
+
+		if not np.allclose(self.load_cases[perm],mirrored_loads,rtol=0,
+					atol=tol*max(1.0,np.max(np.abs(self.load_cases)))):
+			continue
+
+		out_perms.append(perm)
+
+	return out_perms
+
+def symmetry_groups(self,tol=1e-9):
+	'''Group index of every bar; mirrored bars share the same group.'''
+
+	#lookup of bars by their sorted end nodes
+	sorted_bars 	= np.sort(self.bars,axis=1)
+	bar_index 	= {tuple(bar): num_bar for num_bar,bar in enumerate(sorted_bars)}
+
+	bar_perms 	= []
+
+	for perm in mirror_permutations(self,tol):
+
+		mirrored_bars 	= np.sort(perm[self.bars],axis=1)
+		bar_perm 	= np.array([bar_index.get(tuple(bar),-1) for bar in mirrored_bars])
+
+		#bars are not symmetric
+		if np.any(bar_perm < 0):
+			continue
+
+		bar_perms.append(bar_perm)
+
+	return connect_bars(self.par['n_b'],[np.column_stack((np.arange(self.par['n_b']),bar_perm))
+						for bar_perm in bar_perms])
@@ -0,0 +1,247 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Numeric kernels for the per-bar loops.
+
+The kernels work on the compact bar geometry: for every bar, the indices of
+the degrees of freedom of its two end nodes (-1 for fixed nodes) and the
+corresponding direction cosines. If numba is installed, compiled versions of
+the kernels are used; otherwise, vectorized numpy versions are used.
+
+The compiled kernels are cached on disk such that new processes do not have to
+compile them again. The cache can be disabled by setting the environment variable
+TRUSS_NUMBA_CACHE=0 before importing Truss.
+'''
+
+import os
+
+import numpy as np
+
+try:
+	import numba
+	HAS_NUMBA = True
+except ImportError:
+	HAS_NUMBA = False
+
+NUMBA_CACHE 	= os.environ.get('TRUSS_NUMBA_CACHE','1').lower() not in ['0','false','no']
+
+#maximum number of node-pair distances evaluated at once in the numpy overlap check
+OVERLAP_CHUNK 	= 2**22
+
+#---------------------------------------------------------------------------------------#
+#		Kernel selection
+#---------------------------------------------------------------------------------------#
+
+kernel_backend = 'numba' if HAS_NUMBA else 'numpy'
+
+def set_kernel_backend(backend):
+	'''Select the kernels used for the per-bar loops.
+
+	Parameters:
+	-----------
+	backend: str
+		'numba' for the compiled kernels or 'numpy' for the vectorized kernels
+	'''
+
+	global kernel_backend
+
+	if backend not in ['numba','numpy']:
+		raise ValueError('backend must be numba or numpy!')
+
+	if backend == 'numba' and not HAS_NUMBA:
+		raise ImportError('numba is not installed!')
+
+	kernel_backend = backend
+
+#---------------------------------------------------------------------------------------#
+#		Numpy kernels
+#---------------------------------------------------------------------------------------#
+
+def stiffness_numpy(weights,dofs,cosines,n_dof):
+
+	#contributions weight_i * a_i * a_i^T of the individual bars
+	#of one design (weights[bar]) or several designs (weights[design,bar])
+	weights = np.asarray(weights,dtype=float)
+	designs = np.atleast_2d(weights)
+	values 	= designs[:,:,np.newaxis,np.newaxis]*(cosines[:,:,np.newaxis]*cosines[:,np.newaxis,:])
+	index 	= dofs[:,:,np.newaxis]*n_dof + dofs[:,np.newaxis,:]
+	mask 	= (dofs[:,:,np.newaxis] >= 0) & (dofs[:,np.newaxis,:] >= 0)
+
+	#flat index of the entries of all designs
+	index 	= index[mask] + n_dof*n_dof*np.arange(len(designs))[:,np.newaxis]
+
+	out_stiff_mat = np.bincount(index.ravel(),weights=values[:,mask].ravel(),minlength=len(designs)*n_dof*n_dof)
+
+	return out_stiff_mat.reshape(weights.shape[:-1]+(n_dof,n_dof))
+
+def strain_numpy(node_disloc,dofs,cosines):
+
+	#displacements of fixed nodes (dof -1) are taken from the appended zero row
+	node_disloc = np.vstack((node_disloc,np.zeros((1,node_disloc.shape[1]))))
+
+	return np.einsum('bk,bkc->cb',cosines,node_disloc[dofs])
+
+def columns_numpy(values,dofs,n_dof):
+
+	out_columns = np.zeros((n_dof+1,len(dofs)))
+	out_columns[dofs,np.arange(len(dofs))[:,np.newaxis]] = values
+
+	return out_columns[:n_dof]
+
+def overlap_numpy(nodes,pairs):
+
+	out_overlap = np.zeros(len(pairs),dtype=bool)
+	chunk 	    = max(1,OVERLAP_CHUNK//max(1,len(nodes)))
+
+	for start in range(0,len(pairs),chunk):
+
+		start_nodes = nodes[pairs[start:start+chunk,0]][:,np.newaxis,:]
+		end_nodes   = nodes[pairs[start:start+chunk,1]][:,np.newaxis,:]
+
+		#strictly between the end nodes in the coordinates which change along the bar,
+		#equal in all other coordinates
+		between     = (nodes > np.minimum(start_nodes,end_nodes)) & (nodes < np.maximum(start_nodes,end_nodes))
+		inside 	    = np.where(start_nodes != end_nodes,between,nodes == start_nodes)
+
+		out_overlap[start:start+chunk] = np.any(np.all(inside,axis=2),axis=1)
+
+	return out_overlap
+
+#---------------------------------------------------------------------------------------#
+#		Numba kernels
+#---------------------------------------------------------------------------------------#
+
+if HAS_NUMBA:
+
+	@numba.njit(cache=NUMBA_CACHE)
+	def stiffness_numba(weights,dofs,cosines,n_dof):
+
+		out_stiff_mat = np.zeros((weights.shape[0],n_dof,n_dof))
+
+		for num_bar in range(dofs.shape[0]):
+			for k in range(dofs.shape[1]):
+				if dofs[num_bar,k] < 0:
+					continue
+				for l in range(dofs.shape[1]):
+					if dofs[num_bar,l] < 0:
+						continue
+					for num_design in range(weights.shape[0]):
+						out_stiff_mat[num_design,dofs[num_bar,k],dofs[num_bar,l]] += \
+							weights[num_design,num_bar]*cosines[num_bar,k]*cosines[num_bar,l]
+
+		return out_stiff_mat
+
+	@numba.njit(cache=NUMBA_CACHE)
+	def strain_numba(node_disloc,dofs,cosines):
+
+		out_strain = np.zeros((node_disloc.shape[1],dofs.shape[0]))
+
+		for num_case in range(node_disloc.shape[1]):
+			for num_bar in range(dofs.shape[0]):
+				for k in range(dofs.shape[1]):
+					if dofs[num_bar,k] >= 0:
+						out_strain[num_case,num_bar] += \
+							cosines[num_bar,k]*node_disloc[dofs[num_bar,k],num_case]
+
+		return out_strain
+
+	@numba.njit(cache=NUMBA_CACHE)
+	def columns_numba(values,dofs,n_dof):
+
+		out_columns = np.zeros((n_dof,dofs.shape[0]))
+
+		for num_bar in range(dofs.shape[0]):
+			for k in range(dofs.shape[1]):
+				if dofs[num_bar,k] >= 0:
+					out_columns[dofs[num_bar,k],num_bar] = values[num_bar,k]
+
+		return out_columns
+
+	@numba.njit(cache=NUMBA_CACHE)
+	def overlap_numba(nodes,pairs):
+
+		out_overlap = np.zeros(pairs.shape[0],dtype=np.bool_)
+
+		for num_pair in range(pairs.shape[0]):
+
+			start_node 	= nodes[pairs[num_pair,0]]
+			end_node 	= nodes[pairs[num_pair,1]]
+
+			for num_node in range(nodes.shape[0]):
+
+				inside = True
+
+				for dim in range(nodes.shape[1]):
+
+					coord = nodes[num_node,dim]
+
+					if start_node[dim] != end_node[dim]:
+						inside = min(start_node[dim],end_node[dim]) < coord < max(start_node[dim],end_node[dim])
+					else:
+						inside = coord == start_node[dim]
+
+					if not inside:
+						break
+
+				if inside:
+					out_overlap[num_pair] = True
+					break
+
+		return out_overlap
+
+#---------------------------------------------------------------------------------------#
+#		Kernels
+#---------------------------------------------------------------------------------------#
+
+def assemble_stiffness(weights,dofs,cosines,n_dof):
+	'''Dense stiffness matrix sum_i weights_i * a_i * a_i^T; for weights[design,bar],
+	the stiffness matrices of all designs are returned.'''
+
+	if kernel_backend == 'numba':
+		weights = np.asarray(weights,dtype=float)
+		return stiffness_numba(np.ascontiguousarray(np.atleast_2d(weights)),dofs,cosines,n_dof
+					).reshape(weights.shape[:-1]+(n_dof,n_dof))
+
+	return stiffness_numpy(weights,dofs,cosines,n_dof)
+
+def bar_strain(node_disloc,dofs,cosines):
+	'''Elongation a_i^T u of the bars for displacements node_disloc[dof,case].
+	Returns an array [case,bar].'''
+
+	if kernel_backend == 'numba':
+		return strain_numba(np.ascontiguousarray(node_disloc,dtype=float),dofs,cosines)
+
+	return strain_numpy(node_disloc,dofs,cosines)
+
+def bar_columns(values,dofs,n_dof):
+	'''Dense matrix [dof,bar] with values[bar,k] at the degrees of freedom dofs[bar,k].'''
+
+	if kernel_backend == 'numba':
+		return columns_numba(np.ascontiguousarray(values,dtype=float),dofs,n_dof)
+
+	return columns_numpy(values,dofs,n_dof)
+
+def overlapping_bars(nodes,pairs):
+	'''Mask of node pairs with another node in the bounding box of the connecting bar,
+	i.e. strictly between the end nodes in every coordinate that changes along
+	the bar and equal to them in all other coordinates.'''
+
+	nodes = np.ascontiguousarray(nodes,dtype=float)
+	pairs = np.ascontiguousarray(pairs,dtype=np.int64)
+
+	if kernel_backend == 'numba':
+		return overlap_numba(nodes,pairs)
+
+	return overlap_numpy(nodes,pairs)
@@ -0,0 +1,134 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+#---------------------------------------------------------------------------------------#
+#		Regular lattices
+#---------------------------------------------------------------------------------------#
+
+def lattice(shape,spacing=1.,level=1,max_length=None,fixed_nodes=None,origin=None):
+	'''Nodes and bars of a ground structure on a regular 2D or 3D lattice.
+
+	Bars connect every node to the nodes at the lattice offsets of lattice_offsets().
+	As only primitive offsets are used, no bar passes through another node of the
+	lattice, i.e. the bars do not overlap and no overlap check is needed. The number
+	of bars grows linearly with the number of nodes.
+
+	Parameters:
+	-----------
+	shape: tuple
+		number of nodes in every direction, e.g. (nx,ny) or (nx,ny,nz)
+	spacing: float or array, default = 1
+		distance of neighbouring nodes, equal or per direction
+	level: int, default = 1
+		connectivity level: offsets with components up to level (in nodes);
+		only max_length is used if None
+	max_length: float, default = None
+		maximum bar length
+	fixed_nodes: list, default = None
+		indices of fixed nodes; bars between two fixed nodes are omitted
+	origin: array, default = None
+		coordinates of the first node; zero if None
+
+	Returns the nodes [node,dim] and the bars [bar,end] for Truss(nodes,fixed_nodes,
+	load_cases,bars=bars). The nodes are numbered in C order of the lattice indices,
+	see lattice_index().
+	'''
+
+	shape 		= tuple(int(size) for size in shape)
+	dim 		= len(shape)
+
+	if dim not in [2,3]:
+		raise ValueError('shape must have 2 or 3 entries!')
+
+	spacing 	= np.broadcast_to(np.asarray(spacing,dtype=float),(dim,))
+	origin 		= np.zeros((dim)) if origin is None else np.asarray(origin,dtype=float)
+
+	out_nodes 	= origin + lattice_points(shape)*spacing
+	out_bars 	= lattice_bars(shape,lattice_offsets(dim,level,max_length,spacing))
+
+	if fixed_nodes is not None:
+
+		fixed 		= np.zeros((len(out_nodes)),dtype=bool)
+		fixed[np.asarray(fixed_nodes,dtype=np.int64)] = True
+
+		out_bars 	= out_bars[~(fixed[out_bars[:,0]] & fixed[out_bars[:,1]])]
+
+	return out_nodes,out_bars
+
+def lattice_points(shape):
+	'''Integer lattice indices of all nodes in C order; [node,dim].'''
+
+	return np.indices(shape).reshape(len(shape),-1).T
+
+def lattice_index(shape,index):
+	'''Node indices of the lattice indices index[...,dim], e.g. lattice_index((5,3),[[0,0],[4,2]]).'''
+
+	index = np.asarray(index,dtype=np.int64)
+
+	return np.ravel_multi_index(tuple(np.moveaxis(index,-1,0)),tuple(shape))
+
+def lattice_offsets(dim,level=1,max_length=None,spacing=1.):
+	'''Primitive lattice offsets of the bars.
+
+	The offsets have components of at most level and a length (with spacing) of
+	at most max_length. Only primitive offsets (greatest common divisor of the
+	components 1) are used, as longer ones pass through nodes, and only one of
+	o and -o (the first nonzero component is positive).
+
+	level = 1 connects the nearest neighbours including the diagonals,
+	level = 2 adds e.g. the offsets (2,1) and (1,2) in 2D.'''
+
+	spacing 	= np.broadcast_to(np.asarray(spacing,dtype=float),(dim,))
+
+	if level is None:
+
+		if max_length is None:
+			raise ValueError('level or max_length must be given!')
+
+		level = int(np.floor(max_length/np.min(spacing)*(1+1e-12)))
+
+	offsets 	= lattice_points((2*int(level)+1,)*dim) - int(level)
+	offsets 	= offsets[np.any(offsets != 0,axis=1)]
+
+	first 		= offsets[np.arange(len(offsets)),np.argmax(offsets != 0,axis=1)]
+	offsets 	= offsets[(first > 0) & (np.gcd.reduce(np.abs(offsets),axis=1) == 1)]
+
+	if max_length is not None:
+		offsets = offsets[np.linalg.norm(offsets*spacing,axis=1) <= max_length*(1+1e-12)]
+
+	return offsets
+
+def lattice_bars(shape,offsets):
+	'''Bars [i,j], i < j, between all nodes of the lattice and the nodes
+	at the offsets, sorted by their node pairs like potential_bars().'''
+
+	shape 		= tuple(shape)
+	points 		= lattice_points(shape)
+
+	out_bars 	= [np.zeros((0,2),dtype=np.int64)]
+
+	for offset in offsets:
+
+		ends 	= points + offset
+		valid 	= np.all((ends >= 0) & (ends < np.array(shape)),axis=1)
+
+		#offsets with a positive first nonzero component increase the C-order index
+		out_bars.append(np.column_stack((np.nonzero(valid)[0],lattice_index(shape,ends[valid]))))
+
+	out_bars 	= np.vstack(out_bars)
+
+	return out_bars[np.lexsort((out_bars[:,1],out_bars[:,0]))]
@@ -0,0 +1,321 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.spatial import cKDTree
+
+from .topology import *
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Coarse node sets
+#---------------------------------------------------------------------------------------#
+
+def node_spacing(nodes):
+	'''Median distance of the nodes to their nearest neighbours.'''
+
+	dist = cKDTree(nodes).query(nodes,k=2)[0][:,1]
+
+	return float(np.median(dist))
+
+def coarse_nodes(self,size):
+	'''Indices of the nodes of a coarse level with node spacing size: the node
+	nearest to every point of a grid with spacing size and all fixed and loaded nodes.
+	For regular lattices and size = factor*spacing, every factor-th node is kept.'''
+
+	nodes 		= np.asarray(self.nodes,dtype=float)
+	origin 		= np.min(nodes,axis=0)
+
+	#grid point of every node and distance to it
+	cells 		= np.round((nodes-origin)/size).astype(np.int64)
+	dist 		= np.linalg.norm(nodes-(origin+cells*size),axis=1)
+
+	#nearest node per grid point
+	inverse 	= np.unique(cells,axis=0,return_inverse=True)[1].ravel()
+	order 		= np.lexsort((dist,inverse))
+	first 		= np.concatenate(([True],inverse[order][1:] != inverse[order][:-1]))
+
+	loaded 		= np.any(self.load_cases != 0,axis=tuple(range(1,self.load_cases.ndim)))
+
+	return np.unique(np.concatenate((order[first],np.asarray(self.fixed_nodes,dtype=np.int64),
+					 np.nonzero(loaded)[0])))
+
+#---------------------------------------------------------------------------------------#
+#		Mapping between levels
+#---------------------------------------------------------------------------------------#
+
+def node_displacements(truss,x):
+	'''Displacements of all nodes of truss including the fixed ones; [node,dim,case].'''
+
+	out_disloc = np.zeros((truss.par['n_n'],truss.par['dim'],truss.par['n_lc']))
+	out_disloc[truss.free_nodes] = np.asarray(x)[-truss.par['n_dl']:].reshape(
+						truss.par['n_fn'],truss.par['dim'],truss.par['n_lc'])
+
+	return out_disloc
+
+def solution_layout(truss,bar_diam,node_disloc):
+	'''Solution x of truss for the diameters of all bars and the displacements of all nodes.'''
+
+	return np.concatenate((group_diameters(truss,bar_diam),node_disloc[truss.free_nodes].ravel()))
+
+def path_cover(nodes,bars,ends,tol=1e-9):
+	'''Bars lying on the segments between the node pairs ends (the active bars of a
+	coarser level) and the distance of every node to the nearest segment.
+
+	Returns the index of the covering segment of every bar (-1 if none) and the distances.'''
+
+	nodes 		= np.asarray(nodes,dtype=float)
+	out_dist 	= np.full((len(nodes)),np.inf)
+
+	#no load path, e.g. no active bars on the coarser level
+	if len(ends) == 0:
+		return -np.ones((len(bars)),dtype=np.int64),out_dist
+
+	rows,cols 	= [],[]
+
+	for num_seg,(start,end) in enumerate(ends):
+
+		direction 	= nodes[end]-nodes[start]
+		length 		= np.linalg.norm(direction)
+
+		#distance to the segment
+		proj 		= np.clip((nodes-nodes[start]) @ direction/length**2,0,1)
+		dist 		= np.linalg.norm(nodes-nodes[start]-proj[:,np.newaxis]*direction,axis=1)
+
+		out_dist 	= np.minimum(out_dist,dist)
+
+		on_seg 		= np.nonzero(dist < tol*max(length,1))[0]
+		rows.append(on_seg)
+		cols.append(np.full((len(on_seg)),num_seg))
+
+	#segment index + 1 of the nodes on every segment
+	incidence 	= sp.csr_matrix((np.concatenate([np.zeros(0)]+cols)+1,
+					(np.concatenate([np.zeros(0,dtype=np.int64)]+rows),
+					 np.concatenate([np.zeros(0,dtype=np.int64)]+cols))),
+					shape=(len(nodes),len(ends)))
+
+	out_cover 	= -np.ones((len(bars)),dtype=np.int64)
+
+	for chunk in range(0,len(bars),BAR_CHUNK):
+
+		pairs 	= np.asarray(bars[chunk:chunk+BAR_CHUNK])
+
+		#both end nodes on the same segment
+		shared 	= sp.csr_matrix(incidence[pairs[:,0]].multiply(incidence[pairs[:,1]] != 0))
+
+		out_cover[chunk:chunk+len(pairs)] = np.asarray(shared.max(axis=1).todense()).ravel()-1
+
+	return out_cover,out_dist
+
+def prolong(coarse,x_coarse,eta_coarse,coarse_map,fine,fine_map,fill,threshold=1e-6):
+	'''Map the solution (and the ALM multipliers) of the coarse truss to the fine truss.
+
+	Fine bars on active coarse bars take their diameter (and multipliers), all
+	other bars fill*max(diameters). The displacements are interpolated by inverse
+	distance weighting of the nearest coarse nodes. coarse_map and fine_map are
+	the indices of the nodes of both trusses in a common node set.
+
+	Returns x0, eta0 (None if not mapped) and the distance of every fine node
+	to the load path, i.e. to the active coarse bars.'''
+
+	#active coarse bars in the common node numbering
+	bar_diam 	= np.array(bar_diameters(coarse,x_coarse))
+	active 		= np.nonzero(bar_diam > threshold*max(np.max(bar_diam,initial=0),1e-300))[0]
+	ends 		= coarse_map[np.asarray(coarse.bars)[active]]
+
+	#fine node index of the common nodes
+	common 		= -np.ones((max(np.max(coarse_map),np.max(fine_map))+1),dtype=np.int64)
+	common[fine_map] = np.arange(len(fine_map))
+
+	cover,dist 	= path_cover(fine.nodes,fine.bars,common[ends])
+
+	fine_diam 	= np.full((fine.par['n_b']),fill*np.max(bar_diam,initial=0))
+	fine_diam[cover >= 0] = bar_diam[active[cover[cover >= 0]]]
+
+	#inverse distance weighting of the displacements of the nearest coarse nodes
+	coarse_disloc 	= node_displacements(coarse,x_coarse)
+	positions 	= np.asarray(fine.nodes,dtype=float)
+
+	k 		= min(coarse.par['dim']+1,coarse.par['n_n'])
+	near_dist,near 	= cKDTree(np.asarray(coarse.nodes,dtype=float)).query(positions,k=k)
+	near_dist,near 	= near_dist.reshape(len(positions),k),near.reshape(len(positions),k)
+
+	weights 	= 1/np.maximum(near_dist,1e-12*node_spacing(positions))**2
+	weights        /= np.sum(weights,axis=1)[:,np.newaxis]
+
+	fine_disloc 	= np.einsum('nk,nkdc->ndc',weights,coarse_disloc[near])
+
+	out_x0 		= solution_layout(fine,fine_diam,fine_disloc)
+
+	#multipliers of the vanishing constraints of the bars, without linked bars or aggregation
+	out_eta0 	= None
+
+	if eta_coarse is not None and all(truss.bar_group is None and truss.stress_bars is None and
+					  not truss.par_agg['active'] for truss in [coarse,fine]):
+
+		source 		= np.where(cover >= 0,active[np.maximum(cover,0)],-1)
+		eta 		= np.concatenate(([0],eta_coarse[:coarse.par['n_b']]))
+		out_eta0 	= [eta[source+1]]
+
+		for num_case in range(fine.par['n_lc']):
+			eta 	= np.concatenate(([0],eta_coarse[coarse.par['n_b']*(num_case+1):coarse.par['n_b']*(num_case+2)]))
+			out_eta0.append(eta[source+1])
+
+		out_eta0 	= np.concatenate(out_eta0)
+
+	return out_x0,out_eta0,dist
+
+def restricted_bars(truss,dist,radius):
+	'''Indices of the bars of truss with both end nodes within radius of the load path.'''
+
+	#all bars without a load path
+	if not np.any(np.isfinite(dist)):
+		return np.arange(truss.par['n_b'])
+
+	near 	= dist <= radius
+
+	return np.nonzero(np.all(near[np.asarray(truss.bars)],axis=1))[0]
+
+def restrict_truss(truss,bar_index):
+	'''Truss with the bars bar_index of truss and their nodes (and the loaded nodes) only.
+
+	Returns the truss and the index of each of its nodes in truss.'''
+
+	bars 		= np.asarray(truss.bars)[bar_index]
+	loaded 		= np.any(truss.load_cases != 0,axis=tuple(range(1,truss.load_cases.ndim)))
+
+	used 		= np.zeros((truss.par['n_n']),dtype=bool)
+	used[bars.ravel()] = True
+	used[loaded] 	= True
+
+	node_map 	= np.nonzero(used)[0]
+	node_index 	= -np.ones((truss.par['n_n']),dtype=np.int64)
+	node_index[node_map] = np.arange(len(node_map))
+
+	#linked bars restricted to the remaining bars
+	if truss.bar_groups is None or isinstance(truss.bar_groups,str):
+		bar_groups 	= truss.bar_groups
+	else:
+		bar_new 	= -np.ones((truss.par['n_b']),dtype=np.int64)
+		bar_new[bar_index] = np.arange(len(bar_index))
+
+		bar_groups 	= [bar_new[np.asarray(group,dtype=np.int64)] for group in truss.bar_groups]
+		bar_groups 	= [group[group >= 0] for group in bar_groups if np.any(group >= 0)]
+
+	out_truss 	= derived_truss(truss,node_map,node_index[bars],bar_groups=bar_groups)
+
+	return out_truss,node_map
+
+def restrict_eta(truss,eta,bar_index):
+	'''Multipliers of the vanishing constraints of the bars bar_index of truss.'''
+
+	n_b 	= truss.par['n_b']
+
+	return np.concatenate([eta[bar_index]]+[eta[n_b*(num_case+1)+bar_index] for num_case in range(truss.par['n_lc'])])
+
+#---------------------------------------------------------------------------------------#
+#		Multilevel solve
+#---------------------------------------------------------------------------------------#
+
+def solve_multilevel(self,method='direct',levels=2,factor=2.,radius=None,fill=1e-3,**kwargs):
+	'''Coarse-to-fine solve; see Truss.multilevel().'''
+
+	for key in ['x0','eta0']:
+		if key in kwargs:
+			raise KeyError('key %s not known!'% key)
+
+	alm 		= method in ['ALM','alm']
+	spacing 	= node_spacing(np.asarray(self.nodes,dtype=float))
+
+	#potential bars of the coarse levels, as long as the longest bar scaled with the node spacing,
+	#i.e. longer than the bars of the fine truss
+	if self.ground_structure:
+		max_length 	= self.par['max_length']
+	else:
+		max_length 	= np.max(np.asarray(self.bar_lengths),initial=0)
+
+	previous 	= None
+	stats 		= []
+
+	for level in range(int(levels),-1,-1):
+
+		start_time 	= time.time()
+		size 		= spacing*factor**level
+
+		if level > 0:
+			node_map 	= coarse_nodes(self,size)
+			truss 		= derived_truss(self,node_map,max_length=max_length*factor**level)
+		else:
+			node_map 	= np.arange(self.par['n_n'])
+			truss 		= self
+
+		options 	= dict(kwargs)
+		bar_index 	= None
+
+		if previous is not None:
+
+			x0,eta0,dist 	= prolong(*previous,truss,node_map,fill)
+
+			#candidate bars near the load path of the coarser level
+			if radius is not None:
+
+				bar_index 	= restricted_bars(truss,dist,radius*size*factor)
+				full 		= truss
+				truss,used 	= restrict_truss(full,bar_index)
+
+				x0 		= solution_layout(truss,bar_diameters(full,x0)[bar_index],
+								node_displacements(full,x0)[used])
+				eta0 		= None if eta0 is None else restrict_eta(full,eta0,bar_index)
+				node_map 	= node_map[used]
+
+			options['x0'] 	= x0
+
+			if alm and eta0 is not None:
+				options['eta0'] = eta0
+
+		out 		= truss.solve(method,**options)
+		x 		= out if alm else out[0]
+
+		stats.append({'level':		level,
+			      'n_n':		truss.par['n_n'],
+			      'n_b':		truss.par['n_b'],
+			      'volume':		truss.volume(x),
+			      'violation':	violation(truss,x),
+			      'status':		truss.par_ALM['iter'] if alm else out[1]['status'],
+			      'time':		time.time()-start_time,
+			      })
+
+		if self.verbose:
+			print('level\t',level,'\tnodes\t',truss.par['n_n'],'\tbars\t',truss.par['n_b'],
+				'\tvolume\t',stats[-1]['volume'])
+
+		previous 	= (truss,x,truss.par_ALM['eta'] if alm else None,node_map)
+
+	#solution of the restricted finest level in the variable layout of self
+	if truss is not self:
+
+		bar_diam 		= np.zeros((self.par['n_b']))
+		bar_diam[bar_index] 	= bar_diameters(truss,x)
+
+		node_disloc 		= np.zeros((self.par['n_n'],self.par['dim'],self.par['n_lc']))
+		node_disloc[node_map] 	= node_displacements(truss,x)
+
+		x 			= solution_layout(self,bar_diam,node_disloc)
+
+	return x,stats
@@ -0,0 +1,227 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor,as_completed
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.optimize import linprog
+
+from .stream import *
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Plastic design (LP)
+#---------------------------------------------------------------------------------------#
+
+def lp_design(self):
+	'''Diameters of the plastic design of minimum volume, i.e. the solution of the LP
+
+	min sum_i l_i*x_i  s.t.	A q_k 			= F_{ext,k}
+				|q_{i,k}| 		<= sigma_{max}*x_i
+				0 <= x_i 		<= x_{max}
+
+	with the bar forces q_k of load case k. Compliance and minimum diameter are ignored.
+	Returns the design variables of the diameters or None if the LP fails.'''
+
+	n_g 	= self.par['n_g']
+	n_b 	= self.par['n_b']
+	n_lc 	= self.par['n_lc']
+	n_dof 	= self.par['n_fn']*self.par['dim']
+
+	#equilibrium matrix and linked diameters
+	equil 	= equilibrium_matrix(self)
+	group 	= np.arange(n_b) if self.bar_group is None else self.bar_group
+	link 	= sp.csr_matrix((np.ones(n_b)*self.par['max_stress'],(np.arange(n_b),group)),shape=(n_b,n_g))
+
+	#variables [x,q_1,...,q_{n_lc}]
+	cost 	= np.concatenate((np.bincount(group,weights=self.bar_lengths,minlength=n_g),np.zeros(n_b*n_lc)))
+
+	A_eq 	= sp.hstack((sp.csr_matrix((n_dof*n_lc,n_g)),sp.block_diag([equil]*n_lc)))
+	b_eq 	= np.moveaxis(self.load_cases[self.free_nodes],-1,0).reshape(n_dof*n_lc)
+
+	A_ub 	= sp.vstack((sp.hstack((-sp.vstack([link]*n_lc),sp.identity(n_b*n_lc))),
+			     sp.hstack((-sp.vstack([link]*n_lc),-sp.identity(n_b*n_lc)))))
+	b_ub 	= np.zeros(2*n_b*n_lc)
+
+	bounds 	= [(0,self.par['max_diam'])]*n_g + [(None,None)]*(n_b*n_lc)
+
+	result 	= linprog(cost,A_ub=A_ub,b_ub=b_ub,A_eq=A_eq,b_eq=b_eq,bounds=bounds,method='highs')
+
+	if not result.success:
+		return None
+
+	return result.x[:n_g]
+
+#---------------------------------------------------------------------------------------#
+#		Start points
+#---------------------------------------------------------------------------------------#
+
+def start_points(self,n_starts,strategies=('lp','uniform','random'),seed=None):
+	'''Diverse start points for the optimization.
+
+	Parameters:
+	-----------
+	n_starts: int
+		number of start points
+	strategies: tuple, default = ('lp','uniform','random')
+		'lp': 		plastic design, perturbed for further starts
+		'uniform': 	equal diameters at geometrically spaced levels
+		'random': 	random diameters at random levels
+		The start points are assigned to the strategies in turn.
+	seed: int, default = None
+		seed of the random number generator
+
+	Returns a list of (strategy,x0); the displacements are in equilibrium
+	with the start diameters.
+	'''
+
+	rng 		= np.random.default_rng(seed)
+	n_g 		= self.par['n_g']
+	max_diam 	= self.par['max_diam']
+
+	counts 		= [len(range(num,n_starts,len(strategies))) for num in range(len(strategies))]
+	lp_diam 	= lp_design(self) if 'lp' in strategies else None
+
+	out_starts 	= []
+
+	for strategy,count in zip(strategies,counts):
+
+		if strategy == 'lp' and lp_diam is None:
+			strategy = 'uniform'
+
+		for num in range(count):
+
+			if strategy == 'lp':
+				#plastic design and log-normal perturbations of it
+				bar_diam = lp_diam*(rng.lognormal(0,0.5,n_g) if num > 0 else 1)
+
+			elif strategy == 'uniform':
+				levels 	 = np.geomspace(1e-3,1e-1,max(count,2))*max_diam
+				bar_diam = np.ones(n_g)*levels[num] if count > 1 else np.ones(n_g)*1e-2*max_diam
+
+			elif strategy == 'random':
+				bar_diam = rng.uniform(0,1,n_g)*10**rng.uniform(-3,-1)*max_diam
+
+			else:
+				raise ValueError('strategy %s not known!' % strategy)
+
+			bar_diam = np.clip(bar_diam,max(self.par['min_diam'],1e-9*max_diam),max_diam)
+			x0 	 = equilibrium_displacements(self,np.concatenate((bar_diam,np.zeros(self.par['n_dl']))))
+
+			out_starts.append((strategy,x0))
+
+	return out_starts
+
+#---------------------------------------------------------------------------------------#
+#		Multi-start
+#---------------------------------------------------------------------------------------#
+
+def solve_start(self,method,strategy,x0,tol,kwargs,stop=None):
+	'''Solve the truss from the start point x0 and summarize the result.
+	Ipopt is stopped as soon as the event stop is set.'''
+
+	start_time = time.time()
+
+	if stop is not None:
+		self.par_stream = stream_parameters(cancel=stop)
+
+	try:
+		out = self.solve(method,x0=x0,**kwargs)
+
+	except Exception as error:
+		return {'strategy': strategy,'x': None,'volume': np.inf,'violation': np.inf,
+			'feasible': False,'status': repr(error),'time': time.time()-start_time}
+
+	finally:
+		cancelled 	= ipopt_stopped(self)
+		self.par_stream = None
+
+	x 	= out[0] if isinstance(out,tuple) else out
+	status 	= out[1]['status'] if isinstance(out,tuple) else self.par_ALM['iter']
+
+	out_violation = violation(self,x)
+
+	return {'strategy':	strategy,
+		'x':		x,
+		'volume':	self.volume(x),
+		'violation':	out_violation,
+		'feasible':	out_violation <= tol,
+		'status':	'cancelled' if cancelled else status,
+		'time':		time.time()-start_time,
+		}
+
+def solve_multistart(self,method='direct',n_starts=8,strategies=('lp','uniform','random'),
+			n_workers=None,target_volume=None,seed=None,tol=1e-6,**kwargs):
+
+	if int(n_starts) < 1:
+		raise ValueError('n_starts must be at least 1!')
+
+	starts 	= start_points(self,int(n_starts),strategies,seed)
+	results = []
+
+	if n_workers == 1:
+
+		for strategy,x0 in starts:
+
+			results.append(solve_start(self,method,strategy,x0,tol,kwargs))
+			print_stat_start(self,results,len(starts))
+
+			if target_reached(results[-1],target_volume):
+				break
+
+	else:
+
+		with Manager() as manager, ProcessPoolExecutor(max_workers=n_workers) as executor:
+
+			#shared flag stopping the running starts within Ipopt
+			stop 	= manager.Event()
+			futures = [executor.submit(solve_start,self,method,strategy,x0,tol,kwargs,stop) for strategy,x0 in starts]
+
+			try:
+				for future in as_completed(futures):
+
+					results.append(future.result())
+					print_stat_start(self,results,len(starts))
+
+					if target_reached(results[-1],target_volume):
+						break
+
+			finally:
+				#pending starts are cancelled, running starts are stopped and awaited
+				stop.set()
+				executor.shutdown(wait=True,cancel_futures=True)
+
+	if len(results) == 0:
+		raise RuntimeError('no start has been solved!')
+
+	#feasible designs first, each sorted by volume
+	results.sort(key=lambda result: (not result['feasible'],result['volume']))
+
+	return results[0]['x'],results
+
+def target_reached(result,target_volume):
+
+	return target_volume is not None and result['feasible'] and result['volume'] <= target_volume
+
+def print_stat_start(self,results,n_starts):
+
+	if self.verbose:
+		print('start %d/%d\t' % (len(results),n_starts),results[-1]['strategy'],
+			'\tvolume\t',results[-1]['volume'],'\tfeasible\t',results[-1]['feasible'])
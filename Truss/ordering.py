@@ -0,0 +1,143 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+from .auxiliary_truss import *
+
+#---------------------------------------------------------------------------------------#
+#		Node graph
+#---------------------------------------------------------------------------------------#
+
+def node_graph(self,free_nodes):
+	'''Symmetric adjacency [node,node] of the free nodes (in the order of
+	free_nodes) connected by a bar, evaluated in chunks of BAR_CHUNK bars.'''
+
+	n_fn 		= len(free_nodes)
+
+	free_index 	= -np.ones((self.par['n_n']),dtype=np.int64)
+	free_index[free_nodes] = np.arange(n_fn)
+
+	out_graph 	= sp.csr_matrix((n_fn,n_fn))
+
+	for bars in bar_chunks(self):
+
+		ends 	= free_index[np.asarray(self.bars[bars])]
+		ends 	= ends[np.all(ends >= 0,axis=1)]
+
+		out_graph = out_graph + sp.csr_matrix((np.ones(len(ends)),(ends[:,0],ends[:,1])),shape=(n_fn,n_fn))
+
+	return sp.csr_matrix(out_graph + out_graph.T)
+
+def bandwidth(self,free_nodes=None):
+	'''Bandwidth of the stiffness matrix for the order free_nodes
+	of the free nodes; current order if None.'''
+
+	graph 	= node_graph(self,self.free_nodes if free_nodes is None else free_nodes).tocoo()
+
+	return self.par['dim']*(int(np.max(np.abs(graph.row-graph.col),initial=0))+1)-1
+
+#---------------------------------------------------------------------------------------#
+#		Order of the free nodes
+#---------------------------------------------------------------------------------------#
+
+def node_order(self,method='rcm'):
+	'''Order of the free nodes, i.e. of their degrees of freedom.
+
+	Parameters:
+	-----------
+	method: str, default = 'rcm'
+		'rcm' for reverse Cuthill-McKee on the bar connectivity of the free nodes
+		or 'natural' for the order of the node indices
+	'''
+
+	natural 	= np.sort(self.free_nodes)
+
+	if method == 'natural':
+		return natural
+
+	if method == 'rcm':
+		return natural[reverse_cuthill_mckee(node_graph(self,natural),symmetric_mode=True)]
+
+	raise ValueError('method must be rcm or natural!')
+
+def reorder_nodes(self,method='rcm',x=None):
+	'''Renumber the degrees of freedom in the order of node_order() and return
+	the solution x of the previous order in the new variable layout.'''
+
+	old_free 	= self.free_nodes
+	new_free 	= node_order(self,method)
+
+	self.dof_order 	= None if method == 'natural' else method
+
+	if np.array_equal(old_free,new_free):
+		return None if x is None else np.array(x,dtype=float)
+
+	if self.verbose:
+		print('bandwidth\t',bandwidth(self,old_free),'->',bandwidth(self,new_free))
+
+	self.version   += 1
+
+	#degree of freedom of the new order for every degree of freedom of the previous one
+	dof_map 	= dof_permutation(self,old_free,new_free)
+
+	self.free_nodes = new_free
+	self.bar_dofs 	= pair_dofs(self.par['n_n'],self.free_nodes,self.par['dim'],self.bars)
+
+	#the sparsity pattern of the stiffness matrix is permuted
+	if self.stiff_pattern is not None:
+
+		perm 			= sp.csr_matrix((np.ones(len(dof_map)),(dof_map,np.arange(len(dof_map)))),
+							shape=(len(dof_map),len(dof_map)))
+		self.stiff_pattern 	= sp.csr_matrix(perm @ self.stiff_pattern @ perm.T)
+
+	problem_sizes(self)
+
+	if x is None:
+		return None
+
+	return permute_displacements(self,x,dof_map)
+
+def dof_permutation(self,old_free,new_free):
+	'''New index of every degree of freedom of the order old_free in the order new_free.'''
+
+	dim 		= self.par['dim']
+
+	new_index 	= np.zeros((self.par['n_n']),dtype=np.int64)
+	new_index[new_free] = np.arange(len(new_free))
+
+	return (new_index[old_free][:,np.newaxis]*dim + np.arange(dim)).ravel()
+
+def permute_displacements(self,x,dof_map):
+	'''Solution x with the displacements of degree of freedom k moved to dof_map[k].'''
+
+	out_x 		= np.array(x,dtype=float)
+	n_dof 		= self.par['n_fn']*self.par['dim']
+
+	node_disloc 	= out_x[self.par['n_g']:].reshape(n_dof,self.par['n_lc'])
+	out_disloc 	= np.zeros_like(node_disloc)
+	out_disloc[dof_map] = node_disloc
+
+	out_x[self.par['n_g']:] = out_disloc.ravel()
+
+	return out_x
+
+def natural_layout(self,x):
+	'''Solution x with the displacements in the order of the node indices.'''
+
+	return permute_displacements(self,x,dof_permutation(self,self.free_nodes,np.sort(self.free_nodes)))
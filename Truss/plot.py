@@ -19,6 +19,8 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as mcol
 import matplotlib.cm as cm
 
+from .auxiliary_truss import *
+
 #---------------------------------------------------------------------------------------#
 #		Plot of complete structure
 #---------------------------------------------------------------------------------------#
@@ -64,7 +66,7 @@ def plot_initial(self):
 def plot_optimal(self,x):
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
+	bar_diam 	= bar_diameters(self,x)
 	node_disloc 	= x[-self.par['n_dl']:].reshape(self.par['n_fn'],self.par['dim'],self.par['n_lc'])
 
 	max_line 	= 30
@@ -131,7 +133,7 @@ def plot_optimal(self,x):
 def plot_loaded(self,x,color):
 
 	#x = [bar_diam,node_disloc]
-	bar_diam 	= x[0:self.par['n_b']]
+	bar_diam 	= bar_diameters(self,x)
 	node_disloc 	= np.zeros((self.par['n_n'],self.par['dim'],self.par['n_lc']))
 
 	for num_node,node in enumerate(self.free_nodes):
@@ -0,0 +1,175 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.sparse.linalg import splu
+
+from .auxiliary_truss import *
+
+#---------------------------------------------------------------------------------------#
+#		Re-analysis of a design
+#---------------------------------------------------------------------------------------#
+
+class Reanalysis:
+	'''Linear analysis of a fixed design under new load cases.
+
+	The stiffness matrix of the realized bars is assembled and factorized once
+	(sparse LU of the degrees of freedom connected to them); every batch of load
+	cases then costs one solve with multiple right-hand sides.
+
+	Mechanisms of the realized bars, e.g. at nodes of two collinear bars, are
+	stabilized by adding regularization*max(diag(K)) to the diagonal. Loads
+	on such mechanisms lead to large displacements and a residual of the
+	equilibrium, both reported as violation.
+
+	Attributes:
+	----------
+	truss: Truss
+		analysed truss
+	x: array
+		bar diameters (and nodal displacements) as obtained from solve() method
+	threshold: float, default = 1e-6
+		bars with diameters below threshold*max(diameters) are considered vanished
+	regularization: float, default = 1e-12
+		relative stabilization of the diagonal of the stiffness matrix
+	active_bars: array
+		indices of the realized bars; stresses are given for these bars only
+
+	Methods:
+	--------
+	displacements(loads), stress(loads), compliance(loads), analyze(loads)
+	'''
+
+	def __init__(self,truss,x,threshold=1e-6,regularization=1e-12):
+
+		self.truss 		= truss
+		self.x 			= np.array(x,dtype=float)
+		self.threshold 		= threshold
+		self.regularization 	= regularization
+
+		n_dof 			= truss.par['n_fn']*truss.par['dim']
+		bar_diam 		= np.array(bar_diameters(truss,self.x[:truss.par['n_g']]))
+
+		self.active_bars 	= np.nonzero(bar_diam > threshold*max(np.max(bar_diam,initial=0),1e-300))[0]
+
+		#stress [bar,dof] of the realized bars, i.e. E/l*B^T
+		dofs 			= np.asarray(truss.bar_dofs[self.active_bars])
+		cosines 		= np.asarray(truss.bar_cosines[self.active_bars])*(truss.par['E']/ \
+						np.asarray(truss.bar_lengths[self.active_bars]))[:,np.newaxis]
+		bars 			= np.broadcast_to(np.arange(len(self.active_bars))[:,np.newaxis],dofs.shape)
+		mask 			= dofs >= 0
+
+		self.stress_mat 	= sp.csr_matrix((cosines[mask],(bars[mask],dofs[mask])),
+							shape=(len(self.active_bars),n_dof))
+
+		#stiffness matrix of the realized bars and its factorization on the connected dofs
+		self.stiff_mat 		= sp.csr_matrix(stiffness_block(truss,self.active_bars,
+							bar_diam[self.active_bars]*truss.par['E']/ \
+							np.asarray(truss.bar_lengths[self.active_bars])))
+
+		diagonal 		= self.stiff_mat.diagonal()
+		self.dofs 		= np.nonzero(diagonal > 0)[0]
+
+		stiff_mat 		= self.stiff_mat[self.dofs][:,self.dofs]
+		stiff_mat 		= stiff_mat + sp.identity(len(self.dofs))*regularization*np.max(diagonal,initial=0)
+
+		self.factor 		= splu(sp.csc_matrix(stiff_mat)) if len(self.dofs) > 0 else None
+
+	def __repr__(self):
+
+		return 'Reanalysis(active bars=%d/%d, dofs=%d/%d)' % (len(self.active_bars),self.truss.par['n_b'],
+				len(self.dofs),self.truss.par['n_fn']*self.truss.par['dim'])
+
+	def forces(self,loads):
+		'''Forces [dof,case] on the free nodes of loads [node,dim,case] or [node,dim].'''
+
+		loads = np.asarray(loads,dtype=float)
+
+		if loads.ndim == 2:
+			loads = loads[:,:,np.newaxis]
+
+		if loads.shape[:2] != (self.truss.par['n_n'],self.truss.par['dim']):
+			raise ValueError('load cases must have the shape [#nodes,dimension,#loads]!')
+
+		return loads[self.truss.free_nodes].reshape(self.truss.par['n_fn']*self.truss.par['dim'],-1)
+
+	def solve(self,forces):
+		'''Displacements [dof,case] of the free nodes for the forces [dof,case].'''
+
+		out_disloc = np.zeros(forces.shape)
+
+		if self.factor is not None:
+			out_disloc[self.dofs] = self.factor.solve(np.ascontiguousarray(forces[self.dofs]))
+
+		return out_disloc
+
+	def displacements(self,loads):
+		'''Displacements of all nodes including the fixed ones; [node,dim,case].'''
+
+		node_disloc 	= self.solve(self.forces(loads))
+
+		out_disloc 	= np.zeros((self.truss.par['n_n'],self.truss.par['dim'],node_disloc.shape[1]))
+		out_disloc[self.truss.free_nodes] = node_disloc.reshape(self.truss.par['n_fn'],self.truss.par['dim'],-1)
+
+		return out_disloc
+
+	def stress(self,loads):
+		'''Stress on the realized bars; [case,active bar].'''
+
+		return (self.stress_mat @ self.solve(self.forces(loads))).T
+
+	def compliance(self,loads):
+		'''Compliance F_{ext}^T*u of all load cases.'''
+
+		forces = self.forces(loads)
+
+		return np.einsum('ij,ij->j',forces,self.solve(forces))
+
+	def analyze(self,loads):
+		'''Displacements, stresses, compliance and constraint violations of all load cases.
+
+		Parameters:
+		-----------
+		loads: array
+			load cases [node,dim,case] or a single load case [node,dim]
+
+		Returns a dict with the displacements [node,dim,case], the stresses on
+		the realized bars [case,active bar], the compliance [case], the maximum
+		residual of the equilibrium [case] and the maximum violation of the
+		compliance, stress and equilibrium constraints [case].
+		'''
+
+		truss 		= self.truss
+		forces 		= self.forces(loads)
+		node_disloc 	= self.solve(forces)
+
+		out_disloc 	= np.zeros((truss.par['n_n'],truss.par['dim'],forces.shape[1]))
+		out_disloc[truss.free_nodes] = node_disloc.reshape(truss.par['n_fn'],truss.par['dim'],-1)
+
+		out_stress 	= (self.stress_mat @ node_disloc).T
+		out_compliance 	= np.einsum('ij,ij->j',forces,node_disloc)
+		out_residual 	= np.max(np.abs(self.stiff_mat @ node_disloc - forces),axis=0,initial=0)
+
+		out_violation 	= np.maximum(out_compliance-truss.par['max_comp'],out_residual)
+		out_violation 	= np.maximum(out_violation,np.max(np.abs(out_stress)-truss.par['max_stress'],axis=1,initial=0))
+
+		return {'displacements':	out_disloc,
+			'stress':		out_stress,
+			'compliance':		out_compliance,
+			'residual':		out_residual,
+			'violation':		np.maximum(out_violation,0),
+			}
@@ -0,0 +1,224 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Result
+#---------------------------------------------------------------------------------------#
+
+class TrussResult:
+	'''Result of the optimization of a truss.
+
+	Derived quantities are computed on first access and cached. They refer to
+	the truss as it was when the result was created; accessing them after the
+	truss has been modified (e.g. by add_load_cases(), move_nodes(), reorder()
+	or set_limits()) raises a ValueError.
+
+	Attributes:
+	----------
+	truss: Truss
+		optimized truss
+	x: array
+		bar diameters and nodal displacements as obtained from solve() method
+	method: str
+		solution method
+	stats: dict
+		solver statistics, i.e. the Ipopt info for direct and relaxation
+		and the final ALM parameters for ALM
+	threshold: float, default = 1e-6
+		bars with diameters below threshold*max(diameters) are considered vanished
+	version: int
+		modification counter of the truss the result refers to (Truss.version)
+
+	Properties:
+	-----------
+	bar_diameters, volume, stress, displacements, active, active_bars, violation
+	'''
+
+	def __init__(self,truss,x,method,stats=None,threshold=1e-6):
+
+		self.truss 	= truss
+		self.x 		= np.array(x,dtype=float)
+		self.method 	= method
+		self.stats 	= {} if stats is None else stats
+		self.threshold 	= threshold
+		self.version 	= truss.version
+		self.cache 	= {}
+
+		if len(self.x) != truss.par['n_var']:
+			raise ValueError('x does not match the variables of the truss!')
+
+	def __repr__(self):
+
+		return 'TrussResult(method=%s, volume=%g, active bars=%d/%d, violation=%g)' % \
+			(self.method,self.volume,len(self.active_bars),self.truss.par['n_b'],self.violation)
+
+	def check(self):
+		'''Raise a ValueError if the truss has been modified since the result was created.'''
+
+		if self.truss.version != self.version:
+			raise ValueError('the truss has been modified since the result was created!')
+
+	def cached(self,name,func):
+		'''Value of the derived quantity name, computed by func on first access.'''
+
+		self.check()
+
+		if name not in self.cache:
+			self.cache[name] = func()
+
+		return self.cache[name]
+
+	@property
+	def bar_diameters(self):
+		'''Diameters of all bars.'''
+		return self.cached('bar_diameters',lambda: np.array(bar_diameters(self.truss,self.x)))
+
+	@property
+	def volume(self):
+		'''Total volume of the structure.'''
+		return self.cached('volume',lambda: float(self.truss.volume(self.x)))
+
+	@property
+	def stress(self):
+		'''Stress on the individual bars; [case,bar].'''
+		return self.cached('stress',lambda: self.truss.stress(self.x))
+
+	@property
+	def displacements(self):
+		'''Displacements of all nodes including the fixed ones; [node,dim,case].'''
+
+		def func():
+
+			out_disloc = np.zeros((self.truss.par['n_n'],self.truss.par['dim'],self.truss.par['n_lc']))
+			out_disloc[self.truss.free_nodes] = self.x[-self.truss.par['n_dl']:].reshape(
+								self.truss.par['n_fn'],self.truss.par['dim'],self.truss.par['n_lc'])
+
+			return out_disloc
+
+		return self.cached('displacements',func)
+
+	@property
+	def active(self):
+		'''Mask of the realized bars.'''
+		return self.cached('active',lambda: self.bar_diameters > \
+					self.threshold*max(np.max(self.bar_diameters,initial=0),1e-300))
+
+	@property
+	def active_bars(self):
+		'''Indices of the realized bars.'''
+		return self.cached('active_bars',lambda: np.nonzero(self.active)[0])
+
+	@property
+	def violation(self):
+		'''Maximum violation of bounds and constraints.'''
+		return self.cached('violation',lambda: float(violation(self.truss,self.x)))
+
+	def to_sparse(self,displacements=False):
+		'''Compact representation of the realized bars for archiving.
+
+		Parameters:
+		-----------
+		displacements: bool, default = False
+			Store the nodal displacements as well. Otherwise, they are
+			recomputed from the equilibrium by from_sparse().
+		'''
+
+		par 		= self.truss.par
+
+		out_sparse = {'n_n':		np.array(par['n_n']),
+			      'dim':		np.array(par['dim']),
+			      'n_lc':		np.array(par['n_lc']),
+			      'n_b':		np.array(par['n_b']),
+			      'n_g':		np.array(par['n_g']),
+			      'indices':	self.active_bars.astype(np.int32),
+			      'bars':		np.asarray(self.truss.bars)[self.active_bars].astype(np.int32),
+			      'diameters':	self.bar_diameters[self.active_bars],
+			      'volume':		np.array(self.volume),
+			      }
+
+		if displacements:
+			out_sparse['free_nodes'] 	= np.asarray(self.truss.free_nodes).astype(np.int32)
+			out_sparse['displacements'] 	= self.x[-par['n_dl']:]
+
+		return out_sparse
+
+	def save(self,file,displacements=False):
+		'''Save the compact representation to a compressed .npz file.'''
+
+		np.savez_compressed(file,**self.to_sparse(displacements))
+
+def result_from_sparse(truss,sparse,method='archive'):
+	'''Reconstruct a TrussResult for truss from its compact representation,
+	i.e. the output of TrussResult.to_sparse() or the file written by TrussResult.save().'''
+
+	if isinstance(sparse,str):
+		with np.load(sparse) as data:
+			sparse = {key: data[key] for key in data.files}
+
+	#sizes and variable layout of the truss
+	for key in ['n_n','dim','n_lc','n_b','n_g']:
+		if key not in sparse or int(sparse[key]) != truss.par[key]:
+			raise ValueError('sparse result does not match %s of the truss!' % key)
+
+	indices 			= np.asarray(sparse['indices'],dtype=np.int64)
+
+	if np.any((indices < 0) | (indices >= truss.par['n_b'])) or \
+		not np.array_equal(np.asarray(truss.bars)[indices],sparse['bars']):
+		raise ValueError('sparse result does not match the bars of the truss!')
+
+	bar_diam 			= np.zeros((truss.par['n_b']))
+	bar_diam[indices] 		= sparse['diameters']
+
+	x = np.concatenate((group_diameters(truss,bar_diam),np.zeros((truss.par['n_dl']))))
+
+	if 'displacements' in sparse:
+
+		#the displacements are stored in the order of the free nodes
+		if not np.array_equal(np.asarray(truss.free_nodes),sparse['free_nodes']) or \
+			len(sparse['displacements']) != truss.par['n_dl']:
+			raise ValueError('sparse result does not match the degrees of freedom of the truss!')
+
+		x[truss.par['n_g']:] = sparse['displacements']
+	else:
+		x = equilibrium_displacements(truss,x)
+
+	return TrussResult(truss,x,method)
+
+#---------------------------------------------------------------------------------------#
+#		Solve with result
+#---------------------------------------------------------------------------------------#
+
+def solve_result(self,method,**kwargs):
+
+	start_time 	= time.time()
+	out 		= self.solve(method,**kwargs)
+
+	if isinstance(out,tuple):
+		x,stats = out[0],dict(out[1])
+
+	else:
+		x 	= out
+		stats 	= {key: self.par_ALM[key] for key in ['iter','alpha','V','KKT','eta']
+				if key in self.par_ALM}
+
+	stats['time'] = time.time()-start_time
+
+	return TrussResult(self,x,method,stats)
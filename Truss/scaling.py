@@ -0,0 +1,128 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+#---------------------------------------------------------------------------------------#
+#		Parameters
+#---------------------------------------------------------------------------------------#
+
+def scaling_parameters(enabled=True,obj=None,x=None,g=None):
+	'''Parameters for the scaling of the NLP passed to Ipopt.
+
+	Parameters:
+	-----------
+	enabled: bool, default = True
+		Pass the scaling factors to Ipopt (nlp_scaling_method = user-scaling).
+		Otherwise, the gradient-based scaling of Ipopt is used.
+	obj: float, default = None
+		scaling factor of the objective; automatic if None
+	x: array, default = None
+		scaling factors of the variables; automatic if None
+	g: array, default = None
+		scaling factors of the constraints; automatic if None
+	'''
+
+	out_par_scaling = {'enabled':	bool(enabled),
+			   'obj':	obj,
+			   'x':		None if x is None else np.asarray(x,dtype=float),
+			   'g':		None if g is None else np.asarray(g,dtype=float),
+			   }
+
+	return out_par_scaling
+
+#---------------------------------------------------------------------------------------#
+#		Scaling factors
+#---------------------------------------------------------------------------------------#
+
+def problem_scaling(self):
+	'''Scaling factors of objective, variables and constraints of the current problem.
+
+	The factors are the inverse of the characteristic magnitudes:
+
+	diameters 		x_ref = F/sigma_{max}, within [x_{min},x_{max}]
+	displacements (case k) 	u_k = c/|F_k|
+	objective 		x_ref * mean(l_i) * n_b^(1/2)
+	compliance 		c
+	equilibrium (case k) 	|F_k|_inf
+	vanishing diameter 	x_ref^2
+	vanishing stress 	sigma_{max}^2 * x_ref
+
+	with the largest load norm F. Values set by set_scaling() replace the automatic ones.
+	'''
+
+	n_g 		= self.par['n_g']
+	n_lc 		= self.par['n_lc']
+	n_dof 		= self.par['n_fn']*self.par['dim']
+
+	#load magnitudes of the individual load cases
+	loads 		= self.load_cases[self.free_nodes].reshape(n_dof,n_lc)
+	load_norm 	= np.linalg.norm(loads,axis=0)
+	load_max 	= np.max(np.abs(loads),axis=0,initial=0)
+
+	ref_load 	= np.max(load_norm,initial=0)
+	ref_load 	= ref_load if ref_load > 0 else 1.0
+
+	load_norm[load_norm == 0] = ref_load
+	load_max[load_max == 0]   = ref_load
+
+	#characteristic diameter of a bar carrying the load at maximum stress
+	ref_diam 	= ref_load/self.par['max_stress']
+	ref_diam 	= min(max(ref_diam,self.par['min_diam']),self.par['max_diam'])
+
+	#characteristic volume: a load path of O(n_b^(1/2)) bars of mean length
+	mean_length 	= float(np.mean(self.bar_lengths)) if self.par['n_b'] > 0 else 1.0
+	ref_volume 	= ref_diam*mean_length*np.sqrt(max(self.par['n_b'],1))
+
+	#variables [bar_diam,node_disloc], node_disloc[dof,case]
+	ref_disloc 	= self.par['max_comp']/load_norm
+
+	x_scaling 	= np.concatenate((np.ones((n_g))/ref_diam,np.tile(1/ref_disloc,n_dof)))
+
+	#constraints [compliance,equilibrium,(vanishing diameter,vanishing stress)]
+	g_scaling 	= [np.ones((n_lc))/self.par['max_comp'],np.tile(1/load_max,n_dof)]
+
+	if not self.method_ALM:
+		g_scaling += [np.ones((n_g))/ref_diam**2,
+			      np.ones((self.par['n_sc']*n_lc))/(self.par['max_stress']**2*ref_diam)]
+
+	out_scaling 	= {'obj':	1/ref_volume,
+			   'x':		x_scaling,
+			   'g':		np.concatenate(g_scaling),
+			   }
+
+	#user-defined factors
+	for key in out_scaling:
+
+		if self.par_scaling[key] is None:
+			continue
+
+		if key != 'obj' and len(self.par_scaling[key]) != len(out_scaling[key]):
+			raise ValueError('%s scaling must have %d entries!' % (key,len(out_scaling[key])))
+
+		out_scaling[key] = self.par_scaling[key]
+
+	return out_scaling
+
+def scale_problem(self,problem):
+	'''Pass the scaling factors to the Ipopt problem.'''
+
+	if not self.par_scaling['enabled']:
+		return
+
+	scaling = problem_scaling(self)
+
+	problem.addOption('nlp_scaling_method','user-scaling')
+	problem.setProblemScaling(obj_scaling=scaling['obj'],x_scaling=scaling['x'],g_scaling=scaling['g'])
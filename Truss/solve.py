@@ -15,20 +15,26 @@
 
 import numpy as np
 import ipopt as ipopt
-import numdifftools as nd
 
 from .functions import *
+from .scaling import *
+from .derivatives import *
 from .auxiliary_solve import *
 
+#Ipopt iterations per decade of the inner tolerance for the default iteration cap
+#of the subproblems of the inexact ALM, see inner_iterations()
+INNER_ITER_DECADE = 25
+
 #---------------------------------------------------------------------------------------#
 #		Direct
 #---------------------------------------------------------------------------------------#
 
-def solve_direct(self):
+def solve_direct(self,x0=None,options=()):
 
 	#start values
-	x0 = np.concatenate([np.ones((self.par['n_b']))*self.bar_diam,
-				np.zeros((self.par['n_dl']))])
+	if x0 is None:
+		x0 = np.concatenate([group_diameters(self,self.bar_diam),
+					np.zeros((self.par['n_dl']))])
 
 	#parameter bounds - bar diameters and all dislocations
 	lb = self.bounds()[0]
@@ -42,35 +48,280 @@ def solve_direct(self):
 	problem_ipopt 	= ipopt.problem(n=self.par['n_var'],m=len(cl),problem_obj=self,
 					lb=lb,ub=ub,cl=cl,cu=cu)
 
+	#scaling from geometry, loads and limits
+	scale_problem(self,problem_ipopt)
+
 	#add options for ipopt
 	add_option_ipopt(self,problem=problem_ipopt)
 
+	for option in options:
+		problem_ipopt.addOption(*option)
+
 	#solve
 	out_opt,out_info = problem_ipopt.solve(x0)
 
 	return out_opt,out_info
 
+def ipopt_stopped(self):
+	'''True if the last Ipopt solve has been stopped by intermediate(),
+	i.e. the outer iterations have to stop as well.'''
+
+	return self.par_stream is not None and self.par_stream['reason'] is not None
+
+#---------------------------------------------------------------------------------------#
+#		Relaxation
+#---------------------------------------------------------------------------------------#
+
+def relaxation_parameters(self,**kwargs):
+
+	out_par_relax 	= {'x':			np.concatenate([group_diameters(self,self.bar_diam),
+							np.zeros((self.par['n_dl']))]),
+			   't':			0.0,
+			   't0':		1.0,
+			   't_min':		1e-8,
+			   't_factor':		0.1,
+			   'mu_init':		1e-4,
+			   'exact':		True,
+			   }
+
+	for key in kwargs:
+
+		if key == 'x0':
+			out_par_relax['x'] 	= kwargs[key].astype(float)
+
+		elif key in ['t0','t_min','t_factor','mu_init']:
+			out_par_relax[key] 	= float(kwargs[key])
+
+		elif key == 'exact':
+			out_par_relax[key] 	= bool(kwargs[key])
+
+		else:
+			raise KeyError('key %s not known!'% key)
+
+	#the continuation has to shrink t from t0 to t_min
+	if not 0 < out_par_relax['t_factor'] < 1:
+		raise ValueError('t_factor must be between 0 and 1!')
+
+	if not 0 <= out_par_relax['t_min'] < out_par_relax['t0']:
+		raise ValueError('t_min must be nonnegative and smaller than t0!')
+
+	return out_par_relax
+
+def solve_relaxation(self):
+
+	for x,info in iterate_relaxation(self):
+		pass
+
+	return x,info
+
+def iterate_relaxation(self):
+	'''Generator of the solves of the relaxation method; yields (x,info) after every solve.'''
+
+	#Scholtes-type relaxation G*H <= t of the vanishing constraints;
+	#each solve is warm-started from the previous one with a small barrier parameter
+	x 	= self.par_relax['x']
+	options = ()
+	stats 	= []
+
+	self.par_relax['t'] = self.par_relax['t0']
+
+	try:
+
+		while True:
+
+			x,info = solve_direct(self,x,options)
+
+			stats.append({'t':		self.par_relax['t'],
+				      'volume':		self.volume(x),
+				      'status':		info['status'],
+				      })
+
+			if self.verbose:
+				print('t\t',self.par_relax['t'],'volume\t',stats[-1]['volume'],'\t',info['status_msg'])
+
+			info['relaxation'] = stats
+
+			yield x,info
+
+			if ipopt_stopped(self):
+				break
+
+			options = [['mu_init',self.par_relax['mu_init']]]
+
+			#tolerance for the rounding of t*t_factor
+			if self.par_relax['t'] <= self.par_relax['t_min']*(1+1e-9):
+
+				if self.par_relax['exact'] and self.par_relax['t'] > 0:
+					self.par_relax['t'] = 0.0
+					continue
+
+				break
+
+			self.par_relax['t'] = max(self.par_relax['t']*self.par_relax['t_factor'],self.par_relax['t_min'])
+
+	finally:
+		self.par_relax['t'] = 0.0
+
+#---------------------------------------------------------------------------------------#
+#		Aggregated stress constraints
+#---------------------------------------------------------------------------------------#
+
+def solve_aggregated(self,method,**kwargs):
+
+	#all methods but ALM return (x,info)
+	direct 		= method not in ['ALM','alm']
+	par_agg 	= self.par_agg
+	parameter 	= par_agg['parameter']
+	stats 		= []
+
+	par_agg['running'] = True
+
+	try:
+
+		#continuation in the aggregation parameter, warm-started solves
+		par_agg['active'] = True
+		problem_sizes(self)
+
+		while True:
+
+			out = self.solve(method,**kwargs)
+			x   = out[0] if direct else out
+
+			stats.append({'parameter':	par_agg['parameter'],
+				      'volume':		self.volume(x),
+				      'status':		out[1]['status'] if direct else self.par_ALM['iter'],
+				      })
+
+			if self.verbose:
+				print('aggregation parameter\t',par_agg['parameter'],'volume\t',stats[-1]['volume'])
+
+			kwargs['x0'] = x
+
+			if not direct:
+				kwargs['eta0'] = self.par_ALM['eta']
+
+			if par_agg['parameter'] >= par_agg['max_parameter'] or ipopt_stopped(self):
+				break
+
+			par_agg['parameter'] = min(par_agg['parameter']*par_agg['factor'],par_agg['max_parameter'])
+
+		#final solve with one stress constraint per bar
+		if par_agg['polish'] and not ipopt_stopped(self):
+
+			if not direct:
+				kwargs['eta0'] = expand_aggregated_eta(self,x,kwargs['eta0'])
+
+			par_agg['active'] = False
+			problem_sizes(self)
+
+			out = self.solve(method,**kwargs)
+
+	finally:
+
+		par_agg['parameter'] 	= parameter
+		par_agg['active'] 	= False
+		par_agg['running'] 	= False
+		problem_sizes(self)
+
+	if direct:
+		out[1]['aggregation'] = stats
+
+	return out
+
+def expand_aggregated_eta(self,x,eta):
+	'''Distribute the multipliers of the aggregated stress constraints
+	to the stress constraints of the individual bars.'''
+
+	bar_diam 	= bar_diameters(self,x)
+	sigma 		= self.stress(x)
+
+	out_eta 	= [eta[:self.par['n_g']]]
+
+	for num_case in range(self.par['n_lc']):
+
+		values 	= stress_rows(self,(sigma[num_case]**2 - self.par['max_stress']**2)*bar_diam)
+		weights = aggregate_stress(self,values)[1]
+		eta_agg = eta[self.par['n_g']+num_case*self.par['n_ag']:self.par['n_g']+(num_case+1)*self.par['n_ag']]
+
+		out_eta.append(aggregation_matrix(self,weights).T @ eta_agg)
+
+	return np.concatenate(out_eta)
+
 #---------------------------------------------------------------------------------------#
 #		ALM main
 #---------------------------------------------------------------------------------------#
 
+def alm_parameters(self,**kwargs):
+
+	out_par_ALM 	= {'n':			self.par['n_var'],
+			   'x':			np.zeros((self.par['n_var'])),
+			   'eta':		np.zeros((self.par['n_van'])),
+			   'eta_max':		1e4,
+			   'alpha':		1.0,
+			   'gamma':		2.0,
+			   'tau':		0.1,
+			   'iter':		0,
+			   'max_iter':		200,
+			   'stop_crit':		1e-6,
+			   'inexact':		False,
+			   'tol_inner':		1e-2,
+			   'tol_factor':	0.1,
+			   #None: inner_iterations() for inexact ALM, no cap otherwise; 0: no cap
+			   'max_inner_iter':	None,
+			   }
+
+	for key in kwargs:
+
+		if key in ['x0','eta0']:
+			out_par_ALM[key[:-1]] 	= kwargs[key].astype(float)
+
+		elif key in ['eta_max','alpha','gamma',
+				'tau','max_iter','stop_crit',
+				'tol_inner','tol_factor']:
+			out_par_ALM[key] 	= float(kwargs[key])
+
+		elif key == 'inexact':
+			out_par_ALM[key] 	= bool(kwargs[key])
+
+		elif key == 'max_inner_iter':
+			out_par_ALM[key] 	= None if kwargs[key] is None else int(kwargs[key])
+
+		else:
+			raise KeyError('key %s not known!'% key)
+
+	return out_par_ALM
+
 def solve_alm(self):
 
+	for converged in iterate_alm(self):
+		pass
+
+	return self.par_ALM['x']
+
+def iterate_alm(self):
+	'''Generator of the outer ALM iterations; yields whether the
+	stopping criterion is met after every iteration.'''
+
 	self.method_ALM = True
 
-	while self.par_ALM['iter'] < self.par_ALM['max_iter']:
+	try:
 
-		if self.verbose:
-			print_stat_alm(self)
+		while self.par_ALM['iter'] < self.par_ALM['max_iter']:
 
-		step_ALM(self)
+			if self.verbose:
+				print_stat_alm(self)
 
-		if break_ALM(self):
-			break
+			step_ALM(self)
 
-	self.method_ALM = False
+			converged = bool(break_ALM(self))
 
-	return self.par_ALM['x']
+			yield converged
+
+			if converged or ipopt_stopped(self):
+				break
+
+	finally:
+		self.method_ALM = False
 
 #---------------------------------------------------------------------------------------#
 #		ALM step
@@ -127,8 +378,20 @@ def subproblem_ALM(self):
 	problem_ipopt 	= ipopt.problem(n=self.par_ALM['n'],m=self.par_ALM['m'],problem_obj=self,
 					lb=lb,ub=ub,cl=cl,cu=cu)
 
+	#scaling from geometry, loads and limits
+	scale_problem(self,problem_ipopt)
+
 	add_option_ipopt(self,problem=problem_ipopt)
 
+	#inexact ALM: tolerance of the subproblem from the current progress
+	if self.par_ALM['inexact']:
+		problem_ipopt.addOption('tol',inner_tolerance(self))
+
+	max_inner_iter = inner_iterations(self)
+
+	if max_inner_iter > 0:
+		problem_ipopt.addOption('max_iter',max_inner_iter)
+
 	opt,info = problem_ipopt.solve(self.par_ALM['x'])
 		
 	self.par_ALM['x'] 		= opt
@@ -142,6 +405,36 @@ def subproblem_ALM(self):
 
 	return
 
+def inner_tolerance(self):
+
+	#loose tolerance in early iterations, proportional to the constraint violation V
+	#and the KKT residual afterwards, never looser than before and never below stop_crit
+	tol = self.par_ALM['tol_inner']
+
+	if self.par_ALM['iter'] > 0:
+		tol = min(tol,self.par_ALM['tol_factor']*max(self.par_ALM['V'],self.par_ALM['KKT']))
+
+	tol = max(tol,self.par_ALM['stop_crit'])
+
+	self.par_ALM['tol_inner'] = tol
+
+	return tol
+
+def inner_iterations(self):
+	'''Cap of the Ipopt iterations of a subproblem, 0 for no cap.
+
+	By default, the subproblems of the inexact ALM are capped at INNER_ITER_DECADE
+	iterations per decade of the inner tolerance, i.e. loosely solved subproblems
+	get few iterations; exact subproblems are not capped.'''
+
+	if self.par_ALM['max_inner_iter'] is not None:
+		return max(self.par_ALM['max_inner_iter'],0)
+
+	if not self.par_ALM['inexact']:
+		return 0
+
+	return int(INNER_ITER_DECADE*max(1,np.ceil(-np.log10(self.par_ALM['tol_inner']))))
+
 #---------------------------------------------------------------------------------------#
 #		ALM break
 #---------------------------------------------------------------------------------------#
@@ -159,11 +452,10 @@ def break_ALM(self):
 
 	self.method_ALM = True
 
-	KKT_lagrangian += np.dot(self.par_ALM['mult_sub'].T,
-				self.jacobian(self.par_ALM['x']).reshape(self.par_ALM['m'],self.par_ALM['n']))
+	KKT_lagrangian += constraint_matrix(self,self.par_ALM['x']).T @ self.par_ALM['mult_sub']
 
 	#the relaxed constraints (eta*nabla*GH)
-	KKT_lagrangian += np.dot(self.par_ALM['eta'],nd.Jacobian(self.vanishing)(self.par_ALM['x']))
+	KKT_lagrangian += vanishing_matrix(self,self.par_ALM['x']).T @ self.par_ALM['eta']
 
 	#the bounds
 	try:
@@ -176,6 +468,9 @@ def break_ALM(self):
 	#complementarity test for relaxed constraint 
 	KKT_complement = np.min((-self.vanishing(self.par_ALM['x']),self.par_ALM['eta']),axis=0)
 
+	#KKT residual for the tolerance of the next subproblem
+	self.par_ALM['KKT'] = max(np.max(np.abs(KKT_lagrangian)),np.max(np.abs(KKT_complement)))
+
 	if self.verbose:
 		print('KKT_lagrangian',np.max(np.abs(KKT_lagrangian)))
 		print('KKT_complement',np.max(np.abs(KKT_complement)))
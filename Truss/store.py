@@ -0,0 +1,391 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .auxiliary_truss import *
+from .cache import *
+
+#---------------------------------------------------------------------------------------#
+#		Out-of-core bar storage
+#---------------------------------------------------------------------------------------#
+
+class BarStore:
+	'''Memory-mapped storage of the bars and the per-bar geometry on disk.
+
+	For large ground structures, the bars, bar lengths and compact bar geometry
+	(bar_dofs, bar_cosines) are kept in binary files in the directory path and
+	accessed as read-only memory maps; only the chunks currently processed
+	reside in memory. The store is written in chunks by build_store().
+
+	Attributes:
+	----------
+	path: str
+		directory of the store
+	key: str
+		hash of the geometric input, see geometry_key()
+	n_b: int
+		number of bars
+	dim: int
+		dimension
+	'''
+
+	#name, data type and number of columns per bar (0: one value per bar)
+	arrays = [('bars',np.int64,2),('bar_lengths',np.float64,0),
+		  ('bar_dofs',np.int64,-2),('bar_cosines',np.float64,-2)]
+
+	def __init__(self,path):
+
+		self.path 	= path
+
+		with open(os.path.join(path,'store.json')) as file:
+			meta = json.load(file)
+
+		self.key 	= meta['key']
+		self.n_b 	= int(meta['n_b'])
+		self.dim 	= int(meta['dim'])
+
+		for name,dtype,columns in self.arrays:
+			setattr(self,name,self.open(name,dtype,columns))
+
+	def __len__(self):
+		return self.n_b
+
+	def __reduce__(self):
+		#other processes reopen the memory maps instead of copying the data
+		return (BarStore,(self.path,))
+
+	def shape(self,columns):
+
+		if columns == 0:
+			return (self.n_b,)
+
+		#negative: multiple of the dimension
+		return (self.n_b,columns if columns > 0 else -columns*self.dim)
+
+	def open(self,name,dtype,columns):
+
+		if self.n_b == 0:
+			return np.zeros(self.shape(columns),dtype=dtype)
+
+		return np.memmap(os.path.join(self.path,name+'.bin'),dtype=dtype,mode='r',shape=self.shape(columns))
+
+def is_store(path,key=None):
+	'''Check whether path contains a complete store (with the given key).'''
+
+	meta_file = os.path.join(path,'store.json')
+
+	if not os.path.isfile(meta_file):
+		return False
+
+	if key is None:
+		return True
+
+	with open(meta_file) as file:
+		return json.load(file)['key'] == key
+
+def build_store(path,nodes,fixed_nodes,max_length=1e6,bars=None,chunk_size=None):
+	'''Write the ground structure for the given nodes into a BarStore in path.
+
+	The potential bars are generated and written in chunks of about chunk_size
+	node pairs such that neither the bars nor their geometry have to fit into memory.
+
+	Parameters:
+	-----------
+	path: str
+		directory of the store; an existing store in path is replaced,
+		other non-empty directories are rejected
+	nodes, fixed_nodes, max_length, bars:
+		as for Truss
+	chunk_size: int, default = None
+		node pairs per chunk; BAR_CHUNK if None
+	'''
+
+	nodes 		= np.asarray(nodes,dtype=float)
+	dim 		= nodes.shape[1]
+	free_nodes 	= np.setdiff1d(range(len(nodes)),fixed_nodes)
+
+	key 		= geometry_key(nodes,fixed_nodes,max_length,bars)
+
+	check_store_path(path)
+
+	#the store is written to a temporary directory and moved into place when complete
+	tmp_path 	= '%s.%d.tmp' % (os.path.normpath(path),os.getpid())
+	os.makedirs(tmp_path,exist_ok=True)
+
+	files 		= {name: open(os.path.join(tmp_path,name+'.bin'),'wb') for name,_,_ in BarStore.arrays}
+
+	if bars is None:
+		chunks 	= candidate_bars(nodes,fixed_nodes,max_length,chunk_size)
+	else:
+		bars 	= np.asarray(bars,dtype=np.int64)
+		step 	= BAR_CHUNK if chunk_size is None else chunk_size
+		chunks 	= (bars[start:start+step] for start in range(0,len(bars),step))
+
+	n_b 		= 0
+
+	try:
+		for chunk in chunks:
+
+			lengths = np.linalg.norm(nodes[chunk[:,1]]-nodes[chunk[:,0]],axis=1)
+
+			np.ascontiguousarray(chunk,dtype=np.int64).tofile(files['bars'])
+			lengths.tofile(files['bar_lengths'])
+			pair_dofs(len(nodes),free_nodes,dim,chunk).tofile(files['bar_dofs'])
+			pair_cosines(nodes,chunk,lengths).tofile(files['bar_cosines'])
+
+			n_b += len(chunk)
+
+	finally:
+		for file in files.values():
+			file.close()
+
+	with open(os.path.join(tmp_path,'store.json'),'w') as file:
+		json.dump({'key': key,'n_b': n_b,'dim': dim},file)
+
+	if os.path.isdir(path):
+		replace_store(tmp_path,path)
+	else:
+		os.replace(tmp_path,path)
+
+	return BarStore(path)
+
+def check_store_path(path):
+	'''Raise a ValueError if path exists and is neither a store nor an empty directory.'''
+
+	if not os.path.exists(path):
+		return
+
+	if not os.path.isdir(path) or (len(os.listdir(path)) > 0 and not is_store(path)):
+		raise ValueError('%s is not a store and not an empty directory!' % path)
+
+def replace_store(tmp_path,path):
+	'''Move the files of the store in tmp_path to the directory path; only the
+	files of a previous store in path are replaced, all other files are kept.'''
+
+	#an incomplete store is not recognized by is_store()
+	if os.path.isfile(os.path.join(path,'store.json')):
+		os.remove(os.path.join(path,'store.json'))
+
+	for name,_,_ in BarStore.arrays:
+		os.replace(os.path.join(tmp_path,name+'.bin'),os.path.join(path,name+'.bin'))
+
+	os.replace(os.path.join(tmp_path,'store.json'),os.path.join(path,'store.json'))
+	os.rmdir(tmp_path)
+
+#---------------------------------------------------------------------------------------#
+#		Geometry from store
+#---------------------------------------------------------------------------------------#
+
+def store_geometry(self,store,bars=None):
+	'''Take bars, bar lengths and compact bar geometry of the truss from a BarStore.
+
+	Parameters:
+	-----------
+	store: BarStore or str
+		store or its directory; the store is built if the directory
+		does not contain the store for the geometry of the truss.
+		A given BarStore has to match the geometry of the truss.
+	bars: array, default = None
+		indices of start and end nodes; potential bars if None
+	'''
+
+	key = geometry_key(self.nodes,self.fixed_nodes,self.par['max_length'],bars)
+
+	if not isinstance(store,BarStore):
+
+		if is_store(store,key):
+			store = BarStore(store)
+		else:
+			store = build_store(store,self.nodes,self.fixed_nodes,self.par['max_length'],bars)
+
+	#a given store may have been built for other nodes, limits or bars
+	if store.key != key:
+		raise ValueError('store does not match the geometry of the truss!')
+
+	if store.dim != self.par['dim']:
+		raise ValueError('store does not match the dimension of the truss!')
+
+	self.store 		= store
+	self.bars 		= store.bars
+	self.bar_lengths 	= store.bar_lengths
+	self.bar_dofs 		= store.bar_dofs
+	self.bar_cosines 	= store.bar_cosines
+
+#---------------------------------------------------------------------------------------#
+#		Shared-memory geometry
+#---------------------------------------------------------------------------------------#
+
+class SharedStore:
+	'''Nodes, bars and per-bar geometry in one block of shared memory.
+
+	All arrays are read-only views of the block. Pickling transfers only the
+	name of the block and the layout of the arrays; other processes attach to
+	the block instead of copying the data. The store created by shared_store()
+	owns the block and unlinks it with close() or when it is deleted, hence
+	it has to be kept alive while other processes use the block.
+
+	Attributes:
+	----------
+	name: str
+		name of the shared memory block
+	layout: dict
+		offset, shape and data type of every array in the block
+	owner: bool
+		the block is unlinked by this store
+	'''
+
+	def __init__(self,name,layout,memory=None):
+
+		self.name 	= name
+		self.layout 	= layout
+		self.owner 	= memory is not None
+		self.memory 	= attach_memory(name) if memory is None else memory
+
+		for key,(offset,shape,dtype) in layout.items():
+
+			array 			= np.ndarray(shape,dtype=dtype,buffer=self.memory.buf,offset=offset)
+			array.flags.writeable 	= False
+
+			setattr(self,key,array)
+
+	def __len__(self):
+		return self.layout['bars'][1][0]
+
+	def __reduce__(self):
+		#other processes attach to the block instead of copying the data
+		return (SharedStore,(self.name,self.layout))
+
+	def __del__(self):
+		self.close()
+
+	def close(self):
+		'''Detach from the block; the owner also unlinks it. The arrays must not be used afterwards.'''
+
+		if getattr(self,'memory',None) is None:
+			return
+
+		for key in self.layout:
+			self.__dict__.pop(key,None)
+
+		memory 		= self.memory
+		self.memory 	= None
+
+		try:
+			memory.close()
+		except BufferError:
+			#views of the arrays are still referenced; the mapping is released with them
+			pass
+
+		if self.owner:
+			memory.unlink()
+
+def attach_memory(name):
+	'''Attach to the shared memory block name without tracking it, such that the
+	block is not removed when the attaching process exits.'''
+
+	try:
+		return shared_memory.SharedMemory(name=name,track=False)
+
+	except TypeError:
+		#Python < 3.13 tracks every attached block
+		memory = shared_memory.SharedMemory(name=name)
+		resource_tracker.unregister(memory._name,'shared_memory')
+
+		return memory
+
+def shared_store(arrays):
+	'''Copy the arrays (dict of name and array) into a new block of shared memory
+	and return the owning SharedStore.'''
+
+	layout 	= {}
+	size 	= 0
+
+	for key,array in arrays.items():
+
+		array 		= np.asarray(array)
+		layout[key] 	= (size,array.shape,array.dtype.str)
+
+		#aligned to cache lines
+		size 	       += -(-array.nbytes//64)*64
+
+	memory 	= shared_memory.SharedMemory(create=True,size=max(size,1))
+
+	for key,array in arrays.items():
+
+		offset,shape,dtype = layout[key]
+		np.ndarray(shape,dtype=dtype,buffer=memory.buf,offset=offset)[...] = array
+
+	return SharedStore(memory.name,layout,memory)
+
+#---------------------------------------------------------------------------------------#
+#		Sharing the geometry of a truss
+#---------------------------------------------------------------------------------------#
+
+GEOMETRY = ['nodes','bars','bar_lengths','bar_dofs','bar_cosines']
+
+def share_geometry(self,path=None):
+	'''Move nodes, bars, bar lengths and compact bar geometry of the truss to shared
+	memory (or to a BarStore in path) and return the store. Afterwards, pickling
+	the truss transfers only the handle of the store instead of the arrays.'''
+
+	bar_dofs 	= np.asarray(self.bar_dofs)
+
+	#existing directories other than stores are never overwritten
+	if path is not None:
+		check_store_path(path)
+
+	if path is None:
+		store 	= shared_store({name: getattr(self,name) for name in GEOMETRY})
+	else:
+		store 	= build_store(path,self.nodes,self.fixed_nodes,self.par['max_length'],np.asarray(self.bars))
+
+	previous 	= self.store
+	self.store 	= store
+
+	for name in GEOMETRY:
+		if hasattr(store,name):
+			setattr(self,name,getattr(store,name))
+
+	#the store on disk has the natural order of the degrees of freedom
+	if self.dof_order is not None and path is not None:
+		self.bar_dofs = bar_dofs
+
+	if isinstance(previous,SharedStore):
+		previous.close()
+
+	return store
+
+def unshare_geometry(self):
+	'''Copy the geometry of the truss from its store back to memory and release the store.'''
+
+	store 		= self.store
+
+	if store is None:
+		return
+
+	for name in GEOMETRY:
+		if getattr(store,name,None) is not None and getattr(self,name) is getattr(store,name):
+			setattr(self,name,np.array(getattr(self,name)))
+
+	self.store 	= None
+
+	if isinstance(store,SharedStore):
+		store.close()
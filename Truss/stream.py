@@ -0,0 +1,223 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+
+from .solve import *
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Parameters
+#---------------------------------------------------------------------------------------#
+
+def stream_parameters(time_budget=None,cancel=None,inner=False):
+	'''Parameters of a streaming solve.
+
+	Parameters:
+	-----------
+	time_budget: float, default = None
+		total wall-clock time in seconds; unlimited if None
+	cancel: threading.Event or function, default = None
+		The solve is stopped as soon as cancel is set (or returns True).
+	inner: bool, default = False
+		Record a snapshot of every Ipopt iteration.
+	'''
+
+	start_time 	= time.time()
+
+	out_par_stream 	= {'start':	start_time,
+			   'deadline':	None if time_budget is None else start_time+float(time_budget),
+			   'cancel':	cancel,
+			   'inner':	bool(inner),
+			   'events':	[],
+			   'reason':	None,
+			   }
+
+	return out_par_stream
+
+def stop_reason(self):
+	'''Reason to stop the streaming solve ('cancelled' or 'time') or None.'''
+
+	par_stream 	= self.par_stream
+
+	if par_stream is None:
+		return None
+
+	cancel 		= par_stream['cancel']
+
+	if cancel is not None and (cancel.is_set() if hasattr(cancel,'is_set') else cancel()):
+		return 'cancelled'
+
+	if par_stream['deadline'] is not None and time.time() >= par_stream['deadline']:
+		return 'time'
+
+	return None
+
+#---------------------------------------------------------------------------------------#
+#		Ipopt iterations
+#---------------------------------------------------------------------------------------#
+
+def intermediate(self,iter_count,obj_value,inf_pr,inf_du,mu):
+	'''Record the Ipopt iteration and return False if the solve has to be stopped.'''
+
+	if self.par_stream is None:
+		return True
+
+	if self.par_stream['inner']:
+		self.par_stream['events'].append({'kind':	'inner',
+						  'iter':	int(iter_count),
+						  'time':	time.time()-self.par_stream['start'],
+						  'objective':	obj_value,
+						  'inf_pr':	inf_pr,
+						  'inf_du':	inf_du,
+						  'mu':		mu,
+						  })
+
+	self.par_stream['reason'] = stop_reason(self)
+
+	return self.par_stream['reason'] is None
+
+#---------------------------------------------------------------------------------------#
+#		Streaming solve
+#---------------------------------------------------------------------------------------#
+
+def solve_stream(self,method,time_budget=None,cancel=None,inner=False,tol=1e-6,**kwargs):
+	'''Generator of snapshots of the solve; see Truss.solve_iter().'''
+
+	direct 		= method in ['Ipopt','IPOPT','ipopt','direct']
+
+	if direct:
+
+		for key in kwargs:
+			if key != 'x0':
+				raise KeyError('key %s not known!'% key)
+
+		steps 		= iterate_direct(self,kwargs.get('x0'))
+
+	elif method in ['ALM','alm']:
+
+		self.par_ALM 	= alm_parameters(self,**kwargs)
+		steps 		= iterate_alm(self)
+
+	elif method in ['relaxation','relax']:
+
+		self.par_relax 	= relaxation_parameters(self,**kwargs)
+		steps 		= iterate_relaxation(self)
+
+	else:
+		raise ValueError('method must be direct, ALM or relaxation!')
+
+	self.par_stream = stream_parameters(time_budget,cancel,inner)
+	start_time 	= self.par_stream['start']
+	best 		= None
+	reason 		= 'finished'
+
+	try:
+
+		for num_iter,step in enumerate(steps):
+
+			#ALM yields the stopping criterion, direct and relaxation yield (x,info)
+			if method in ['ALM','alm']:
+				x,converged 	= self.par_ALM['x'],step
+			else:
+				x,converged 	= step[0],direct
+
+			#Ipopt iterations of this outer iteration
+			for event in self.par_stream['events']:
+				event['outer'] = num_iter
+				yield event
+
+			self.par_stream['events'] = []
+
+			snapshot 	= outer_snapshot(self,method,num_iter,x,tol)
+
+			if best is None or better_snapshot(snapshot,best):
+				best 	= snapshot
+
+			yield snapshot
+
+			if converged:
+				reason = 'converged'
+				break
+
+			if stop_reason(self) is not None:
+				reason = stop_reason(self)
+				break
+
+	finally:
+		#also resets method_ALM and the relaxation parameter if stopped early
+		steps.close()
+		self.par_stream = None
+
+	yield {'kind':		'final',
+	       'method':	method,
+	       'reason':	reason,
+	       'time':		time.time()-start_time,
+	       'iter':		-1 if best is None else best['iter'],
+	       'x':		None if best is None else best['x'],
+	       'volume':	np.inf if best is None else best['volume'],
+	       'violation':	np.inf if best is None else best['violation'],
+	       'feasible':	False if best is None else best['feasible'],
+	       }
+
+def iterate_direct(self,x0):
+
+	yield solve_direct(self,x0)
+
+def outer_snapshot(self,method,num_iter,x,tol):
+	'''Lightweight state after an outer iteration.'''
+
+	x 		= np.array(x,dtype=float)
+
+	#violation of the original problem, i.e. without relaxation
+	t 			= self.par_relax['t']
+	self.par_relax['t'] 	= 0.0
+
+	try:
+		out_violation 	= violation(self,x)
+	finally:
+		self.par_relax['t'] = t
+
+	out_snapshot 	= {'kind':		'outer',
+			   'method':		method,
+			   'iter':		num_iter,
+			   'time':		time.time()-self.par_stream['start'],
+			   'x':			x,
+			   'volume':		float(self.volume(x)),
+			   'violation':		out_violation,
+			   'feasible':		out_violation <= tol,
+			   }
+
+	if method in ['ALM','alm']:
+		for key in ['alpha','V','KKT']:
+			out_snapshot[key] = self.par_ALM.get(key)
+
+	elif method in ['relaxation','relax']:
+		out_snapshot['t'] = self.par_relax['t']
+
+	return out_snapshot
+
+def better_snapshot(snapshot,best):
+	'''Feasible iterates first, then by volume; infeasible ones by violation.'''
+
+	if snapshot['feasible'] != best['feasible']:
+		return snapshot['feasible']
+
+	if snapshot['feasible']:
+		return snapshot['volume'] < best['volume']
+
+	return snapshot['violation'] < best['violation']
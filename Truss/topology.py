@@ -0,0 +1,225 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+
+from .result import *
+from .functions import *
+
+#---------------------------------------------------------------------------------------#
+#		Realized topology
+#---------------------------------------------------------------------------------------#
+
+def active_topology(self,x,threshold=1e-6):
+	'''Realized bars of the solution x and their diameters.
+
+	Parameters:
+	-----------
+	threshold: float, default = 1e-6
+		bars with diameters below threshold*max(diameters) are considered vanished
+
+	Returns the bars [bar,end] (indices of the original nodes), their diameters
+	and the chains of original bars forming each of them.'''
+
+	bar_diam 	= np.array(bar_diameters(self,np.asarray(x,dtype=float)))
+	active 		= np.nonzero(bar_diam > threshold*max(np.max(bar_diam,initial=0),1e-300))[0]
+
+	out_bars 	= np.asarray(self.bars)[active].astype(np.int64)
+	out_diam 	= bar_diam[active]
+	out_chains 	= [np.array([bar]) for bar in active]
+
+	return out_bars,out_diam,out_chains
+
+def merge_collinear(self,bars,diam,chains,tol=1e-9):
+	'''Merge chains of collinear bars through free, unloaded nodes
+	connecting exactly two bars into single bars.
+
+	The force is equal in all bars of a chain, hence the merged bar
+	takes the largest diameter of the chain such that no stress increases.'''
+
+	nodes 		= np.asarray(self.nodes,dtype=float)
+	loaded 		= np.any(self.load_cases != 0,axis=tuple(range(1,self.load_cases.ndim)))
+
+	bars 		= [list(bar) for bar in bars]
+	diam 		= list(diam)
+	chains 		= list(chains)
+	alive 		= np.ones((len(bars)),dtype=bool)
+
+	#bars at every node
+	incident 	= [[] for num_node in range(len(nodes))]
+
+	for num_bar,bar in enumerate(bars):
+		incident[bar[0]].append(num_bar)
+		incident[bar[1]].append(num_bar)
+
+	candidates 	= np.setdiff1d(np.nonzero(~loaded)[0],self.fixed_nodes)
+
+	for node in candidates:
+
+		if len(incident[node]) != 2:
+			continue
+
+		first,second 	= incident[node]
+		ends 		= [bars[num][1] if bars[num][0] == node else bars[num][0] for num in (first,second)]
+
+		#directions from the node to the other end nodes
+		directions 	= nodes[ends] - nodes[node]
+		directions     /= np.linalg.norm(directions,axis=1)[:,np.newaxis]
+
+		if np.dot(directions[0],directions[1]) > -1+tol:
+			continue
+
+		#a bar between the end nodes exists already
+		if set(incident[ends[0]]) & set(incident[ends[1]]):
+			continue
+
+		#the first bar is extended to the other end node, the second one removed
+		bars[first] 	= [ends[0],ends[1]]
+		diam[first] 	= max(diam[first],diam[second])
+		chains[first] 	= np.concatenate((chains[first],chains[second]))
+		alive[second] 	= False
+
+		incident[node] 	= []
+		incident[ends[1]][incident[ends[1]].index(second)] = first
+
+	alive 		= np.nonzero(alive)[0]
+
+	return np.array([bars[num] for num in alive],dtype=np.int64).reshape(-1,2), \
+		np.array([diam[num] for num in alive]),[chains[num] for num in alive]
+
+#---------------------------------------------------------------------------------------#
+#		Reduced truss
+#---------------------------------------------------------------------------------------#
+
+def derived_truss(self,node_map,bars=None,max_length=None,bar_groups=None):
+	'''Truss on the nodes node_map of self with the same supports, loads, limits
+	and options.
+
+	Parameters:
+	-----------
+	node_map: array
+		original index of every node of the new truss
+	bars: array, default = None
+		bars in the node numbering of the new truss; potential bars if None
+	max_length: float, default = None
+		maximum bar length of the potential bars; the one of self if None
+	bar_groups: list or str, default = None
+		linked bars of the new truss, see Truss
+	'''
+
+	node_index 	= -np.ones((self.par['n_n']),dtype=np.int64)
+	node_index[node_map] = np.arange(len(node_map))
+
+	fixed_nodes 	= node_index[np.asarray(self.fixed_nodes,dtype=np.int64)]
+
+	out_truss 	= type(self)(np.asarray(self.nodes)[node_map],fixed_nodes[fixed_nodes >= 0],
+				self.load_cases[node_map],bars=bars,
+				max_length=self.par['max_length'] if max_length is None else max_length,
+				start_diameter=np.max(self.bar_diam,initial=0),
+				young_E=self.par['E'],min_diameter=self.par['min_diam'],
+				max_diameter=self.par['max_diam'],max_compliance=self.par['max_comp'],
+				max_stress=self.par['max_stress'],verbose=self.verbose,
+				bar_groups=bar_groups,n_workers=self.n_workers,reorder=self.dof_order)
+
+	out_truss.options_ipopt = list(self.options_ipopt)
+
+	return out_truss
+
+def reduced_truss(self,bars,chains):
+	'''Truss of the bars (indices of the original nodes) with all unused nodes removed.
+
+	Returns the truss and the original index of each of its nodes.'''
+
+	loaded 		= np.any(self.load_cases != 0,axis=tuple(range(1,self.load_cases.ndim)))
+
+	#nodes of the bars and loaded nodes
+	used 		= np.zeros((self.par['n_n']),dtype=bool)
+	used[bars.ravel()] = True
+	used[loaded] 	= True
+
+	node_map 	= np.nonzero(used)[0]
+	node_index 	= -np.ones((self.par['n_n']),dtype=np.int64)
+	node_index[node_map] = np.arange(len(node_map))
+
+	#linked diameters of the first original bar of every reduced bar
+	if self.bar_group is None or self.bar_groups is None:
+		bar_groups 	= None
+	elif isinstance(self.bar_groups,str):
+		bar_groups 	= self.bar_groups
+	else:
+		labels 		= self.bar_group[[chain[0] for chain in chains]]
+		bar_groups 	= [np.nonzero(labels == label)[0] for label in np.unique(labels)]
+
+	out_truss 	= derived_truss(self,node_map,node_index[bars],bar_groups=bar_groups)
+
+	return out_truss,node_map
+
+#---------------------------------------------------------------------------------------#
+#		Post-processing
+#---------------------------------------------------------------------------------------#
+
+def postprocess(self,x,threshold=1e-6,merge=True,resize=True,**kwargs):
+	'''Remove vanished bars and unused nodes, merge chains of collinear bars
+	and polish the diameters of the resulting truss by a sizing solve.
+
+	Parameters:
+	-----------
+	x: array
+		Bar diameters and nodal displacements as obtained from solve() method.
+	threshold: float, default = 1e-6
+		bars with diameters below threshold*max(diameters) are considered vanished
+	merge: bool, default = True
+		Merge chains of collinear bars through free, unloaded nodes.
+	resize: bool, default = True
+		Re-solve the reduced truss (direct method) warm-started from the
+		reduced design. Otherwise, the reduced design is only put in equilibrium.
+	kwargs:
+		additional parameters passed to solve() of the reduced truss
+
+	Returns a TrussResult of the reduced truss; its stats contain the original
+	index of every node ('node_map') and the original bars forming every bar
+	('bar_chains').
+	'''
+
+	start_time 		= time.time()
+
+	bars,diam,chains 	= active_topology(self,x,threshold)
+
+	if merge:
+		bars,diam,chains = merge_collinear(self,bars,diam,chains)
+
+	truss,node_map 		= reduced_truss(self,bars,chains)
+
+	#warm start with displacements in equilibrium
+	x0 			= equilibrium_displacements(truss,np.concatenate((group_diameters(truss,diam),
+									np.zeros((truss.par['n_dl'])))))
+
+	if resize:
+		out_result 	= truss.solve(kwargs.pop('method','direct'),x0=x0,result=True,**kwargs)
+	else:
+		out_result 	= TrussResult(truss,x0,'reduced')
+
+	out_result.stats['node_map'] 	= node_map
+	out_result.stats['bar_chains'] 	= chains
+	out_result.stats['time'] 	= time.time()-start_time
+
+	if self.verbose:
+		print('reduced truss\tnodes\t',truss.par['n_n'],'/',self.par['n_n'],
+			'\tbars\t',truss.par['n_b'],'/',self.par['n_b'],
+			'\tvolume\t',out_result.volume,'\tviolation\t',out_result.violation)
+
+	return out_result
@@ -0,0 +1,408 @@
+#	This file is part of Truss.
+#
+#	Truss is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	Truss is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with Truss.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+import scipy.sparse as sp
+
+from .groups import *
+from .ordering import *
+from .auxiliary_truss import *
+
+#---------------------------------------------------------------------------------------#
+#		Load cases
+#---------------------------------------------------------------------------------------#
+
+def add_load_cases(self,load_cases,x=None):
+	'''Append load cases [node,dim,case] (or a single load case [node,dim])
+	and return the warm start for the solution x of the previous problem.'''
+
+	load_cases = np.asarray(load_cases,dtype=float)
+
+	if load_cases.ndim == 2:
+		load_cases = load_cases[:,:,np.newaxis]
+
+	if load_cases.shape[:2] != self.load_cases.shape[:2]:
+		raise ValueError('load cases must have the shape [#nodes,dimension,#loads]!')
+
+	n_lc 		= self.par['n_lc']
+	self.load_cases = np.concatenate((self.load_cases,load_cases),axis=-1)
+
+	#new load cases have no previous displacements
+	source 		= np.concatenate((np.arange(n_lc),-np.ones((load_cases.shape[-1]),dtype=np.int64)))
+
+	return update_load_cases(self,x,source)
+
+def remove_load_cases(self,cases,x=None):
+	'''Remove the load cases with indices cases and return the warm start
+	for the solution x of the previous problem.'''
+
+	keep 		= np.setdiff1d(np.arange(self.par['n_lc']),cases)
+
+	if len(keep) == 0:
+		raise ValueError('at least one load case must remain!')
+
+	self.load_cases = self.load_cases[...,keep]
+
+	return update_load_cases(self,x,keep)
+
+def update_load_cases(self,x,source):
+	'''Recompute the sizes derived from the load cases and map the solution x of the
+	previous problem to the new variable layout; load case k of the new problem is
+	load case source[k] of the previous one (-1 for new load cases).'''
+
+	old_par 	= dict(self.par)
+	old_group 	= self.bar_group
+
+	self.version   += 1
+
+	#symmetry groups depend on the loads
+	if isinstance(self.bar_groups,str):
+		link_bars(self,self.bar_groups)
+
+	problem_sizes(self)
+
+	if x is None:
+		return None
+
+	return warm_start(self,x,old_par,old_group,source)
+
+def warm_start(self,x,old_par,old_group,source):
+	'''Solution x of the previous problem (sizes old_par, bar groups old_group) in the
+	variable layout of the current problem. Displacements of new load cases are
+	in equilibrium with the previous diameters.'''
+
+	x 		= np.asarray(x,dtype=float)
+	n_dof 		= self.par['n_fn']*self.par['dim']
+
+	bar_diam 	= x[0:old_par['n_b']] if old_group is None else x[0:old_par['n_g']][old_group]
+	old_disloc 	= x[-old_par['n_dl']:].reshape(n_dof,old_par['n_lc'])
+
+	out_x 		= np.concatenate((group_diameters(self,bar_diam),np.zeros((self.par['n_dl']))))
+
+	if np.any(source < 0):
+		out_x 	= equilibrium_displacements(self,out_x)
+
+	node_disloc 	= out_x[self.par['n_g']:].reshape(n_dof,self.par['n_lc'])
+	node_disloc[:,source >= 0] = old_disloc[:,source[source >= 0]]
+
+	return out_x
+
+#---------------------------------------------------------------------------------------#
+#		Limits
+#---------------------------------------------------------------------------------------#
+
+def set_limits(self,max_compliance=None,max_stress=None,min_diameter=None,max_diameter=None,x=None):
+	'''Change the limits of the problem; limits that are None are kept.
+	Return the solution x of the previous problem with the diameters
+	clipped to the new maximum diameter as warm start.'''
+
+	self.version   += 1
+
+	for key,value in [('max_comp',max_compliance),('max_stress',max_stress),
+			  ('min_diam',min_diameter),('max_diam',max_diameter)]:
+
+		if value is not None:
+			self.par[key] = float(value)
+
+	if x is None:
+		return None
+
+	out_x 			= np.array(x,dtype=float)
+	out_x[:self.par['n_g']] = np.clip(out_x[:self.par['n_g']],0,self.par['max_diam'])
+
+	return out_x
+
+#---------------------------------------------------------------------------------------#
+#		Geometry
+#---------------------------------------------------------------------------------------#
+
+def move_nodes(self,indices,positions,x=None):
+	'''Move the nodes with indices to positions and return the warm start
+	for the solution x of the previous problem.'''
+
+	indices 		= np.atleast_1d(np.asarray(indices,dtype=np.int64))
+	nodes 			= np.array(self.nodes,dtype=float)
+	old_positions 		= nodes[indices]
+	nodes[indices] 		= np.reshape(positions,(len(indices),self.par['dim']))
+
+	return edit_geometry(self,nodes,self.fixed_nodes,np.arange(self.par['n_n']),
+				indices,np.vstack((old_positions,nodes[indices])),self.load_cases,x)
+
+def add_nodes(self,positions,fixed=False,loads=None,x=None):
+	'''Append nodes at positions (fixed or free) with loads [node,dim,case]
+	and return the warm start for the solution x of the previous problem.'''
+
+	positions 		= np.reshape(np.asarray(positions,dtype=float),(-1,self.par['dim']))
+	new_nodes 		= np.arange(self.par['n_n'],self.par['n_n']+len(positions))
+
+	nodes 			= np.vstack((self.nodes,positions))
+	fixed_nodes 		= np.concatenate((self.fixed_nodes,new_nodes)) if fixed else self.fixed_nodes
+
+	if loads is None:
+		loads 		= np.zeros((len(positions),)+self.load_cases.shape[1:])
+
+	load_cases 		= np.concatenate((self.load_cases,np.reshape(loads,(len(positions),)+self.load_cases.shape[1:])))
+
+	if fixed and np.any(loads != 0):
+		raise ValueError('fixed nodes cannot be loaded!')
+
+	return edit_geometry(self,nodes,fixed_nodes,np.arange(self.par['n_n']),
+				new_nodes,positions,load_cases,x)
+
+def remove_nodes(self,indices,x=None):
+	'''Remove the unloaded nodes with indices and all bars connected to them
+	and return the warm start for the solution x of the previous problem.'''
+
+	indices 		= np.atleast_1d(np.asarray(indices,dtype=np.int64))
+
+	if np.any(self.load_cases[indices] != 0):
+		raise ValueError('loaded nodes cannot be removed!')
+
+	keep 			= np.setdiff1d(np.arange(self.par['n_n']),indices)
+	node_map 		= -np.ones((self.par['n_n']),dtype=np.int64)
+	node_map[keep] 		= np.arange(len(keep))
+
+	fixed_nodes 		= node_map[np.asarray(self.fixed_nodes,dtype=np.int64)]
+
+	return edit_geometry(self,self.nodes[keep],fixed_nodes[fixed_nodes >= 0],node_map,
+				np.zeros((0),dtype=np.int64),self.nodes[indices],self.load_cases[keep],x)
+
+def edit_geometry(self,nodes,fixed_nodes,node_map,changed,points,load_cases,x=None):
+	'''Update the geometry after an edit of the nodes.
+
+	Only bars incident to the changed nodes and bars enclosing points
+	(old and new positions of changed or removed nodes) are recomputed;
+	all other bars keep their geometry.
+
+	Parameters:
+	-----------
+	nodes, fixed_nodes, load_cases: array
+		nodes, fixed nodes and load cases after the edit
+	node_map: array
+		new index of every previous node, -1 for removed nodes
+	changed: array
+		new indices of moved or added nodes
+	points: array
+		positions at which bars may have appeared or vanished
+	x: array, default = None
+		solution of the previous problem
+	'''
+
+	old_par 		= dict(self.par)
+	old_group 		= self.bar_group
+	old_bar_diam 		= self.bar_diam
+	old_n_dof 		= self.par['n_fn']*self.par['dim']
+	old_free 		= self.free_nodes
+	old_dofs 		= np.asarray(self.bar_dofs)
+
+	self.version 	       += 1
+
+	#previous bars in the new node numbering
+	old_bars 		= node_map[np.asarray(self.bars)]
+	old_index 		= np.nonzero(np.all(old_bars >= 0,axis=1))[0]
+	old_bars 		= old_bars[old_index]
+
+	#unchanged bars keep their geometry
+	unchanged 		= ~np.any(np.isin(old_bars,changed),axis=1)
+
+	self.nodes 		= nodes
+	self.fixed_nodes 	= fixed_nodes
+	self.free_nodes 	= np.setdiff1d(range(nodes.shape[0]),fixed_nodes)
+	self.load_cases 	= load_cases
+
+	self.par['n_n'] 	= nodes.shape[0]
+	self.par['num_fixed'] 	= len(fixed_nodes)
+	self.par['n_fn'] 	= nodes.shape[0]-len(fixed_nodes)
+
+	n_n 			= self.par['n_n']
+
+	if self.ground_structure:
+
+		#pairs to be checked again: incident to changed nodes and enclosing points
+		candidates 	= np.vstack([incident_pairs(n_n,changed)]+
+					    [enclosing_pairs(nodes,point,self.par['max_length']) for point in points])
+		candidates 	= np.unique(np.sort(candidates,axis=1)[:,0]*n_n+np.sort(candidates,axis=1)[:,1])
+
+		pairs 		= np.column_stack((candidates//n_n,candidates%n_n))
+		valid 		= valid_pairs(nodes,fixed_nodes,self.par['max_length'],pairs)
+
+		#previous bars are kept (and keep their diameters) unless they are no longer valid,
+		#only valid pairs without a previous bar are new
+		keys 		= np.min(old_bars,axis=1)*n_n+np.max(old_bars,axis=1)
+		kept 		= ~np.isin(keys,candidates[~valid])
+
+		new_bars 	= pairs[valid & ~np.isin(candidates,keys)]
+
+		old_index 	= old_index[kept]
+		unchanged 	= unchanged[kept]
+		old_bars 	= old_bars[kept]
+
+	else:
+		new_bars 	= np.zeros((0,2),dtype=np.int64)
+
+	bars 			= np.vstack((old_bars,new_bars))
+	source 			= np.concatenate((old_index,-np.ones((len(new_bars)),dtype=np.int64)))
+	recompute 		= np.concatenate((~unchanged,np.ones((len(new_bars)),dtype=bool)))
+
+	#potential bars in the order of potential_bars, i.e. sorted by their node pairs;
+	#user-defined bars keep their order
+	if self.ground_structure:
+		order 			= np.lexsort((bars[:,1],bars[:,0]))
+		bars,source,recompute 	= bars[order],source[order],recompute[order]
+
+	#geometry of the unchanged bars is copied, the remaining bars are recomputed
+	lengths 		= np.zeros((len(bars)))
+	cosines 		= np.zeros((len(bars),2*self.par['dim']))
+
+	lengths[~recompute] 	= np.asarray(self.bar_lengths)[source[~recompute]]
+	cosines[~recompute] 	= np.asarray(self.bar_cosines)[source[~recompute]]
+
+	lengths[recompute] 	= np.linalg.norm(nodes[bars[recompute,1]]-nodes[bars[recompute,0]],axis=1)
+	cosines[recompute] 	= pair_cosines(nodes,bars[recompute],lengths[recompute])
+
+	#the geometry is kept in memory from now on
+	self.store 		= None
+	self.bars 		= bars
+	self.bar_lengths 	= lengths
+	self.bar_dofs 		= pair_dofs(n_n,self.free_nodes,self.par['dim'],bars)
+	self.bar_cosines 	= cosines
+	self.par['n_b'] 	= len(bars)
+
+	#position of the previous bars
+	bar_map 		= -np.ones((old_par['n_b']),dtype=np.int64)
+	bar_map[source[source >= 0]] = np.nonzero(source >= 0)[0]
+
+	update_pattern(self,old_n_dof,old_free,node_map,np.nonzero(recompute)[0],old_dofs[bar_map < 0].ravel())
+
+	#linked bars
+	if isinstance(self.bar_groups,str) or self.bar_groups is None:
+		link_bars(self,self.bar_groups)
+	else:
+		groups 	= [bar_map[np.asarray(group,dtype=np.int64)] for group in self.bar_groups]
+		link_bars(self,[group[group >= 0] for group in groups])
+
+	problem_sizes(self)
+
+	#degrees of freedom in the order chosen by reorder()
+	if self.dof_order is not None:
+		reorder_nodes(self,self.dof_order)
+
+	self.bar_diam 		= np.full((self.par['n_b']),np.max(old_bar_diam,initial=0))
+	self.bar_diam[bar_map[bar_map >= 0]] = old_bar_diam[bar_map >= 0]
+
+	if x is None:
+		return None
+
+	#diameters of the previous bars, new bars vanish
+	x 			= np.asarray(x,dtype=float)
+	old_diam 		= x[0:old_par['n_b']] if old_group is None else x[0:old_par['n_g']][old_group]
+
+	bar_diam 		= np.zeros((self.par['n_b']))
+	bar_diam[bar_map[bar_map >= 0]] = old_diam[bar_map >= 0]
+
+	out_x 			= np.concatenate((group_diameters(self,bar_diam),np.zeros((self.par['n_dl']))))
+
+	return equilibrium_displacements(self,out_x)
+
+def incident_pairs(n_n,nodes):
+	'''All node pairs containing one of nodes.'''
+
+	others 	= np.tile(np.arange(n_n),len(nodes))
+	pairs 	= np.column_stack((np.repeat(nodes,n_n),others))
+
+	return pairs[pairs[:,0] != pairs[:,1]]
+
+def enclosing_pairs(nodes,point,max_length):
+	'''Node pairs with point "in between" their end nodes, see overlapping_bars().'''
+
+	dist 	= np.linalg.norm(nodes-point,axis=1)
+
+	#both end nodes of a bar enclosing point are within its length of point
+	near 	= np.nonzero((dist <= max_length) & (dist > 0))[0]
+	out 	= [np.zeros((0,2),dtype=np.int64)]
+
+	chunk 	= max(1,BAR_CHUNK//max(1,len(near)))
+
+	for start in range(0,len(near),chunk):
+
+		rows 	= near[start:start+chunk]
+		starts 	= nodes[rows,np.newaxis,:]
+		ends 	= nodes[np.newaxis,near,:]
+
+		between = (point > np.minimum(starts,ends)) & (point < np.maximum(starts,ends))
+		inside 	= np.all(np.where(starts != ends,between,point == starts),axis=2)
+
+		pairs 	= np.nonzero(inside & (rows[:,np.newaxis] < near[np.newaxis,:]))
+		out.append(np.column_stack((rows[pairs[0]],near[pairs[1]])))
+
+	return np.vstack(out)
+
+def valid_pairs(nodes,fixed_nodes,max_length,pairs):
+	'''Mask of the node pairs that are potential bars.'''
+
+	fixed 	= np.zeros((len(nodes)),dtype=bool)
+	fixed[np.asarray(fixed_nodes,dtype=np.int64)] = True
+
+	out_valid = ~(fixed[pairs[:,0]] & fixed[pairs[:,1]])
+	out_valid &= np.linalg.norm(nodes[pairs[:,1]]-nodes[pairs[:,0]],axis=1) <= max_length
+	out_valid[out_valid] = ~overlapping_bars(nodes,pairs[out_valid])
+
+	return out_valid
+
+def update_pattern(self,old_n_dof,old_free,node_map,changed_bars,removed_dofs):
+	'''Update the cached sparsity pattern of the stiffness matrix locally, i.e. only the
+	rows and columns of the degrees of freedom of changed (new or recomputed) and removed bars.'''
+
+	if self.stiff_pattern is None:
+		return
+
+	dim 		= self.par['dim']
+	n_dof 		= self.par['n_fn']*dim
+
+	#previous degrees of freedom in the new numbering, -1 if removed or fixed
+	new_index 	= -np.ones((self.par['n_n']),dtype=np.int64)
+	new_index[self.free_nodes] = np.arange(self.par['n_fn'])
+
+	old_nodes 	= new_index[node_map[old_free]]
+	old_nodes[node_map[old_free] < 0] = -1
+
+	dof_map 	= (old_nodes[:,np.newaxis]*dim+np.arange(dim)).ravel()
+	dof_map[np.repeat(old_nodes < 0,dim)] = -1
+
+	kept 		= np.nonzero(dof_map >= 0)[0]
+	perm 		= sp.csr_matrix((np.ones(len(kept)),(dof_map[kept],kept)),shape=(n_dof,old_n_dof))
+
+	#affected degrees of freedom: changed bars, removed bars, new degrees of freedom
+	affected 	= np.zeros((n_dof),dtype=bool)
+	affected[self.bar_dofs[changed_bars][self.bar_dofs[changed_bars] >= 0]] = True
+	affected[dof_map[removed_dofs[removed_dofs >= 0]][dof_map[removed_dofs[removed_dofs >= 0]] >= 0]] = True
+	affected[np.setdiff1d(np.arange(n_dof),dof_map[kept])] = True
+
+	#remove the affected rows and columns
+	keep_mat 	= sp.diags((~affected).astype(float))
+	pattern 	= keep_mat @ (perm @ self.stiff_pattern @ perm.T) @ keep_mat
+
+	#and assemble them again from all bars at affected degrees of freedom
+	bars 		= np.nonzero(np.any(affected[self.bar_dofs] & (self.bar_dofs >= 0),axis=1))[0]
+	block 		= pattern_block(self,bars).tocoo()
+	local 		= affected[block.row] | affected[block.col]
+
+	pattern 	= sp.csr_matrix(pattern + sp.csr_matrix((np.ones(np.sum(local)),
+						(block.row[local],block.col[local])),shape=(n_dof,n_dof)))
+	pattern.eliminate_zeros()
+	pattern.data[:] = 1
+
+	self.stiff_pattern = pattern
@@ -11,4 +11,5 @@ setup(
         python_requires='>=3',
         packages=['Truss'],
         install_requires=['numpy','scipy','matplotlib','numdifftools','ipopt'],
+        extras_require={'numba':['numba']},
 )
\ No newline at end of file
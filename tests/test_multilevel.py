@@ -0,0 +1,37 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('ipopt')
+
+from Truss import Truss, path_cover
+
+
+def grid_truss(nx=9, ny=5, max_length=1.5):
+    nodes = np.array([[i, j] for i in range(nx) for j in range(ny)], dtype=float)
+    fixed_nodes = np.arange(ny)
+
+    load_cases = np.zeros((len(nodes), 2, 1))
+    load_cases[(nx - 1) * ny + ny // 2, 1, 0] = -1
+
+    return Truss(nodes, fixed_nodes, load_cases, max_length=max_length, verbose=False)
+
+
+def test_path_cover_without_load_path():
+    nodes = np.array([[0, 0], [1, 0], [2, 0]], dtype=float)
+    bars = np.array([[0, 1], [1, 2]])
+
+    cover, dist = path_cover(nodes, bars, np.zeros((0, 2), dtype=np.int64))
+
+    assert np.all(cover == -1)
+    assert np.all(np.isinf(dist))
+
+
+def test_multilevel_with_finite_max_length():
+    truss = grid_truss()
+
+    x, stats = truss.multilevel('direct', levels=1)
+
+    #the coarse level has longer bars than the fine truss
+    assert stats[0]['level'] == 1
+    assert stats[0]['n_b'] > 0
+    assert len(x) == truss.par['n_var']